@@ -1,7 +1,18 @@
+import json
+import os
+
 import numpy as np
-import joblib
 
-FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
+from analysis_app.compiled_model import load_compiled
+from analysis_app.indicators import BASE_FEATURES, price_columns
+from analysis_app.model_store import artifact_mtime, load_joblib
+
+# Features new models are trained on. CLEARTRADE_FEATURES takes a comma-separated
+# list from indicators.ALL_FEATURES, e.g. "ma_10,ma_30,rsi,volatility,macd_hist,atr".
+# Each trained model records its own list (see model_features), so prediction
+# always uses the features the model was trained with.
+FEATURES = [f.strip() for f in os.getenv("CLEARTRADE_FEATURES", ",".join(BASE_FEATURES)).split(",") if f.strip()]
+price_columns(FEATURES)  # fail fast on unknown names
 LABELS = {0: "SELL", 1: "HOLD", 2: "BUY"}
 
 # Paper §6.4: Decision Fusion Agent rules
@@ -10,6 +21,9 @@ LABELS = {0: "SELL", 1: "HOLD", 2: "BUY"}
 BUY_PROB_THRESHOLD = 0.65
 FUNDAMENTAL_SCORE_THRESHOLD = 0.6
 SENTIMENT_THRESHOLD = 0.0
+# A technical SELL stands when fundamentals are weak or news is clearly negative
+SELL_FUNDAMENTAL_THRESHOLD = 0.4
+SELL_SENTIMENT_THRESHOLD = -0.2
 
 
 def compute_fundamental_score(pe_ratio, earnings_growth, revenue_growth) -> float | None:
@@ -45,11 +59,50 @@ def compute_fundamental_score(pe_ratio, earnings_growth, revenue_growth) -> floa
     return score
 
 
+def features_path(model_path: str) -> str:
+    """Sidecar file listing the features a model was trained on, in column order."""
+    return os.path.splitext(model_path)[0] + ".features.json"
+
+
+def save_model_features(model_path: str, features) -> None:
+    tmp = features_path(model_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(list(features), f)
+    os.replace(tmp, features_path(model_path))
+
+
+_model_features_cache: dict = {}
+
+
+def model_features(model_path: str) -> list[str]:
+    """Feature list of the model at model_path; BASE_FEATURES for models saved without one."""
+    path = features_path(model_path)
+    mtime = artifact_mtime(path)
+    if mtime is None:
+        return list(BASE_FEATURES)
+    cached = _model_features_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = _model_features_cache[path] = (mtime, json.load(f))
+    return list(cached[1])
+
+
+def load_model(model_path: str):
+    """Technical model: the NumPy compiled scorer when its artifact exists, else sklearn/joblib."""
+    model = load_compiled(model_path)
+    if model is None:
+        model = load_joblib(model_path)
+    if model is None:
+        raise FileNotFoundError(model_path)
+    return model
+
+
 def predict(model_path: str, feats: dict, feats_sequence: np.ndarray | None = None):
     """
     Technical Agent: produce BUY/HOLD/SELL from ML model.
     If feats_sequence is provided (shape [SEQUENCE_LEN, 4]) and LSTM model exists, use LSTM;
-    otherwise use Logistic Regression / Random Forest from model_path.
+    otherwise use Logistic Regression / Random Forest from model_path
+    (via the NumPy compiled scorer when its artifact exists, else sklearn/joblib).
     """
     if feats_sequence is not None:
         try:
@@ -59,9 +112,8 @@ def predict(model_path: str, feats: dict, feats_sequence: np.ndarray | None = No
                 return out
         except Exception:
             pass
-    model = joblib.load(model_path)
-    x = np.array([[feats[f] for f in FEATURES]])
-    probs = model.predict_proba(x)[0]
+    x = np.array([[feats[f] for f in model_features(model_path)]])
+    probs = load_model(model_path).predict_proba(x)[0]
     idx = int(np.argmax(probs))
     return LABELS[idx], float(np.max(probs)), probs.tolist()
 
@@ -156,13 +208,14 @@ def fuse(
     if tech_buy_strong and fund_ok and sentiment_ok:
         final_signal = "BUY"
         confidence = min(1.0, conf * 1.05)
-        reasons.append(
-            f"Technical agent suggests BUY (probability={prob_buy:.2f}). "
-            f"Fundamental score {fundamental_score:.2f} and sentiment support the signal."
+        support = (
+            "Sentiment supports the signal (no fundamentals on file)." if fundamental_score is None
+            else f"Fundamental score {fundamental_score:.2f} and sentiment support the signal."
         )
+        reasons.append(f"Technical agent suggests BUY (probability={prob_buy:.2f}). {support}")
     elif signal == "SELL" and (
-        (fundamental_score is not None and fundamental_score < 0.4)
-        or (sentiment is not None and sentiment < -0.2)
+        (fundamental_score is not None and fundamental_score < SELL_FUNDAMENTAL_THRESHOLD)
+        or (sentiment is not None and sentiment < SELL_SENTIMENT_THRESHOLD)
     ):
         final_signal = "SELL"
         confidence = min(1.0, conf * 1.05)
@@ -195,4 +248,63 @@ def fuse(
 
     confidence = float(max(0.0, min(1.0, confidence)))
     explanation = " ".join(reasons)
-    return final_signal, confidence, explanation
\ No newline at end of file
+    return final_signal, confidence, explanation
+
+def compute_fundamental_score_many(pe_ratio, earnings_growth, revenue_growth) -> np.ndarray:
+    """
+    Vectorized compute_fundamental_score over arrays (NaN = missing).
+    Returns NaN where all three inputs are missing; otherwise identical to the scalar rule.
+    """
+    pe = np.asarray(pe_ratio, dtype=np.float64)
+    eg = np.asarray(earnings_growth, dtype=np.float64)
+    rg = np.asarray(revenue_growth, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        score = np.full(np.broadcast(pe, eg, rg).shape, 0.5)
+        # Same additions in the same order as the scalar version, so results match exactly
+        score = score + np.where((pe >= 15) & (pe <= 25), 0.2, np.where(pe > 35, -0.15, 0.0))
+        score = score + np.where(eg > 0.1, 0.15, np.where(eg < -0.1, -0.15, 0.0))
+        score = score + np.where(rg > 0.05, 0.15, np.where(rg < -0.05, -0.15, 0.0))
+    has_any = ~(np.isnan(pe) & np.isnan(eg) & np.isnan(rg))
+    return np.where(has_any, np.clip(score, 0.0, 1.0), np.nan)
+
+
+def fuse_many(
+    signal_idx,
+    conf,
+    prob_buy,
+    fundamental_score,
+    sentiment,
+    buy_prob_threshold=BUY_PROB_THRESHOLD,
+    fundamental_threshold=FUNDAMENTAL_SCORE_THRESHOLD,
+    sentiment_threshold=SENTIMENT_THRESHOLD,
+    sell_fundamental_threshold=SELL_FUNDAMENTAL_THRESHOLD,
+    sell_sentiment_threshold=SELL_SENTIMENT_THRESHOLD,
+):
+    """
+    Vectorized fuse() decision rules (no explanations).
+
+    signal_idx uses LABELS indices (0=SELL, 1=HOLD, 2=BUY); fundamental_score and
+    sentiment use NaN for missing. All inputs, including the thresholds, broadcast
+    against each other, so a grid of thresholds can be evaluated in one call.
+    Returns (final_signal_idx, confidence) arrays.
+    """
+    sig = np.asarray(signal_idx)
+    conf = np.asarray(conf, dtype=np.float64)
+    pb = np.asarray(prob_buy, dtype=np.float64)
+    fs = np.asarray(fundamental_score, dtype=np.float64)
+    s = np.asarray(sentiment, dtype=np.float64)
+    no_fs, no_s = np.isnan(fs), np.isnan(s)
+
+    with np.errstate(invalid="ignore"):
+        sentiment_ok = no_s | (s >= sentiment_threshold)
+        fund_ok = no_fs | (fs >= fundamental_threshold)
+        tech_buy_strong = (sig == 2) & (pb >= buy_prob_threshold)
+        buy = tech_buy_strong & fund_ok & sentiment_ok
+        sell = ~buy & (sig == 0) & ((~no_fs & (fs < sell_fundamental_threshold)) | (~no_s & (s < sell_sentiment_threshold)))
+        hold = ~buy & ~sell & (
+            ((sig == 2) & (~fund_ok | ~sentiment_ok)) | ((sig == 0) & fund_ok & (no_s | (s >= 0)))
+        )
+
+    final = np.where(buy, 2, np.where(sell, 0, np.where(hold, 1, sig)))
+    confidence = np.where(buy | sell, np.minimum(1.0, conf * 1.05), np.where(hold, 0.55, conf))
+    return final, np.clip(confidence, 0.0, 1.0)
@@ -0,0 +1,35 @@
+"""
+ORM calls from async code.
+
+sync_to_async(thread_sensitive=False) runs each call on whichever thread of the
+default executor is free, which is what lets independent DB lookups overlap.
+Django closes or recycles a thread's connection only on request_started and
+request_finished, and those never fire on executor threads. Without cleanup each
+thread would keep its connection forever, ignoring CONN_MAX_AGE, until MySQL drops
+it ("server has gone away"). db_to_async() runs close_old_connections() around
+every call, as Django does around a request, so CONN_MAX_AGE and
+CONN_HEALTH_CHECKS apply to these threads too.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def db_call(fn):
+    """Wrap a sync function that uses the ORM with per-call connection cleanup."""
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return call
+
+
+def db_to_async(fn):
+    """sync_to_async(fn, thread_sensitive=False) with connection cleanup (see module docstring)."""
+    return sync_to_async(db_call(fn), thread_sensitive=False)
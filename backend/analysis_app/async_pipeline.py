@@ -0,0 +1,136 @@
+"""
+Async analysis pipeline for ASGI deployments.
+
+Runs the same stages as pipeline.run_analysis, but overlaps the independent I/O:
+the Yahoo price fetch runs alongside the fundamentals/news fetch, and the three DB
+lookups (prices, fundamentals, news) run together, as do the Recommendation insert
+and the explanation. I/O calls hold a slot in a per-event-loop semaphore
+(CLEARTRADE_ASYNC_IO_CONCURRENCY) so a burst of cold tickers cannot exhaust DB
+connections or hammer Yahoo. CPU-bound scoring runs on a shared executor
+(CLEARTRADE_CPU_EXECUTOR=thread|process, CLEARTRADE_CPU_WORKERS), keeping the
+event loop free to accept other requests. Stage timings recorded in a worker
+process are sent back with the result, so they reach Server-Timing and /api/metrics.
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from analysis_app import pipeline
+from analysis_app.async_db import db_to_async
+from analysis_app.live_data import ensure_prices_for_ticker, ensure_fundamentals_and_news
+from analysis_app.metrics import capture_stages, record_stage, stage
+from analysis_app.singleflight import coalesced_async
+
+IO_CONCURRENCY = int(os.getenv("CLEARTRADE_ASYNC_IO_CONCURRENCY", "16"))
+BATCH_CONCURRENCY = int(os.getenv("CLEARTRADE_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_TICKERS = int(os.getenv("CLEARTRADE_BATCH_MAX_TICKERS", "50"))
+CPU_EXECUTOR = os.getenv("CLEARTRADE_CPU_EXECUTOR", "thread").lower()
+CPU_WORKERS = int(os.getenv("CLEARTRADE_CPU_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+_io_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_executor: Executor | None = None
+
+
+def _io_slot() -> asyncio.Semaphore:
+    # Semaphores belong to one event loop; under WSGI each async view gets its own loop.
+    loop = asyncio.get_running_loop()
+    sem = _io_semaphores.get(loop)
+    if sem is None:
+        sem = _io_semaphores[loop] = asyncio.Semaphore(IO_CONCURRENCY)
+    return sem
+
+
+def cpu_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if CPU_EXECUTOR == "process":
+            # fork: children inherit configured Django and the memory-mapped models
+            _executor = ProcessPoolExecutor(CPU_WORKERS, mp_context=multiprocessing.get_context("fork"))
+        else:
+            _executor = ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix="cleartrade-cpu")
+    return _executor
+
+
+async def _io(fn, *args):
+    """Run a blocking DB/network call in a worker thread, bounded by the I/O semaphore."""
+    async with _io_slot():
+        return await db_to_async(fn)(*args)
+
+
+async def _cpu(fn, *args):
+    """Run a CPU-bound stage on the shared executor."""
+    loop = asyncio.get_running_loop()
+    executor = cpu_executor()
+    if isinstance(executor, ThreadPoolExecutor):
+        # Carry the request context over so stage timings reach Server-Timing
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        return await loop.run_in_executor(executor, call)
+    result, timings = await loop.run_in_executor(executor, functools.partial(_timed, fn, *args))
+    for name, elapsed in timings:
+        record_stage(name, elapsed)
+    return result
+
+
+def _timed(fn, *args):
+    """Process-pool side of _cpu: run fn and return its stage timings with the result."""
+    with capture_stages() as timings:
+        result = fn(*args)
+    return result, timings
+
+
+def _live_prices(ticker: str) -> None:
+    with stage("live_prices"):
+        ensure_prices_for_ticker(ticker)
+
+
+def _live_fundamentals_news(ticker: str) -> None:
+    with stage("live_fundamentals_news"):
+        ensure_fundamentals_and_news(ticker)
+
+
+async def run_analysis_async(ticker: str, live: bool = True, interval: str = "1d") -> tuple[dict, int]:
+    """Async counterpart of pipeline.run_analysis; same payload and status codes."""
+    if live and interval == "1d":
+        await asyncio.gather(_io(_live_prices, ticker), _io(_live_fundamentals_news, ticker))
+    elif live:
+        await _io(_live_fundamentals_news, ticker)
+
+    prices, fundamentals, headlines = await asyncio.gather(
+        _io(pipeline.load_prices, ticker, interval),
+        _io(pipeline.load_fundamentals, ticker),
+        _io(pipeline.load_headlines, ticker),
+    )
+    if prices is None:
+        return dict(pipeline.PRICES_ERROR), 400
+
+    scored = await _cpu(pipeline.score, prices, fundamentals, headlines)
+    rec, explained = await asyncio.gather(
+        _io(pipeline.store, ticker, scored, interval),
+        _cpu(pipeline.explain, scored),
+    )
+    return pipeline.build_payload(ticker, rec, scored, explained), 200
+
+
+async def run_batch_async(tickers: list[str], live: bool = True, interval: str = "1d") -> dict[str, dict]:
+    """
+    Analyze several tickers concurrently (at most BATCH_CONCURRENCY at a time),
+    coalesced with any in-flight analysis of the same ticker.
+    Returns {ticker: payload} where every payload carries its own "status".
+    """
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def one(ticker: str) -> tuple[str, dict]:
+        async with sem:
+            try:
+                payload, status = await coalesced_async(
+                    ticker, run_analysis_async, ticker, live, interval, interval=interval
+                )
+            except Exception as exc:
+                payload, status = {"error": f"Analysis failed: {exc}"}, 500
+        return ticker, {**payload, "status": status}
+
+    return dict(await asyncio.gather(*(one(t) for t in tickers)))
@@ -0,0 +1,234 @@
+"""
+Intraday bar store: columnar files partitioned by ticker and month.
+
+Layout: <CLEARTRADE_BAR_DIR>/<TICKER>/<YYYY-MM>/ holds one raw .npy per column
+(ts = bar start in epoch seconds UTC, open, high, low, close, volume) plus a
+manifest, written with model_store.save_npy_dir, so about 40 bytes per bar on
+disk and a query only opens the months it needs. Partitions are mapped only
+while a query copies out of them and are never cached, so the number of
+partitions read does not pin memory or file descriptors. Ingest merges into existing partitions (same timestamp:
+the newer bar wins); one writer per ticker at a time is enforced with a file lock.
+
+bars() resamples on the fly to any of INTERVALS. Buckets are aligned to UTC
+(daily bars are UTC days, which covers a US session), and every interval
+divides a day, so no bucket spans two monthly partitions.
+
+Tickers become directory names, so anything outside TICKER_PATTERN (e.g. "..")
+is rejected with ValueError before it reaches the filesystem.
+"""
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from analysis_app.model_store import artifact_mtime, read_npy_dir, save_npy_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialised
+    fcntl = None
+
+INTERVALS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 86400}
+COLUMNS = ("open", "high", "low", "close", "volume")
+# Yahoo-style symbols: BRK-B, BRK.B, ^GSPC, EURUSD=X; never "." or ".." on their own
+TICKER_PATTERN = re.compile(r"[A-Z0-9^][A-Z0-9.\-^=]{0,15}")
+DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64, "volume": np.int64}
+
+
+def _month(ts: np.ndarray) -> np.ndarray:
+    return ts.astype("datetime64[s]").astype("datetime64[M]").astype(str)
+
+
+def resample(bars: dict, seconds: int) -> dict:
+    """OHLCV arrays sorted by ts → bars of `seconds` (first open, max high, min low, last close, summed volume)."""
+    ts = bars["ts"]
+    if len(ts) == 0:
+        return {k: np.asarray(v)[:0] for k, v in bars.items()}
+    bucket = ts // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return {
+        "ts": bucket[starts],
+        "open": np.asarray(bars["open"])[starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": np.asarray(bars["close"])[ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+def check_ticker(ticker: str) -> str:
+    """The ticker, upper-cased, if it is safe to use as a directory name; else ValueError."""
+    symbol = ticker.upper()
+    if not TICKER_PATTERN.fullmatch(symbol):
+        raise ValueError(f"invalid ticker: {ticker!r}")
+    return symbol
+
+
+def interval_seconds(interval: str) -> int:
+    try:
+        return INTERVALS[interval]
+    except KeyError:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+
+class BarStore:
+    def __init__(self, root: str | None = None):
+        self.root = root or settings.CLEARTRADE_BAR_DIR
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, check_ticker(ticker))
+
+    def tickers(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def partitions(self, ticker: str) -> list[str]:
+        """Months ("YYYY-MM") stored for the ticker, oldest first."""
+        path = self._ticker_dir(ticker)
+        if not os.path.isdir(path):
+            return []
+        return sorted(p for p in os.listdir(path) if len(p) == 7 and p[4] == "-")
+
+    def _read_partition(self, ticker: str, month: str) -> dict:
+        loaded = read_npy_dir(os.path.join(self._ticker_dir(ticker), month))
+        if loaded is None:
+            return {k: np.zeros(0, dtype=t) for k, t in DTYPES.items()}
+        return loaded[0]
+
+    def version(self, ticker: str) -> str:
+        """Changes whenever the ticker's newest partition is rewritten (cache/coalescing key)."""
+        months = self.partitions(ticker)
+        if not months:
+            return "none"
+        return f"{months[-1]}:{artifact_mtime(os.path.join(self._ticker_dir(ticker), months[-1]))}"
+
+    @contextmanager
+    def _writer(self, ticker: str):
+        os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self._ticker_dir(ticker), ".lock"), "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self, ticker: str, bars: dict) -> int:
+        """
+        Merge bars (dict of arrays: ts in epoch seconds plus COLUMNS) into the
+        ticker's monthly partitions. Returns the number of bars written.
+        """
+        new = {k: np.asarray(bars[k], dtype=t) for k, t in DTYPES.items()}
+        if len(new["ts"]) == 0:
+            return 0
+        months = _month(new["ts"])
+        with self._writer(ticker):
+            for month in np.unique(months):
+                mask = months == month
+                old = self._read_partition(ticker, month)
+                merged = {k: np.concatenate([old[k], new[k][mask]]) for k in DTYPES}
+                # Stable sort, then keep the last bar per timestamp so re-ingested bars replace old ones
+                order = np.argsort(merged["ts"], kind="stable")
+                ts = merged["ts"][order]
+                keep = np.r_[ts[1:] != ts[:-1], True]
+                save_npy_dir(
+                    os.path.join(self._ticker_dir(ticker), month),
+                    {k: v[order][keep] for k, v in merged.items()},
+                    meta={"ticker": ticker.upper(), "month": month},
+                )
+        return int(len(new["ts"]))
+
+    def read(self, ticker: str, start=None, end=None) -> dict:
+        """Raw bars with start <= ts < end (datetimes or epoch seconds; None = open)."""
+        lo = None if start is None else _epoch(start)
+        hi = None if end is None else _epoch(end)
+        parts = []
+        for month in self.partitions(ticker):
+            first = np.datetime64(month, "s").astype(np.int64)
+            last = np.datetime64(np.datetime64(month, "M") + 1, "s").astype(np.int64)
+            if (lo is not None and last <= lo) or (hi is not None and first >= hi):
+                continue
+            parts.append(self._read_partition(ticker, month))
+        return _concat(parts, lo, hi)
+
+    def bars(self, ticker: str, interval: str = "1m", start=None, end=None, limit: int | None = None) -> pd.DataFrame:
+        """
+        Bars resampled to `interval` as a DataFrame (date, open, high, low, close,
+        volume), oldest first. With `limit`, only the newest `limit` bars, reading
+        partitions from the newest month back until there are enough.
+        """
+        seconds = interval_seconds(interval)
+        if limit is None:
+            out = resample(self.read(ticker, start, end), seconds)
+        else:
+            lo = None if start is None else _epoch(start)
+            hi = None if end is None else _epoch(end)
+            parts: list = []
+            out = resample(_concat([], lo, hi), seconds)
+            for month in reversed(self.partitions(ticker)):
+                first = np.datetime64(month, "s").astype(np.int64)
+                if hi is not None and first >= hi:
+                    continue
+                parts.insert(0, self._read_partition(ticker, month))
+                out = resample(_concat(parts, lo, hi), seconds)
+                if len(out["ts"]) >= limit or (lo is not None and first <= lo):
+                    break
+            out = {k: v[-limit:] for k, v in out.items()}
+        frame = pd.DataFrame({"date": out["ts"].astype("datetime64[s]"), **{c: out[c] for c in COLUMNS}})
+        return frame
+
+    def ingest_csv(self, path: str, ticker: str | None = None, tz: str | None = None, chunksize: int = 1_000_000) -> int:
+        """
+        Bulk-load a CSV of bars: a timestamp column (Datetime/Timestamp/Date), an
+        optional Ticker column (else `ticker`), and Open/High/Low/Close/Volume.
+        Naive timestamps are read in `tz` (default UTC). Read in chunks.
+        """
+        total = 0
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            chunk.columns = [c.strip().lower() for c in chunk.columns]
+            time_col = next((c for c in ("datetime", "timestamp", "date", "time") if c in chunk.columns), None)
+            if time_col is None:
+                raise ValueError("CSV needs a Datetime, Timestamp or Date column")
+            if "ticker" not in chunk.columns:
+                if not ticker:
+                    raise ValueError("CSV has no Ticker column; pass a ticker")
+                chunk["ticker"] = ticker
+            stamps = pd.to_datetime(chunk[time_col])
+            if stamps.dt.tz is None:
+                stamps = stamps.dt.tz_localize(tz or "UTC")
+            chunk["ts"] = stamps.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[s]").astype(np.int64)
+            chunk["ticker"] = chunk["ticker"].astype(str).str.upper().str.strip()
+            for name, group in chunk.groupby("ticker", sort=False):
+                total += self.write(name, {"ts": group["ts"].to_numpy(), **{c: group[c].to_numpy() for c in COLUMNS}})
+        return total
+
+
+def _epoch(value) -> int:
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert("UTC").tz_localize(None)
+    return int(stamp.to_datetime64().astype("datetime64[s]").astype(np.int64))
+
+
+def _concat(parts: list, lo: int | None, hi: int | None) -> dict:
+    if not parts:
+        return {k: np.zeros(0, dtype=t) for k, t in DTYPES.items()}
+    out = {k: np.concatenate([p[k] for p in parts]) for k in DTYPES}
+    if lo is not None or hi is not None:
+        ts = out["ts"]
+        mask = np.ones(len(ts), dtype=bool)
+        if lo is not None:
+            mask &= ts >= lo
+        if hi is not None:
+            mask &= ts < hi
+        out = {k: v[mask] for k, v in out.items()}
+    return out
@@ -0,0 +1,244 @@
+"""
+Benchmark suite for the hot paths on a seeded synthetic dataset.
+
+Each case runs at every (tickers × years) size and records the median wall time
+over `repeat` runs. Results are plain JSON so they can be stored as baselines and
+compared later (compare() flags cases slower than baseline by more than a threshold).
+
+Pure-function cases (indicators per ticker and panel, all extended features, predict, fuse, fundamental score, sentiment,
+build_sequences, a streaming-engine replay) run over every ticker. DB-backed cases (backtest command, the
+analyze view) run on up to `max_db_tickers` tickers per size, in whatever database
+is active; the benchmark command points that at a throwaway test database.
+Model artifacts are trained into a temporary directory, never over the real ones.
+"""
+import datetime as dt
+import io
+import os
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
+TRADING_DAYS = 252
+
+POS_WORDS = ["gain", "surge", "record", "profit", "growth", "upgrade", "strong"]
+NEG_WORDS = ["drop", "plunge", "loss", "decline", "downgrade", "lawsuit", "weak"]
+FILLER = ["shares", "company", "quarter", "market", "investors", "report", "outlook", "today"]
+
+
+def synthetic_prices(n_tickers: int, years: int, seed: int = 42) -> pd.DataFrame:
+    """Long OHLCV frame (ticker, date, open, high, low, close, volume) from seeded GBM paths."""
+    rng = np.random.default_rng(seed)
+    n_days = max(1, years) * TRADING_DAYS
+    dates = pd.bdate_range("2000-01-03", periods=n_days)
+    rets = rng.normal(0.0003, 0.015, size=(n_tickers, n_days))
+    close = 100.0 * np.exp(np.cumsum(rets, axis=1))
+    spread = np.abs(rng.normal(0, 0.005, size=close.shape))
+    return pd.DataFrame({
+        "ticker": np.repeat([f"T{i:04d}" for i in range(n_tickers)], n_days),
+        "date": np.tile(dates.values, n_tickers),
+        "open": (close * (1 + rng.normal(0, 0.003, size=close.shape))).ravel(),
+        "high": (close * (1 + spread)).ravel(),
+        "low": (close * (1 - spread)).ravel(),
+        "close": close.ravel(),
+        "volume": rng.integers(1_000_000, 5_000_000, size=close.size),
+    })
+
+
+def synthetic_headlines(tickers: list[str], per_ticker: int = 10, seed: int = 42) -> dict[str, list[str]]:
+    rng = np.random.default_rng(seed)
+    vocab = POS_WORDS + NEG_WORDS + FILLER * 2
+    return {
+        t: [" ".join(rng.choice(vocab, size=8)) for _ in range(per_ticker)]
+        for t in tickers
+    }
+
+
+@contextmanager
+def patched(obj, attr: str, value):
+    """Temporarily replace a module attribute (e.g. a model path constant)."""
+    old = getattr(obj, attr)
+    setattr(obj, attr, value)
+    try:
+        yield
+    finally:
+        setattr(obj, attr, old)
+
+
+@contextmanager
+def synthetic_models(seed: int = 42):
+    """
+    Train the technical and sentiment models on synthetic data into a temporary
+    directory and point the pipeline at them; yields the technical model path.
+    """
+    from analysis_app import pipeline, sentiment_model
+    from analysis_app.indicators import compute_indicators
+    from analysis_app.ml_train import add_labels, train_save
+
+    workdir = tempfile.mkdtemp(prefix="cleartrade-bench-")
+    model_path = os.path.join(workdir, "analysis_model.joblib")
+    with patched(sentiment_model, "SENTIMENT_MODEL_PATH", os.path.join(workdir, "sentiment_model.joblib")), \
+            patched(sentiment_model, "SENTIMENT_VECTORIZER_PATH", os.path.join(workdir, "sentiment_vectorizer.joblib")), \
+            patched(pipeline, "MODEL_PATH", model_path):
+        train_df = synthetic_prices(1, 5, seed)
+        train_df = add_labels(compute_indicators(train_df.drop(columns="ticker")))
+        train_save(train_df, model_path, model_type="logreg")
+        train_headlines = synthetic_headlines([f"S{i}" for i in range(200)], 10, seed)
+        sentiment_model.train_sentiment_model([h for hs in train_headlines.values() for h in hs])
+        yield model_path
+
+
+def _median_seconds(fn, repeat: int) -> float:
+    times = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def seed_db(prices: pd.DataFrame, headlines: dict[str, list[str]]) -> None:
+    from core.models import StockPrice, FundamentalMetric, NewsHeadline, Recommendation
+
+    for model in (StockPrice, FundamentalMetric, NewsHeadline, Recommendation):
+        model.objects.all().delete()
+    StockPrice.objects.bulk_create(
+        [
+            StockPrice(ticker=r.ticker, date=r.date.date(), open=r.open, high=r.high, low=r.low, close=r.close, volume=int(r.volume))
+            for r in prices.itertuples(index=False)
+        ],
+        batch_size=5000,
+    )
+    today = dt.date.today()
+    FundamentalMetric.objects.bulk_create(
+        [FundamentalMetric(ticker=t, period_end=today, pe_ratio=20.0, earnings_growth=0.12, revenue_growth=0.08) for t in headlines]
+    )
+    NewsHeadline.objects.bulk_create(
+        [NewsHeadline(ticker=t, date=today, headline=h) for t, hs in headlines.items() for h in hs],
+        batch_size=5000,
+    )
+
+
+def run_suite(
+    ticker_sizes=(1, 10, 100),
+    year_sizes=(1, 5),
+    repeat: int = 3,
+    seed: int = 42,
+    with_db: bool = True,
+    max_db_tickers: int = 10,
+    log=print,
+) -> dict:
+    """Run every case at every size; returns {"meta": ..., "results": {case_key: {...}}}."""
+    from analysis_app import sentiment_model
+    from analysis_app.agent import compute_fundamental_score, fuse, predict
+    from analysis_app.indicators import ALL_FEATURES, compute_features, compute_indicators, compute_indicators_long
+    from analysis_app.lstm_model import build_sequences
+    from analysis_app.ml_train import add_labels
+    from analysis_app.streaming import StreamingEngine, replay_source
+
+    results: dict = {}
+
+    def record(case: str, n_t: int, years: int, seconds: float, items: int):
+        key = f"{case}[t={n_t},y={years}]"
+        results[key] = {"case": case, "tickers": n_t, "years": years, "items": items, "seconds": seconds}
+        log(f"  {key:45s} {seconds * 1000:10.2f} ms  ({items} items)")
+
+    with synthetic_models(seed) as model_path:
+        for years in year_sizes:
+            for n_t in ticker_sizes:
+                prices = synthetic_prices(n_t, years, seed)
+                frames = [g.drop(columns="ticker") for _, g in prices.groupby("ticker", sort=False)]
+                tickers = list(prices["ticker"].unique())
+                headlines = synthetic_headlines(tickers, 10, seed)
+
+                record("compute_indicators", n_t, years,
+                       _median_seconds(lambda: [compute_indicators(f) for f in frames], repeat), len(frames))
+                record("compute_indicators_panel", n_t, years,
+                       _median_seconds(lambda: compute_indicators_long(prices), repeat), len(frames))
+                record("compute_features.all", n_t, years,
+                       _median_seconds(lambda: [compute_features(f, ALL_FEATURES) for f in frames], repeat), len(frames))
+                with_ind = [compute_indicators(f) for f in frames]
+                latest = [{k: float(v) for k, v in d[FEATURES].iloc[-1].items()} for d in with_ind]
+
+                record("agent.predict", n_t, years,
+                       _median_seconds(lambda: [predict(model_path, x) for x in latest], repeat), len(latest))
+                preds = [predict(model_path, x) for x in latest]
+                record("fuse", n_t, years,
+                       _median_seconds(lambda: [fuse(s, c, 20.0, 0.12, 0.08, 0.1, probs=p) for s, c, p in preds], repeat),
+                       len(preds))
+                fund_inputs = [(10.0 + i % 40, 0.2 - (i % 5) * 0.1, 0.1 - (i % 3) * 0.1) for i in range(n_t)]
+                record("compute_fundamental_score", n_t, years,
+                       _median_seconds(lambda: [compute_fundamental_score(*a) for a in fund_inputs], repeat), n_t)
+                record("score_sentiment.keyword", n_t, years,
+                       _median_seconds(lambda: [sentiment_model._score_keyword_fallback(h) for h in headlines.values()], repeat),
+                       n_t)
+                record("score_sentiment.tfidf", n_t, years,
+                       _median_seconds(lambda: [sentiment_model.score_sentiment_tfidf_lr(h) for h in headlines.values()], repeat),
+                       n_t)
+                labeled = [add_labels(d) for d in with_ind]
+                record("build_sequences", n_t, years,
+                       _median_seconds(lambda: [build_sequences(d) for d in labeled], repeat), len(labeled))
+                bars = list(replay_source(prices))
+                record("stream_replay", n_t, years,
+                       _median_seconds(lambda: StreamingEngine(model_path, context=False).run(bars), repeat), len(bars))
+
+                if with_db:
+                    _run_db_cases(record, prices, headlines, n_t, years, repeat, max_db_tickers, model_path)
+
+    return {
+        "meta": {
+            "created": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _run_db_cases(record, prices, headlines, n_t, years, repeat, max_db_tickers, model_path):
+    from django.core.management import call_command
+    from django.test import Client
+    from analysis_app.management.commands import backtest_recommendations
+
+    db_tickers = list(headlines)[:max_db_tickers]
+    seed_db(prices[prices["ticker"].isin(db_tickers)], {t: headlines[t] for t in db_tickers})
+
+    days = min(years * TRADING_DAYS, TRADING_DAYS)
+    with patched(backtest_recommendations, "MODEL_PATH", model_path):
+        record("backtest_recommendations", n_t, years,
+               _median_seconds(
+                   lambda: [call_command("backtest_recommendations", ticker=t, days=days, full=True, stdout=io.StringIO())
+                            for t in db_tickers],
+                   repeat),
+               len(db_tickers))
+
+    client = Client()
+    record("analyze_view", n_t, years,
+           _median_seconds(lambda: [client.get("/api/analyze", {"ticker": t}) for t in db_tickers], repeat),
+           len(db_tickers))
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list[dict]:
+    """
+    Cases present in both runs whose time grew by more than `threshold`
+    (0.2 = 20% slower). Sorted worst first.
+    """
+    regressions = []
+    base = baseline.get("results", {})
+    for key, cur in current.get("results", {}).items():
+        old = base.get(key)
+        if not old or old.get("seconds", 0) <= 0:
+            continue
+        ratio = cur["seconds"] / old["seconds"]
+        if ratio > 1.0 + threshold:
+            regressions.append({"case": key, "baseline": old["seconds"], "current": cur["seconds"], "ratio": ratio})
+    return sorted(regressions, key=lambda r: r["ratio"], reverse=True)
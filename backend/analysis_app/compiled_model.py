@@ -0,0 +1,156 @@
+"""
+Dependency-free scorer for the technical model (analysis_model.joblib).
+
+ml_train.train_save exports a compact artifact next to the joblib model, as a
+directory of raw .npy files that workers memory-map (see model_store):
+- Logistic Regression: coefficients + intercepts (softmax / sigmoid).
+- Random Forest: all trees flattened into shared node arrays
+  (children, feature, threshold, leaf class distribution).
+
+CompiledModel.predict_proba scores one row or a batch with plain NumPy, so serving
+does not need sklearn or joblib's thread pool. agent.predict uses it when present.
+"""
+import os
+import numpy as np
+
+from analysis_app.model_store import artifact_mtime, load_npy_dir, save_npy_dir
+
+KIND_LOGREG = "logreg"
+KIND_FOREST = "forest"
+
+# model_path -> (mtime_ns, CompiledModel)
+_CACHE: dict = {}
+
+
+def compiled_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".compiled"
+
+
+def export_compiled(model, model_path: str) -> str | None:
+    """Write the compiled artifact for a fitted LogisticRegression / RandomForestClassifier."""
+    out = compiled_path(model_path)
+    classes = np.asarray(model.classes_)
+    if hasattr(model, "coef_"):
+        multi_class = getattr(model, "multi_class", "auto")
+        return save_npy_dir(
+            out,
+            {
+                "classes": classes,
+                "coef": np.asarray(model.coef_, dtype=np.float64),
+                "intercept": np.asarray(model.intercept_, dtype=np.float64),
+            },
+            meta={"kind": KIND_LOGREG, "ovr": multi_class == "ovr"},
+        )
+    if hasattr(model, "estimators_"):
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            t = est.tree_
+            n = t.node_count
+            is_leaf = t.children_left == -1
+            left.append(np.where(is_leaf, -1, t.children_left + offset))
+            right.append(np.where(is_leaf, -1, t.children_right + offset))
+            feature.append(np.where(is_leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            v = t.value[:, 0, :].astype(np.float64)
+            v = v / np.maximum(v.sum(axis=1, keepdims=True), 1e-300)
+            value.append(v)
+            roots.append(offset)
+            offset += n
+        return save_npy_dir(
+            out,
+            {
+                "classes": classes,
+                "left": np.concatenate(left).astype(np.int32),
+                "right": np.concatenate(right).astype(np.int32),
+                "feature": np.concatenate(feature).astype(np.int32),
+                "threshold": np.concatenate(threshold).astype(np.float64),
+                "value": np.concatenate(value),
+                "roots": np.asarray(roots, dtype=np.int32),
+            },
+            meta={"kind": KIND_FOREST},
+        )
+    return None
+
+
+class CompiledModel:
+    """predict_proba-compatible scorer over an exported artifact."""
+
+    def __init__(self, arrays, meta):
+        # Arrays may be read-only memory maps shared with other workers; never mutate them.
+        self.kind = meta["kind"]
+        self.classes_ = arrays["classes"]
+        if self.kind == KIND_LOGREG:
+            self.coef = arrays["coef"]
+            self.intercept = arrays["intercept"]
+            self.ovr = bool(meta.get("ovr", False))
+        else:
+            self.left = arrays["left"]
+            self.right = arrays["right"]
+            self.feature = arrays["feature"]
+            self.threshold = arrays["threshold"]
+            self.value = arrays["value"]
+            self.roots = arrays["roots"]
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if self.kind == KIND_LOGREG:
+            return self._logreg_proba(X)
+        return self._forest_proba(X)
+
+    def _logreg_proba(self, X: np.ndarray) -> np.ndarray:
+        z = X @ self.coef.T + self.intercept
+        if z.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if self.ovr:
+            p = 1.0 / (1.0 + np.exp(-z))
+            return p / p.sum(axis=1, keepdims=True)
+        z = z - z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def _forest_proba(self, X: np.ndarray) -> np.ndarray:
+        # sklearn trees compare float32 features against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        n_rows, n_trees = len(X), len(self.roots)
+        n_features = X.shape[1]
+        flat_x = X.ravel()
+        # Walk every (row, tree) pair down one level per step, dropping pairs that hit a leaf.
+        node = np.tile(self.roots, n_rows)
+        slot = np.arange(n_rows * n_trees)
+        base = np.repeat(np.arange(n_rows) * n_features, n_trees)
+        leaf = np.empty(n_rows * n_trees, dtype=node.dtype)
+        while len(node):
+            left = self.left[node]
+            done = left == -1
+            if done.any():
+                leaf[slot[done]] = node[done]
+                keep = ~done
+                node, slot, base, left = node[keep], slot[keep], base[keep], left[keep]
+            go_left = flat_x[base + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, left, self.right[node])
+        return self.value[leaf].reshape(n_rows, n_trees, -1).mean(axis=1)
+
+
+def load_compiled(model_path: str) -> CompiledModel | None:
+    """
+    Load (and cache per file version) the compiled artifact for model_path.
+    Returns None if it is missing or older than the joblib model (stale export).
+    """
+    path = compiled_path(model_path)
+    mtime = artifact_mtime(path)
+    if mtime is None:
+        return None
+    model_mtime = artifact_mtime(model_path)
+    if model_mtime is not None and model_mtime > mtime:
+        return None
+    cached = _CACHE.get(model_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    loaded = load_npy_dir(path)
+    if loaded is None:
+        return None
+    compiled = CompiledModel(*loaded)
+    _CACHE[model_path] = (mtime, compiled)
+    return compiled
@@ -1,59 +1,154 @@
 """
 Explainability (paper §4, §6.4, §7): SHAP values and feature importance.
+
+Models, explainers and per-class importances are cached per model version
+(path + mtime), so retraining invalidates them but requests reuse them.
+For the Logistic Regression baseline, SHAP values are computed in closed form
+against the training-feature mean stored next to the model by ml_train.
 """
+import os
 import numpy as np
 import joblib
 from typing import List
 
+from analysis_app.model_store import dump_joblib, load_joblib
+
 FEATURE_NAMES = ["ma_10", "ma_30", "rsi", "volatility"]
 
+# model_path -> (version, {"model": ..., "importance": ..., "background": ..., "explainer": ...})
+_CACHE: dict = {}
 
-def get_feature_importance(model_path: str, feats: dict, probs: List[float]) -> dict | None:
-    """Coefficients or tree feature_importances_ for the predicted class."""
-    try:
-        model = joblib.load(model_path)
-        idx = probs.index(max(probs)) if probs else 0
+
+def background_path(model_path: str) -> str:
+    """Sidecar file holding the mean training feature vector (linear SHAP background)."""
+    return os.path.splitext(model_path)[0] + ".background.joblib"
+
+
+def save_background(model_path: str, X: np.ndarray) -> None:
+    """Store the training-feature mean for closed-form linear SHAP."""
+    dump_joblib(np.asarray(X, dtype=float).mean(axis=0), background_path(model_path))
+
+
+def _model_version(model_path: str):
+    st = os.stat(model_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _entry(model_path: str) -> dict:
+    """Cached model + derived explainability state for the current model version."""
+    version = _model_version(model_path)
+    cached = _CACHE.get(model_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    entry = {"model": load_joblib(model_path)}
+    bg = background_path(model_path)
+    entry["background"] = np.asarray(joblib.load(bg), dtype=float) if os.path.isfile(bg) else None
+    _CACHE[model_path] = (version, entry)
+    return entry
+
+
+def _class_importance(entry: dict):
+    """Per-class absolute coefficients (2-D) or tree importances (1-D), computed once per model."""
+    if "importance" not in entry:
+        model = entry["model"]
         if hasattr(model, "coef_"):
-            row = model.coef_[idx] if getattr(model.coef_, "ndim", 1) > 1 else model.coef_
-            try:
-                imp = [float(abs(c)) for c in row]
-            except TypeError:
-                imp = [float(abs(row))] if isinstance(row, (int, float)) else []
+            entry["importance"] = np.abs(np.atleast_2d(np.asarray(model.coef_, dtype=float)))
         elif hasattr(model, "feature_importances_"):
-            imp = model.feature_importances_.tolist()
+            entry["importance"] = np.asarray(model.feature_importances_, dtype=float)
         else:
-            imp = []
-        if imp:
-            return dict(zip(FEATURE_NAMES, imp))
+            entry["importance"] = None
+    return entry["importance"]
+
+
+def get_feature_importance(
+    model_path: str, feats: dict, probs: List[float], feature_names: List[str] | None = None
+) -> dict | None:
+    """Coefficients or tree feature_importances_ for the predicted class."""
+    feature_names = feature_names or FEATURE_NAMES
+    try:
+        imp = _class_importance(_entry(model_path))
+        if imp is None:
+            return None
+        if imp.ndim > 1:
+            idx = probs.index(max(probs)) if probs else 0
+            imp = imp[idx] if idx < len(imp) else imp[0]
+        if len(imp):
+            return dict(zip(feature_names, [float(v) for v in imp]))
     except Exception:
         pass
     return None
 
 
-def get_shap_values(model_path: str, feats: dict, feature_names: List[str] | None = None) -> dict | None:
+def _linear_shap(entry: dict, X: np.ndarray) -> np.ndarray | None:
     """
-    SHAP values for the current prediction (paper §4, §7).
-    TreeExplainer for Random Forest only (requires shap package).
+    Exact SHAP for a linear model in log-odds space (independent features):
+    phi[i, j] = coef[k_i, j] * (X[i, j] - mean_j), with k_i the predicted class.
     """
-    feature_names = feature_names or FEATURE_NAMES
+    model = entry["model"]
+    background = entry["background"]
+    if background is None or len(background) != X.shape[1]:
+        return None
+    coef = np.atleast_2d(np.asarray(model.coef_, dtype=float))
+    if coef.shape[0] == 1:
+        k = np.zeros(len(X), dtype=int)
+    else:
+        k = np.argmax(model.predict_proba(X), axis=1)
+    return coef[k] * (X - background)
+
+
+def _tree_shap(entry: dict, X: np.ndarray) -> np.ndarray | None:
     try:
         import shap
     except ImportError:
         return None
+    model = entry["model"]
+    if entry.get("explainer") is None:
+        entry["explainer"] = shap.TreeExplainer(model)
+    shap_vals = entry["explainer"].shap_values(X)
+    k = np.argmax(model.predict_proba(X), axis=1)
+    rows = np.arange(len(X))
+    if isinstance(shap_vals, list):
+        # Older shap: one (n, features) array per class
+        return np.stack(shap_vals, axis=-1)[rows, :, k]
+    shap_vals = np.asarray(shap_vals)
+    if shap_vals.ndim == 3:
+        # Newer shap: (n, features, classes)
+        return shap_vals[rows, :, k]
+    return shap_vals
+
+
+def get_shap_values_batch(
+    model_path: str, X: np.ndarray, feature_names: List[str] | None = None
+) -> np.ndarray | None:
+    """
+    SHAP values for many rows at once, shape (n_rows, n_features), each row
+    explaining its own predicted class. Closed-form for Logistic Regression,
+    cached TreeExplainer for Random Forest (requires shap package).
+    """
+    feature_names = feature_names or FEATURE_NAMES
     try:
-        model = joblib.load(model_path)
-        if not hasattr(model, "feature_importances_"):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[1] != len(feature_names):
             return None
-        x = np.array([[feats.get(f, 0) for f in feature_names]])
-        explainer = shap.TreeExplainer(model)
-        shap_vals = explainer.shap_values(x)
-        if isinstance(shap_vals, list):
-            pred_idx = int(np.argmax(model.predict_proba(x)[0]))
-            shap_vals = shap_vals[pred_idx][0]
-        else:
-            shap_vals = shap_vals[0]
-        if shap_vals is not None and len(shap_vals) == len(feature_names):
-            return dict(zip(feature_names, [float(v) for v in shap_vals]))
+        entry = _entry(model_path)
+        model = entry["model"]
+        if hasattr(model, "coef_"):
+            return _linear_shap(entry, X)
+        if hasattr(model, "feature_importances_"):
+            return _tree_shap(entry, X)
     except Exception:
         pass
     return None
+
+
+def get_shap_values(model_path: str, feats: dict, feature_names: List[str] | None = None) -> dict | None:
+    """
+    SHAP values for the current prediction (paper §4, §7).
+    Closed-form linear SHAP for Logistic Regression; TreeExplainer for Random Forest.
+    """
+    feature_names = feature_names or FEATURE_NAMES
+    x = np.array([[feats.get(f, 0) for f in feature_names]])
+    shap_vals = get_shap_values_batch(model_path, x, feature_names)
+    if shap_vals is None or shap_vals.shape[-1] != len(feature_names):
+        return None
+    return dict(zip(feature_names, [float(v) for v in shap_vals[0]]))
@@ -0,0 +1,257 @@
+"""
+Fusion threshold sweep: evaluate thousands of agent.fuse_many threshold
+combinations over historical technical probabilities, fundamental scores and
+sentiment in one broadcast pass.
+
+load_history() scores every (ticker, day) of stored history with the technical
+model (panel indicators, one predict_proba call) and attaches the fundamental
+score and news sentiment known on that day plus the next-day return. sweep()
+groups rows that no threshold in the grid can tell apart, broadcasts the grid
+(combinations × row groups) through fuse_many in chunks and reports, per
+combination:
+
+- hit_rate: share of days where the signal matched the next-day move, using the
+  same ±0.5% band as the training labels and backtest_recommendations
+  (BUY → up, SELL → down, HOLD → flat);
+- trade_hit_rate: the same over BUY/SELL days only;
+- avg_return / total_return / return_per_trade: next-day return of going long on
+  BUY, short on SELL and flat on HOLD;
+- buy_pct / hold_pct / sell_pct: the signal mix.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from core.models import StockPrice, FundamentalMetric, NewsHeadline
+from analysis_app import agent
+from analysis_app.agent import compute_fundamental_score_many, fuse_many, load_model, model_features
+from analysis_app.indicators import compute_indicators_long, price_columns
+from analysis_app.sentiment import score_sentiment_many
+
+# fuse_many keyword -> current rule value
+THRESHOLDS = {
+    "buy_prob_threshold": agent.BUY_PROB_THRESHOLD,
+    "fundamental_threshold": agent.FUNDAMENTAL_SCORE_THRESHOLD,
+    "sentiment_threshold": agent.SENTIMENT_THRESHOLD,
+    "sell_fundamental_threshold": agent.SELL_FUNDAMENTAL_THRESHOLD,
+    "sell_sentiment_threshold": agent.SELL_SENTIMENT_THRESHOLD,
+}
+METRICS = (
+    "hit_rate", "trade_hit_rate", "avg_return", "total_return", "return_per_trade",
+    "buy_pct", "hold_pct", "sell_pct", "trades",
+)
+RETURN_BAND = 0.005  # same band as ml_train.add_labels
+MAX_CELLS = 5_000_000  # combinations × row groups evaluated per chunk
+
+
+def threshold_grid(**values) -> pd.DataFrame:
+    """
+    Cartesian product of threshold values, one row per combination.
+    Keywords are THRESHOLDS names; any left out stay at the current rule value.
+    """
+    unknown = set(values) - set(THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Unknown thresholds {sorted(unknown)}; choose from {list(THRESHOLDS)}")
+    axes = [np.atleast_1d(np.asarray(values.get(k, v), dtype=np.float64)) for k, v in THRESHOLDS.items()]
+    return pd.DataFrame(list(itertools.product(*axes)), columns=list(THRESHOLDS))
+
+
+def _bins(values: np.ndarray, thresholds) -> np.ndarray:
+    """
+    Position of each value among the sorted thresholds (-1 = missing). Rows with the
+    same position compare identically (>=, <) against every threshold.
+    """
+    edges = np.unique(np.asarray(thresholds, dtype=np.float64))
+    pos = np.searchsorted(edges, np.nan_to_num(values, nan=0.0), side="right")
+    return np.where(np.isnan(values), -1, pos)
+
+
+def _compress(sig, pb, fs, s, grid: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Group rows that no threshold in `grid` can tell apart (same technical signal and
+    same position of prob_buy, fundamental score and sentiment among the thresholds
+    they are compared with). fuse_many gives every row of a group the same signal,
+    so each combination only needs to be evaluated once per group.
+    Returns (index of the first row of each group, group of each row).
+    """
+    fs_edges = np.r_[grid["fundamental_threshold"], grid["sell_fundamental_threshold"]]
+    # fuse_many also compares sentiment with 0 (SELL vs HOLD on conflict)
+    s_edges = np.r_[grid["sentiment_threshold"], grid["sell_sentiment_threshold"], 0.0]
+    keys = [sig.astype(np.int64), _bins(pb, grid["buy_prob_threshold"]), _bins(fs, fs_edges), _bins(s, s_edges)]
+    key = np.zeros(len(sig), dtype=np.int64)
+    for k in keys:
+        k = k - k.min() if len(k) else k
+        key = key * (int(k.max()) + 1 if len(k) else 1) + k
+    _, first, group = np.unique(key, return_index=True, return_inverse=True)
+    return first, group.ravel()
+
+
+def sweep(
+    signal_idx,
+    conf,
+    prob_buy,
+    fundamental_score,
+    sentiment,
+    forward_return,
+    grid: pd.DataFrame,
+    max_cells: int = MAX_CELLS,
+) -> pd.DataFrame:
+    """
+    Evaluate every row of `grid` (see threshold_grid) over the history arrays
+    (length n; NaN = missing fundamentals/sentiment). Returns `grid` with METRICS added.
+
+    Rows are first grouped by _compress, then fuse_many runs on a
+    (combinations × groups) broadcast and the metrics are weighted sums per group.
+    """
+    sig = np.asarray(signal_idx)
+    conf = np.asarray(conf, dtype=np.float64)
+    pb = np.asarray(prob_buy, dtype=np.float64)
+    fs = np.asarray(fundamental_score, dtype=np.float64)
+    s = np.asarray(sentiment, dtype=np.float64)
+    ret = np.asarray(forward_return, dtype=np.float64)
+    n = ret.size
+
+    first, group = _compress(sig, pb, fs, s, grid)
+    size = np.bincount(group, minlength=len(first)).astype(np.float64)
+    n_up = np.bincount(group, weights=ret > RETURN_BAND, minlength=len(first))
+    n_down = np.bincount(group, weights=ret < -RETURN_BAND, minlength=len(first))
+    n_flat = size - n_up - n_down
+    ret_sum = np.bincount(group, weights=ret, minlength=len(first))
+    rep = {"sig": sig[first], "conf": conf[first], "pb": pb[first], "fs": fs[first], "s": s[first]}
+
+    out = {m: np.zeros(len(grid)) for m in METRICS}
+    chunk = max(1, max_cells // max(len(first), 1))
+    for start in range(0, len(grid), chunk):
+        rows = slice(start, start + chunk)
+        thresholds = {k: grid[k].to_numpy(dtype=np.float64)[rows, None] for k in THRESHOLDS}
+        final, _ = fuse_many(rep["sig"], rep["conf"], rep["pb"], rep["fs"], rep["s"], **thresholds)
+        buy = (final == 2).astype(np.float64)
+        sell = (final == 0).astype(np.float64)
+        hold = 1.0 - buy - sell
+        n_buy, n_sell = buy @ size, sell @ size
+        trade_hits = buy @ n_up + sell @ n_down
+        total = buy @ ret_sum - sell @ ret_sum
+        trades = n_buy + n_sell
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["hit_rate"][rows] = (trade_hits + hold @ n_flat) / n
+            out["trade_hit_rate"][rows] = np.where(trades > 0, trade_hits / trades, np.nan)
+            out["avg_return"][rows] = total / n
+            out["return_per_trade"][rows] = np.where(trades > 0, total / trades, np.nan)
+            out["buy_pct"][rows] = n_buy / n
+            out["sell_pct"][rows] = n_sell / n
+            out["hold_pct"][rows] = 1.0 - trades / n
+        out["total_return"][rows] = total
+        out["trades"][rows] = trades
+    result = grid.reset_index(drop=True).copy()
+    for m in METRICS:
+        result[m] = out[m]
+    result["trades"] = np.rint(result["trades"]).astype(int)
+    return result
+
+
+def _latest_headlines(tickers) -> dict[str, list[str]]:
+    groups: dict[str, list[str]] = {}
+    for ticker, text in NewsHeadline.objects.filter(ticker__in=tickers).order_by("ticker", "-date").values_list(
+        "ticker", "headline"
+    ):
+        group = groups.setdefault(ticker, [])
+        if len(group) < 10:
+            group.append(text)
+    return groups
+
+
+def _asof(rows: pd.DataFrame, right: pd.DataFrame, on: str, column: str) -> np.ndarray:
+    """right[column] as known on each rows.date (latest right[on] <= date, per ticker)."""
+    if right.empty:
+        return np.full(len(rows), np.nan)
+    left = rows[["ticker", "date"]].assign(_row=np.arange(len(rows))).sort_values("date", kind="stable")
+    right = right.assign(**{on: pd.to_datetime(right[on])}).sort_values(on, kind="stable")
+    merged = pd.merge_asof(left, right[["ticker", on, column]], left_on="date", right_on=on, by="ticker")
+    values = np.full(len(rows), np.nan)
+    values[merged["_row"].to_numpy()] = merged[column].to_numpy(dtype=np.float64)
+    return values
+
+
+def load_history(model_path: str, tickers=None, days: int | None = None, latest_context: bool = False) -> dict:
+    """
+    Per (ticker, day) arrays for sweep(): technical signal/confidence/prob_buy from
+    the model, fundamental_score and sentiment as known that day (NaN if none yet),
+    and the next-day forward_return. `days` keeps the last N scored days per ticker.
+    latest_context=True applies each ticker's latest fundamentals and latest 10
+    headlines to every day instead (like backtest_recommendations --full).
+    """
+    features = model_features(model_path)
+    columns = ["ticker", "date", *price_columns(features)]
+    qs = StockPrice.objects.all()
+    if tickers:
+        qs = qs.filter(ticker__in=tickers)
+    prices = pd.DataFrame(list(qs.values_list(*columns)), columns=columns)
+    prices["date"] = pd.to_datetime(prices["date"])
+
+    # float64: these rows are scored by the model, as compute_features' are when serving
+    df = compute_indicators_long(prices, features=features, dtype=np.float64)
+    df["forward_return"] = df.groupby("ticker", sort=False)["close"].shift(-1) / df["close"] - 1.0
+    df = df.dropna(subset=[*features, "forward_return"])
+    if days:
+        df = df[df.groupby("ticker", sort=False).cumcount(ascending=False) < days]
+    df = df.reset_index(drop=True)
+    names = list(df["ticker"].unique())
+
+    if len(df):
+        probs = np.asarray(load_model(model_path).predict_proba(df[features].to_numpy(dtype=np.float64)))
+    else:
+        probs = np.zeros((0, 3))
+    signal = probs.argmax(axis=1)
+    conf = probs.max(axis=1)
+    prob_buy = probs[:, 2] if probs.shape[1] > 2 else np.where(signal == 2, conf, 0.0)
+
+    fund = pd.DataFrame(
+        list(FundamentalMetric.objects.filter(ticker__in=names).values_list(
+            "ticker", "period_end", "pe_ratio", "earnings_growth", "revenue_growth"
+        )),
+        columns=["ticker", "period_end", "pe", "eg", "rg"],
+    )
+    fund["score"] = compute_fundamental_score_many(
+        *(fund[c].to_numpy(dtype=np.float64) for c in ("pe", "eg", "rg"))
+    )
+    if latest_context:
+        latest = fund.sort_values("period_end").groupby("ticker").last()["score"]
+        fundamental_score = df["ticker"].map(latest).to_numpy(dtype=np.float64)
+        sentiment_by_ticker = pd.Series(score_sentiment_many(_latest_headlines(names)), dtype=np.float64)
+        sentiment = df["ticker"].map(sentiment_by_ticker).to_numpy(dtype=np.float64)
+    else:
+        fundamental_score = _asof(df, fund, "period_end", "score")
+        daily: dict = {}
+        for ticker, day, text in NewsHeadline.objects.filter(ticker__in=names).values_list("ticker", "date", "headline"):
+            daily.setdefault((ticker, day), []).append(text)
+        scores = score_sentiment_many(daily) if daily else {}
+        news = pd.DataFrame(
+            [(t, d, v) for (t, d), v in scores.items()], columns=["ticker", "news_date", "sentiment"]
+        )
+        # Sentiment of the most recent news day on or before each date
+        sentiment = _asof(df, news, "news_date", "sentiment")
+
+    return {
+        "ticker": df["ticker"].to_numpy(),
+        "date": df["date"].to_numpy(),
+        "signal": signal,
+        "confidence": conf,
+        "prob_buy": prob_buy,
+        "fundamental_score": fundamental_score,
+        "sentiment": sentiment,
+        "forward_return": df["forward_return"].to_numpy(dtype=np.float64),
+    }
+
+
+def sweep_history(history: dict, grid: pd.DataFrame, max_cells: int = MAX_CELLS) -> pd.DataFrame:
+    return sweep(
+        history["signal"],
+        history["confidence"],
+        history["prob_buy"],
+        history["fundamental_score"],
+        history["sentiment"],
+        history["forward_return"],
+        grid,
+        max_cells,
+    )
@@ -0,0 +1,245 @@
+"""
+Recommendation history for /api/history and /api/history/export.
+
+Pages use keyset pagination on (created_at, id). The cursor is the position of
+the last row returned, and the next page is "rows after (created_at, id)", served
+from the (ticker, created_at, id) index. Page 1000 then costs the same as page 1,
+and rows inserted meanwhile never shift a page. `fields` is projected in SQL, so
+chart clients never read the long explanation text. compact=True returns
+parallel arrays (one list per field) instead of row objects.
+
+export_chunks() walks the same indexes in EXPORT_CHUNK-row keyset chunks and
+yields NDJSON or CSV text per chunk. A dump of millions of rows therefore holds
+one chunk in memory on every database backend (plain .iterator() still buffers
+the whole result with the default MySQL client).
+"""
+import base64
+import csv
+import datetime as dt
+import io
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.models import Recommendation, RecommendationDaily
+from analysis_app.async_db import db_to_async
+
+FIELDS = (
+    "id", "ticker", "interval", "created_at", "signal", "confidence", "explanation",
+    "ma_10", "ma_30", "rsi", "volatility", "sentiment", "pe_ratio", "earnings_growth", "revenue_growth",
+)
+DEFAULT_FIELDS = ("created_at", "signal", "confidence", "explanation")
+EXPORT_FIELDS = tuple(f for f in FIELDS if f != "explanation")
+DAILY_FIELDS = (
+    "day", "interval", "count", "buy_count", "hold_count", "sell_count", "mean_confidence",
+    "last_signal", "last_confidence", "last_at",
+)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 1000
+EXPORT_CHUNK = 5000
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def parse_fields(value: str | None, default=DEFAULT_FIELDS) -> list[str]:
+    """Comma-separated field names (empty = `default`); raises ValueError for unknown ones."""
+    fields = [f.strip() for f in (value or "").split(",") if f.strip()]
+    if not fields:
+        return list(default)
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; choose from {', '.join(FIELDS)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_time(value: str | None, end: bool = False) -> dt.datetime | None:
+    """
+    ISO date or datetime → aware datetime (naive values are in TIME_ZONE).
+    A bare date as an `end` bound means the end of that day, so start=end=2024-05-01 is one day.
+    """
+    if not value:
+        return None
+    try:
+        # A bare date first: parse_datetime would also accept it, as midnight
+        day = parse_date(value)
+        stamp = parse_datetime(value) if day is None else None
+    except ValueError:
+        day = stamp = None
+    if day is not None:
+        stamp = dt.datetime.combine(day + dt.timedelta(days=1) if end else day, dt.time())
+    elif stamp is None:
+        raise ValueError(f"Bad date {value!r}; use YYYY-MM-DD or an ISO datetime")
+    if timezone.is_naive(stamp):
+        stamp = timezone.make_aware(stamp)
+    return stamp
+
+
+def encode_cursor(created_at: dt.datetime, pk: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit("|", 1)
+        created_at = dt.datetime.fromisoformat(stamp)
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Bad cursor; pass next_cursor from the previous page")
+
+
+def _filtered(ticker: str | None, start, end, interval: str | None):
+    qs = Recommendation.objects.all()
+    if ticker:
+        qs = qs.filter(ticker=ticker)
+    if start is not None:
+        qs = qs.filter(created_at__gte=start)
+    if end is not None:
+        qs = qs.filter(created_at__lt=end)
+    if interval:
+        qs = qs.filter(interval=interval)
+    return qs
+
+
+def _page(qs, columns: list[str], after: tuple | None, limit: int, descending: bool) -> list[tuple]:
+    if after is not None:
+        created_at, pk = after
+        if descending:
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            qs = qs.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    order = ("-created_at", "-id") if descending else ("created_at", "id")
+    return list(qs.order_by(*order).values_list(*columns)[:limit])
+
+
+def history_page(
+    ticker: str,
+    fields=None,
+    start=None,
+    end=None,
+    interval: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    order: str = "desc",
+    compact: bool = False,
+) -> dict:
+    """
+    One page of a ticker's recommendations (newest first unless order="asc").
+    next_cursor is None on the last page. Raises ValueError for bad arguments.
+    """
+    if not ticker:
+        # Pages are per ticker; /api/history/export is the all-tickers dump
+        raise ValueError("ticker is required")
+    fields = list(fields) if fields else list(DEFAULT_FIELDS)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+    after = decode_cursor(cursor) if cursor else None
+    # created_at and id are always read: the cursor is built from them
+    columns = list(dict.fromkeys([*fields, "created_at", "id"]))
+    rows = _page(_filtered(ticker, start, end, interval), columns, after, limit + 1, order == "desc")
+    more = len(rows) > limit
+    rows = rows[:limit]
+    last = dict(zip(columns, rows[-1])) if rows else None
+    payload: dict = {"ticker": ticker}
+    if compact:
+        payload["fields"] = fields
+        payload["columns"] = {f: [r[columns.index(f)] for r in rows] for f in fields}
+    else:
+        payload["history"] = [{f: r[i] for i, f in enumerate(fields)} for r in rows]
+    payload["next_cursor"] = encode_cursor(last["created_at"], last["id"]) if more else None
+    return payload
+
+
+def daily_history(ticker: str, start=None, end=None, interval: str | None = None, limit: int = MAX_LIMIT) -> dict:
+    """
+    A ticker's daily rollups (rows past the retention window, see retention.py),
+    newest day first, as parallel arrays like compact history.
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    qs = RecommendationDaily.objects.filter(ticker=ticker)
+    if start is not None:
+        qs = qs.filter(day__gte=start.date())
+    if end is not None:
+        qs = qs.filter(day__lt=end.date() if end.time() == dt.time() else end.date() + dt.timedelta(days=1))
+    if interval:
+        qs = qs.filter(interval=interval)
+    rows = list(qs.order_by("-day", "interval").values_list(*DAILY_FIELDS)[:limit])
+    return {
+        "ticker": ticker,
+        "fields": list(DAILY_FIELDS),
+        "columns": {f: [r[i] for r in rows] for i, f in enumerate(DAILY_FIELDS)},
+    }
+
+
+def _ndjson(fields: list[str], rows: list[tuple]) -> str:
+    out = []
+    for row in rows:
+        out.append(json.dumps({f: v.isoformat() if isinstance(v, dt.datetime) else v for f, v in zip(fields, row)}))
+    return "\n".join(out) + "\n"
+
+
+def _csv(rows: list[tuple], header: list[str] | None = None) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def export_chunks(
+    ticker: str | None = None,
+    fields=None,
+    start=None,
+    end=None,
+    interval: str | None = None,
+    fmt: str = "ndjson",
+    chunk: int = EXPORT_CHUNK,
+    max_id: int | None = None,
+):
+    """
+    Every matching row, oldest first, as NDJSON or CSV text chunks of up to
+    `chunk` rows (CSV starts with a header row). Fields default to EXPORT_FIELDS.
+    With `max_id`, only rows with id <= max_id.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    fields = list(fields) if fields else list(EXPORT_FIELDS)
+    columns = list(dict.fromkeys([*fields, "created_at", "id"]))
+    qs = _filtered(ticker, start, end, interval)
+    if max_id is not None:
+        qs = qs.filter(id__lte=max_id)
+
+    def chunks():
+        if fmt == "csv":
+            yield _csv([], fields)
+        after = None
+        while True:
+            rows = _page(qs, columns, after, chunk, descending=False)
+            if not rows:
+                return
+            after = rows[-1][columns.index("created_at")], rows[-1][columns.index("id")]
+            rows = [r[:len(fields)] for r in rows]
+            yield _ndjson(fields, rows) if fmt == "ndjson" else _csv(rows)
+            if len(rows) < chunk:
+                return
+
+    return chunks()
+
+
+async def aiter_chunks(chunks):
+    """
+    Serve a sync chunk generator from an async (ASGI) response one chunk at a time;
+    Django would otherwise read a sync streaming iterator to the end before sending.
+    """
+    sentinel = object()
+    step = db_to_async(next)
+    while True:
+        part = await step(chunks, sentinel)
+        if part is sentinel:
+            return
+        yield part
@@ -1,3 +1,8 @@
+import itertools
+import math
+import warnings
+from collections import deque
+
 import numpy as np
 import pandas as pd
 
@@ -16,4 +21,313 @@ def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
     rs = gain / (loss + 1e-9)
     df["rsi"] = 100 - (100 / (1 + rs))
 
-    return df
\ No newline at end of file
+    return df
+
+# ---------------------------------------------------------------------------
+# Feature engine: base and extended OHLCV features for one or many tickers.
+#
+# Each ticker's bars are packed into one column of a (rows × tickers) matrix by
+# position in that ticker's own history, so rolling windows count that ticker's
+# rows exactly like compute_indicators does, whatever its start date, length or
+# gaps. Shorter histories are padded with NaN at the end. Windowed sums come from
+# float64 running sums plus a count of valid rows (NaN whenever a window is not
+# full, as pandas' rolling(n) does); results are returned in `dtype`.
+#
+# Features are computed on demand from a shared set of intermediates (previous
+# close, close delta, returns, EMAs, ...), so asking for MACD and its histogram,
+# or RSI and OBV, computes each intermediate once, and features nobody asked for
+# cost nothing.
+
+BASE_FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
+EXTENDED_FEATURES = [
+    "macd", "macd_signal", "macd_hist", "bb_width", "atr", "obv", "volume_z", "ret_5", "ret_20",
+]
+ALL_FEATURES = BASE_FEATURES + EXTENDED_FEATURES
+# Price columns each feature needs besides close
+FEATURE_INPUTS = {"atr": ("high", "low"), "obv": ("volume",), "volume_z": ("volume",)}
+
+PANEL_COLUMNS = ["ma_10", "ma_30", "ret", "volatility", "rsi"]
+PANEL_BLOCK = 1024  # tickers per block; bounds the float64 temporaries
+
+
+def price_columns(features) -> list[str]:
+    """Price columns (besides date) that must be loaded to compute `features`."""
+    unknown = [f for f in features if f not in ALL_FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}; choose from {ALL_FEATURES}")
+    extra = {c for f in features for c in FEATURE_INPUTS.get(f, ())}
+    return ["close"] + [c for c in ("open", "high", "low", "volume") if c in extra]
+
+
+def _window_sums(x: np.ndarray, window: int, squares: bool = False):
+    valid = ~np.isnan(x)
+    filled = np.where(valid, x, 0.0)
+    csum = np.cumsum(filled, axis=0)
+    count = np.cumsum(valid, axis=0)
+    csum[window:] -= csum[:-window].copy()
+    count[window:] -= count[:-window].copy()
+    if not squares:
+        return csum, count
+    csq = np.cumsum(filled * filled, axis=0)
+    csq[window:] -= csq[:-window].copy()
+    return csum, csq, count
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    total, count = _window_sums(x, window)
+    return np.where(count == window, total / window, np.nan)
+
+
+def _rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    # Variance is shift-invariant; centring first keeps the running sums of squares small
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        x = x - np.nan_to_num(np.nanmean(x, axis=0))
+    total, squares, count = _window_sums(x, window, squares=True)
+    var = np.maximum(squares - total * total / window, 0.0) / (window - 1)
+    return np.where(count == window, np.sqrt(var), np.nan)
+
+
+def _shift(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    out[n:] = x[:-n]
+    return out
+
+
+def _ema(x: np.ndarray, span: int) -> np.ndarray:
+    # pandas' ewm runs column-wise in C; leading NaNs delay the start per column
+    return pd.DataFrame(x).ewm(span=span, adjust=False, min_periods=span).mean().to_numpy()
+
+
+def _ratio(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return a / b
+
+
+def _obv(g) -> np.ndarray:
+    step = np.nan_to_num(np.sign(g("delta")) * g("volume"))
+    return np.where(np.isnan(g("close")), np.nan, np.cumsum(step, axis=0))
+
+
+def _true_range(g) -> np.ndarray:
+    prev = g("prev_close")
+    high, low = g("high"), g("low")
+    return np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+
+
+_GRAPH = {
+    "prev_close": lambda g: _shift(g("close"), 1),
+    "delta": lambda g: g("close") - g("prev_close"),
+    "ret": lambda g: _ratio(g("close"), g("prev_close")) - 1.0,
+    "ret_5": lambda g: _ratio(g("close"), _shift(g("close"), 5)) - 1.0,
+    "ret_20": lambda g: _ratio(g("close"), _shift(g("close"), 20)) - 1.0,
+    "ma_10": lambda g: _rolling_mean(g("close"), 10),
+    "ma_30": lambda g: _rolling_mean(g("close"), 30),
+    "volatility": lambda g: _rolling_std(g("ret"), 14) * np.sqrt(252),
+    "gain": lambda g: _rolling_mean(np.where(np.isnan(g("delta")), np.nan, np.maximum(g("delta"), 0.0)), 14),
+    "loss": lambda g: _rolling_mean(np.where(np.isnan(g("delta")), np.nan, np.maximum(-g("delta"), 0.0)), 14),
+    "rsi": lambda g: 100 - (100 / (1 + g("gain") / (g("loss") + 1e-9))),
+    "macd": lambda g: _ema(g("close"), 12) - _ema(g("close"), 26),
+    "macd_signal": lambda g: _ema(g("macd"), 9),
+    "macd_hist": lambda g: g("macd") - g("macd_signal"),
+    # Bollinger band width: (upper - lower) / middle with ±2 std bands over 20 rows
+    "bb_width": lambda g: _ratio(4.0 * _rolling_std(g("close"), 20), _rolling_mean(g("close"), 20)),
+    "atr": lambda g: _rolling_mean(_true_range(g), 14),
+    "obv": _obv,
+    "volume_z": lambda g: _ratio(g("volume") - _rolling_mean(g("volume"), 20), _rolling_std(g("volume"), 20)),
+}
+
+
+def _feature_block(inputs: dict[str, np.ndarray], names) -> dict[str, np.ndarray]:
+    """Requested features for one packed float64 block; each intermediate computed once."""
+    memo = dict(inputs)
+
+    def g(name):
+        if name not in memo:
+            memo[name] = _GRAPH[name](g)
+        return memo[name]
+
+    return {name: g(name) for name in names}
+
+
+def _panel_packed(packed: dict[str, np.ndarray], names, dtype=np.float32, block: int = PANEL_BLOCK) -> dict[str, np.ndarray]:
+    rows, n = packed["close"].shape
+    out = {c: np.empty((rows, n), dtype=dtype) for c in names}
+    for start in range(0, n, block):
+        cols = slice(start, start + block)
+        inputs = {k: v[:, cols].astype(np.float64) for k, v in packed.items()}
+        for name, values in _feature_block(inputs, names).items():
+            out[name][:, cols] = values
+    return out
+
+
+def _output_names(features) -> list[str]:
+    features = list(features) if features is not None else []
+    price_columns(features)
+    return PANEL_COLUMNS + [f for f in features if f not in PANEL_COLUMNS]
+
+
+def compute_indicators_panel(close: pd.DataFrame, dtype=np.float32) -> dict[str, pd.DataFrame]:
+    """
+    Indicators for a wide close matrix (index = dates, columns = tickers).
+    NaN means "no row for this ticker on this date": each column is computed over
+    its own non-missing rows, so results match compute_indicators on each ticker's
+    rows, and are NaN wherever the input is NaN.
+    Returns {column: DataFrame shaped like `close`} for PANEL_COLUMNS.
+    """
+    values = close.to_numpy(dtype=np.float64)
+    if close.index.size > 1 and not close.index.is_monotonic_increasing:
+        order = np.argsort(close.index.to_numpy(), kind="stable")
+        values = values[order]
+        index = close.index[order]
+    else:
+        index = close.index
+    valid = ~np.isnan(values)
+    pos = np.cumsum(valid, axis=0) - 1
+    rows, cols = np.nonzero(valid)
+    packed = np.full(values.shape, np.nan)
+    packed[pos[rows, cols], cols] = values[rows, cols]
+
+    result = {}
+    for name, arr in _panel_packed({"close": packed}, PANEL_COLUMNS, dtype).items():
+        wide = np.full(values.shape, np.nan, dtype=dtype)
+        wide[rows, cols] = arr[pos[rows, cols], cols]
+        result[name] = pd.DataFrame(wide, index=index, columns=close.columns)
+    return result
+
+
+def compute_indicators_long(
+    df: pd.DataFrame, ticker_col: str = "ticker", dtype=np.float32, features=None
+) -> pd.DataFrame:
+    """
+    Long-frame counterpart of compute_indicators: rows for many tickers
+    (ticker, date, close, ...) in, the same rows sorted by ticker and date with
+    PANEL_COLUMNS (plus any extra `features`, see EXTENDED_FEATURES) added out.
+    One vectorized pass instead of a per-ticker loop.
+    """
+    names = _output_names(features)
+    inputs = price_columns([n for n in names if n in ALL_FEATURES])
+    df = df.sort_values([ticker_col, "date"], kind="stable").reset_index(drop=True)
+    codes, _ = pd.factorize(df[ticker_col], sort=False)
+    if len(df) == 0:
+        return df.assign(**{c: np.array([], dtype=dtype) for c in names})
+    # Rows are grouped by ticker, so position = row index - first row of its ticker
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, len(df)])
+    pos = np.arange(len(df)) - np.repeat(starts, lengths)
+    col = np.repeat(np.arange(len(starts)), lengths)
+
+    packed = {}
+    for name in inputs:
+        packed[name] = np.full((int(lengths.max()), len(starts)), np.nan)
+        packed[name][pos, col] = df[name].to_numpy(dtype=np.float64)
+    for name, arr in _panel_packed(packed, names, dtype).items():
+        df[name] = arr[pos, col]
+    return df
+
+
+def compute_features(df: pd.DataFrame, features=None, dtype=np.float64) -> pd.DataFrame:
+    """
+    One ticker's frame (date, close and, for some extended features, high, low,
+    volume) sorted by date, with PANEL_COLUMNS plus the requested `features`
+    added. The base columns equal compute_indicators' in float64.
+    """
+    names = _output_names(features)
+    df = df.sort_values("date").reset_index(drop=True)
+    inputs = {c: df[c].to_numpy(dtype=np.float64)[:, None] for c in price_columns([n for n in names if n in ALL_FEATURES])}
+    for name, arr in _feature_block(inputs, names).items():
+        df[name] = arr[:, 0].astype(dtype, copy=False)
+    return df
+
+
+class IncrementalFeatures:
+    """
+    One ticker's features updated bar by bar in O(window) time and constant
+    memory, for streaming. update() returns the same values compute_features
+    gives for the latest row of the full history (NaN until a window is full):
+    windows keep the last N inputs and are summed directly, so there is no
+    running-sum drift however long the stream runs.
+    """
+
+    def __init__(self, features=None):
+        self.features = list(features) if features is not None else list(BASE_FEATURES)
+        price_columns(self.features)
+        self.count = 0
+        self.closes = deque(maxlen=31)  # MA-30 and the close 20 bars back
+        self.rets = deque(maxlen=14)
+        self.gains = deque(maxlen=14)
+        self.losses = deque(maxlen=14)
+        self.ranges = deque(maxlen=14)
+        self.volumes = deque(maxlen=20)
+        self.ema_12 = self.ema_26 = self.macd_ema = math.nan
+        self.macd_count = 0
+        self.obv = 0.0
+
+    def update(self, close: float, high: float = math.nan, low: float = math.nan, volume: float = math.nan) -> dict:
+        prev = self.closes[-1] if self.closes else math.nan
+        self.count += 1
+        self.closes.append(close)
+        if self.count > 1:
+            delta = close - prev
+            self.rets.append(close / prev - 1.0 if prev else math.nan)
+            self.gains.append(max(delta, 0.0))
+            self.losses.append(max(-delta, 0.0))
+            self.obv += math.copysign(1.0, delta) * volume if delta and not math.isnan(volume) else 0.0
+        # True range falls back to high - low on the first bar, like np.fmax with a NaN previous close
+        tr = high - low
+        if self.count > 1:
+            tr = max(tr, abs(high - prev), abs(low - prev))
+        self.ranges.append(tr)
+        self.volumes.append(volume)
+        if self.count == 1:
+            self.ema_12 = self.ema_26 = close
+        else:
+            self.ema_12 += (close - self.ema_12) * (2.0 / 13.0)
+            self.ema_26 += (close - self.ema_26) * (2.0 / 27.0)
+        macd = self.ema_12 - self.ema_26 if self.count >= 26 else math.nan
+        if self.count >= 26:
+            self.macd_count += 1
+            self.macd_ema = macd if self.macd_count == 1 else self.macd_ema + (macd - self.macd_ema) * 0.2
+        return {name: self._value(name, close, volume, macd) for name in self.features}
+
+    def _value(self, name: str, close: float, volume: float, macd: float) -> float:
+        closes = self.closes
+        if name == "ma_10":
+            return _window_mean(closes, 10)
+        if name == "ma_30":
+            return _window_mean(closes, 30)
+        if name == "volatility":
+            return _window_std(self.rets, 14) * math.sqrt(252)
+        if name == "rsi":
+            if len(self.gains) < 14:
+                return math.nan
+            return 100 - (100 / (1 + (sum(self.gains) / 14) / (sum(self.losses) / 14 + 1e-9)))
+        if name in ("macd", "macd_signal", "macd_hist"):
+            signal = self.macd_ema if self.macd_count >= 9 else math.nan
+            return {"macd": macd, "macd_signal": signal, "macd_hist": macd - signal}[name]
+        if name == "bb_width":
+            mean = _window_mean(closes, 20)
+            return 4.0 * _window_std(closes, 20) / mean if mean else math.nan
+        if name == "atr":
+            return _window_mean(self.ranges, 14)
+        if name == "obv":
+            return self.obv
+        if name == "volume_z":
+            std = _window_std(self.volumes, 20)
+            return (volume - _window_mean(self.volumes, 20)) / std if std else math.nan
+        lag = 5 if name == "ret_5" else 20
+        return close / closes[-lag - 1] - 1.0 if len(closes) > lag and closes[-lag - 1] else math.nan
+
+
+def _window_mean(values: deque, window: int) -> float:
+    if len(values) < window:
+        return math.nan
+    return sum(itertools.islice(values, len(values) - window, None)) / window
+
+
+def _window_std(values: deque, window: int) -> float:
+    if len(values) < window:
+        return math.nan
+    last = list(itertools.islice(values, len(values) - window, None))
+    mean = sum(last) / window
+    return math.sqrt(sum((v - mean) * (v - mean) for v in last) / (window - 1))
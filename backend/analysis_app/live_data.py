@@ -2,8 +2,26 @@ import datetime as dt
 
 import pandas as pd
 import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
 
 from core.models import StockPrice, FundamentalMetric, NewsHeadline
+from analysis_app.resilience import CircuitOpenError, negative_cache, yahoo_breaker
+
+# By default yfinance logs network errors and returns an empty frame, which looks
+# exactly like "no data for this ticker". Raise them instead, so they count as
+# breaker failures and never reach the negative cache.
+yf.config.debug.hide_exceptions = False
+
+
+def _download_history(ticker: str, start: dt.date, end: dt.date) -> pd.DataFrame:
+  """
+  Daily bars from Yahoo; an empty frame means Yahoo has no prices for the ticker
+  (typo, delisted). Upstream errors (network, rate limit) are raised.
+  """
+  try:
+    return yf.Ticker(ticker).history(start=start, end=end)
+  except YFTickerMissingError:
+    return pd.DataFrame()
 
 
 def _fetch_prices_from_yahoo(ticker: str, lookback_days: int = 365) -> pd.DataFrame:
@@ -12,16 +30,21 @@ def _fetch_prices_from_yahoo(ticker: str, lookback_days: int = 365) -> pd.DataFr
 
   Normalises columns to a simple one-level index with:
   [date, open, high, low, close, volume].
+
+  The call goes through the Yahoo circuit breaker, where upstream errors count
+  as failures. Only a clean empty answer is remembered in the negative cache
+  (see ensure_prices_for_ticker); an error returns an empty frame uncached.
   """
   end = dt.date.today()
   start = end - dt.timedelta(days=lookback_days)
 
   try:
-    df = yf.download(ticker, start=start, end=end, progress=False)
+    df = yahoo_breaker.call(_download_history, ticker, start, end)
   except Exception:
     return pd.DataFrame()
 
   if df.empty:
+    negative_cache.add(("prices", ticker))
     return df
 
   df = df.reset_index()
@@ -69,6 +92,10 @@ def ensure_prices_for_ticker(ticker: str, min_rows: int = 60) -> bool:
   if existing >= min_rows:
     return True
 
+  # Recently came back empty from Yahoo (typo, delisted): don't ask again until the TTL expires
+  if ("prices", ticker) in negative_cache:
+    return False
+
   df = _fetch_prices_from_yahoo(ticker)
   if df.empty:
     return existing >= min_rows
@@ -126,17 +153,24 @@ def ensure_fundamentals_and_news(ticker: str, max_news: int = 20) -> None:
   has_news = NewsHeadline.objects.filter(ticker=ticker).exists()
   if has_fund and has_news:
     return
+  if ("fundamentals_news", ticker) in negative_cache:
+    return
 
   try:
     y_ticker = yf.Ticker(ticker)
   except Exception:
     return
+  got_any = False
+  failed = False
 
   # Fundamentals
   if not has_fund:
     try:
-      info = y_ticker.info or {}
+      info = yahoo_breaker.call(getattr, y_ticker, "info") or {}
+    except CircuitOpenError:
+      return
     except Exception:
+      failed = True
       info = {}
 
     pe = info.get("trailingPE")
@@ -144,6 +178,7 @@ def ensure_fundamentals_and_news(ticker: str, max_news: int = 20) -> None:
     rg = info.get("revenueGrowth")
 
     if any(v is not None for v in (pe, eg, rg)):
+      got_any = True
       FundamentalMetric.objects.create(
         ticker=ticker,
         period_end=dt.date.today(),
@@ -155,8 +190,11 @@ def ensure_fundamentals_and_news(ticker: str, max_news: int = 20) -> None:
   # News → sentiment
   if not has_news:
     try:
-      news_items = getattr(y_ticker, "news", []) or []
+      news_items = yahoo_breaker.call(getattr, y_ticker, "news", []) or []
+    except CircuitOpenError:
+      return
     except Exception:
+      failed = True
       news_items = []
 
     objs = []
@@ -174,5 +212,10 @@ def ensure_fundamentals_and_news(ticker: str, max_news: int = 20) -> None:
       )
 
     if objs:
+      got_any = True
       NewsHeadline.objects.bulk_create(objs, ignore_conflicts=True)
 
+  # Only cache genuine "no data" answers, not upstream errors
+  if not got_any and not failed:
+    negative_cache.add(("fundamentals_news", ticker))
+
@@ -0,0 +1,259 @@
+"""
+Offline load-testing harness for /api/analyze, /api/history and /api/chat.
+
+The app runs in-process on Django's threaded WSGI server against whatever database
+is active (the loadtest command points that at a seeded throwaway database), with
+live_data's yfinance module swapped for YahooStub so cold tickers exercise the
+live-fetch path without network access. Worker threads drive a weighted endpoint
+mix at a fixed concurrency and every request's latency and status is recorded.
+
+Client and server share one process (and the GIL), so absolute numbers are
+pessimistic; use them to compare builds on the same machine.
+"""
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+ENDPOINTS = ("analyze", "history", "chat")
+CHAT_QUESTIONS = ("Why?", "Confidence?", "RSI?", "Sentiment?")
+
+
+class YahooStubError(Exception):
+    """Raised by YahooStub to simulate a failed Yahoo Finance call."""
+
+
+class YahooStub:
+    """
+    Stand-in for the yfinance module (download() and Ticker()) with configurable
+    latency and failure rate. Prices are seeded GBM paths, so results are repeatable.
+    Tickers starting with UNKNOWN_PREFIX behave like typos/delisted symbols: empty
+    price frame, empty info and no news.
+    """
+
+    UNKNOWN_PREFIX = "UNKNOWN"
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, failure_rate: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"download": 0, "info": 0, "news": 0}
+        self.failures = {"download": 0, "info": 0, "news": 0}
+
+    def _call(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures[kind] += 1
+        time.sleep(delay)
+        if failed:
+            raise YahooStubError(f"simulated Yahoo {kind} failure")
+
+    def download(self, ticker: str, start=None, end=None, progress: bool = False, **kwargs) -> pd.DataFrame:
+        self._call("download")
+        if ticker.startswith(self.UNKNOWN_PREFIX):
+            return pd.DataFrame()
+        end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+        start = pd.Timestamp(start or end - pd.Timedelta(days=365)).normalize()
+        dates = pd.bdate_range(start, end - pd.Timedelta(days=1))
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(dates))))
+        return pd.DataFrame(
+            {
+                "Open": close * (1 + rng.normal(0, 0.003, len(dates))),
+                "High": close * 1.01,
+                "Low": close * 0.99,
+                "Close": close,
+                "Volume": rng.integers(1_000_000, 5_000_000, len(dates)),
+            },
+            index=pd.Index(dates, name="Date"),
+        )
+
+    def Ticker(self, ticker: str) -> "_StubTicker":  # noqa: N802 - mirrors yfinance
+        return _StubTicker(self, ticker)
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "failures": dict(self.failures)}
+
+
+class _StubTicker:
+    def __init__(self, stub: YahooStub, ticker: str):
+        self._stub = stub
+        self.ticker = ticker
+
+    def history(self, start=None, end=None, **kwargs) -> pd.DataFrame:
+        return self._stub.download(self.ticker, start=start, end=end)
+
+    @property
+    def info(self) -> dict:
+        self._stub._call("info")
+        if self.ticker.startswith(YahooStub.UNKNOWN_PREFIX):
+            return {}
+        return {"trailingPE": 22.5, "earningsGrowth": 0.1, "revenueGrowth": 0.07}
+
+    @property
+    def news(self) -> list:
+        self._stub._call("news")
+        if self.ticker.startswith(YahooStub.UNKNOWN_PREFIX):
+            return []
+        return [{"title": f"{self.ticker} shares gain on strong quarter"}, {"title": f"{self.ticker} faces lawsuit"}]
+
+
+@contextmanager
+def stubbed_yahoo(stub: YahooStub):
+    """Route live_data's yfinance calls to `stub` for the duration of the block."""
+    from analysis_app import live_data
+    from analysis_app.benchmarks import patched
+
+    with patched(live_data, "yf", stub):
+        yield stub
+
+
+@contextmanager
+def serve_app():
+    """Run the Django WSGI app on an ephemeral localhost port; yields (host, port)."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        # Headers and body go out in separate writes; with Nagle on, a reused
+        # keep-alive connection waits ~40 ms for the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(get_internal_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """'analyze=1,history=3,chat=1' -> weights per endpoint."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}; expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Connection(http.client.HTTPConnection):
+    """Keep-alive client connection with Nagle off (see serve_app), like a load balancer's pool."""
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def _request(conn: http.client.HTTPConnection, endpoint: str, ticker: str, rng: random.Random) -> int:
+    if endpoint == "chat":
+        body = json.dumps({"ticker": ticker, "question": rng.choice(CHAT_QUESTIONS)})
+        conn.request("POST", "/api/chat", body=body, headers={"Content-Type": "application/json"})
+    else:
+        conn.request("GET", f"/api/{endpoint}?{urlencode({'ticker': ticker})}")
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def run_load(
+    host: str,
+    port: int,
+    tickers: list[str],
+    mix: dict[str, float],
+    requests: int = 500,
+    concurrency: int = 8,
+    seed: int = 42,
+    timeout: float = 30.0,
+) -> dict:
+    """
+    Send `requests` requests split over `concurrency` threads, picking endpoint and
+    ticker at random (seeded). Returns {"seconds", "endpoints": {name: [(latency, status), ...]}}.
+    """
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    plan_rng = random.Random(seed)
+    plan = [(plan_rng.choices(names, weights)[0], plan_rng.choice(tickers)) for _ in range(requests)]
+    samples: dict[str, list] = {n: [] for n in names}
+    lock = threading.Lock()
+    cursor = iter(plan)
+
+    def worker(idx: int):
+        rng = random.Random(seed * 1000 + idx)
+        conn = Connection(host, port, timeout=timeout)
+        while True:
+            with lock:
+                job = next(cursor, None)
+            if job is None:
+                break
+            endpoint, ticker = job
+            start = time.perf_counter()
+            try:
+                status = _request(conn, endpoint, ticker, rng)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = Connection(host, port, timeout=timeout)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[endpoint].append((elapsed, status))
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(max(1, concurrency))]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"seconds": time.perf_counter() - start, "endpoints": samples}
+
+
+def summarize(run: dict) -> dict:
+    """Per-endpoint count, RPS, error rate (non-2xx or connection error) and p50/p95/p99 in ms."""
+    seconds = run["seconds"] or 1e-9
+    out = {}
+    every = []
+    for name, rows in run["endpoints"].items():
+        every.extend(rows)
+        out[name] = _stats(rows, seconds)
+    out["all"] = _stats(every, seconds)
+    return out
+
+
+def _stats(rows: list, seconds: float) -> dict:
+    if not rows:
+        return {"requests": 0, "rps": 0.0, "errors": 0, "error_rate": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    latencies = np.array([r[0] for r in rows]) * 1000.0
+    errors = sum(1 for _, status in rows if not 200 <= status < 300)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(rows),
+        "rps": len(rows) / seconds,
+        "errors": errors,
+        "error_rate": errors / len(rows),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
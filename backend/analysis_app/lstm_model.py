@@ -2,15 +2,22 @@
 LSTM for technical trend prediction (paper §4, §7: temporal dependencies in financial time series).
 Input: sequences of [ma_10, ma_30, rsi, volatility] over SEQUENCE_LEN days.
 Output: BUY/HOLD/SELL probabilities.
+
+Training also exports the weights as raw .npy files (LSTM_WEIGHTS_DIR); inference
+then runs a NumPy forward pass over memory-mapped weights, without loading TensorFlow.
 """
 import os
 import numpy as np
 import pandas as pd
 
+from analysis_app.model_store import load_npy_dir, save_npy_dir
+
 SEQUENCE_LEN = 20
 FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
 LSTM_MODEL_PATH = os.path.join(os.path.dirname(__file__), "lstm_model.keras")
 LSTM_META_PATH = os.path.join(os.path.dirname(__file__), "lstm_meta.joblib")
+LSTM_WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), "lstm_weights")
+LABELS = ["SELL", "HOLD", "BUY"]
 
 
 def build_sequences(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
@@ -60,14 +67,78 @@ def train_lstm(df: pd.DataFrame, epochs: int = 30, batch_size: int = 32) -> str:
     model.fit(X, y, epochs=epochs, batch_size=batch_size, validation_split=0.1, verbose=0)
     model.save(LSTM_MODEL_PATH)
     joblib.dump({"n_features": n_features, "sequence_len": SEQUENCE_LEN}, LSTM_META_PATH)
+    export_lstm_weights(model)
     return LSTM_MODEL_PATH
 
 
+def export_lstm_weights(model) -> str:
+    """Save LSTM(32) → Dense(16, relu) → Dense(3, softmax) weights as raw .npy files."""
+    from tensorflow.keras import layers
+
+    lstm = next(l for l in model.layers if isinstance(l, layers.LSTM))
+    dense = [l for l in model.layers if isinstance(l, layers.Dense)]
+    kernel, recurrent_kernel, bias = lstm.get_weights()
+    w1, b1 = dense[0].get_weights()
+    w2, b2 = dense[1].get_weights()
+    return save_npy_dir(
+        LSTM_WEIGHTS_DIR,
+        {
+            "kernel": kernel,
+            "recurrent_kernel": recurrent_kernel,
+            "bias": bias,
+            "dense1_w": w1,
+            "dense1_b": b1,
+            "dense2_w": w2,
+            "dense2_b": b2,
+        },
+        meta={"n_features": len(FEATURES), "sequence_len": SEQUENCE_LEN},
+    )
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _lstm_forward(w: dict, X: np.ndarray) -> np.ndarray:
+    """
+    Keras LSTM inference (gate order i, f, c, o; tanh / sigmoid) followed by the
+    dense head. X: (n, seq_len, n_features) → probabilities (n, 3).
+    """
+    units = w["recurrent_kernel"].shape[0]
+    h = np.zeros((X.shape[0], units), dtype=np.float32)
+    c = np.zeros_like(h)
+    # Input projections for all timesteps in one matmul
+    xw = X @ w["kernel"] + w["bias"]
+    for t in range(X.shape[1]):
+        z = xw[:, t, :] + h @ w["recurrent_kernel"]
+        i = _sigmoid(z[:, :units])
+        f = _sigmoid(z[:, units : 2 * units])
+        g = np.tanh(z[:, 2 * units : 3 * units])
+        o = _sigmoid(z[:, 3 * units :])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+    d = np.maximum(h @ w["dense1_w"] + w["dense1_b"], 0.0)
+    logits = d @ w["dense2_w"] + w["dense2_b"]
+    logits = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(logits)
+    return e / e.sum(axis=1, keepdims=True)
+
+
 def predict_lstm(feats_sequence: np.ndarray) -> tuple[str, float, list] | None:
     """
     feats_sequence: shape (SEQUENCE_LEN, 4) for [ma_10, ma_30, rsi, volatility].
     Returns (signal, confidence, probs) or None if model missing.
+    Uses the exported .npy weights when present, else the saved Keras model.
     """
+    loaded = load_npy_dir(LSTM_WEIGHTS_DIR)
+    if loaded is not None:
+        weights, meta = loaded
+        seq_len = meta.get("sequence_len", SEQUENCE_LEN)
+        if feats_sequence.shape != (seq_len, meta.get("n_features", len(FEATURES))):
+            return None
+        probs = _lstm_forward(weights, feats_sequence.astype(np.float32)[None])[0].tolist()
+        idx = int(np.argmax(probs))
+        return LABELS[idx], float(probs[idx]), probs
     if not os.path.isfile(LSTM_MODEL_PATH):
         return None
     try:
@@ -81,7 +152,6 @@ def predict_lstm(feats_sequence: np.ndarray) -> tuple[str, float, list] | None:
         X = np.expand_dims(feats_sequence.astype(np.float32), axis=0)
         probs = model.predict(X, verbose=0)[0].tolist()
         idx = int(np.argmax(probs))
-        labels = ["SELL", "HOLD", "BUY"]
-        return labels[idx], float(probs[idx]), probs
+        return LABELS[idx], float(probs[idx]), probs
     except Exception:
         return None
@@ -0,0 +1,63 @@
+"""
+Apply the Recommendation retention policy (see analysis_app.retention): archive
+and roll up rows older than --keep-days, and optionally maintain MySQL partitions.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from analysis_app import retention
+
+
+class Command(BaseCommand):
+    help = "Roll Recommendation rows older than N days up to one row per ticker per day and archive the raw rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=settings.CLEARTRADE_RETENTION_DAYS,
+            help="Days of full detail to keep (default: CLEARTRADE_RETENTION_DAYS)",
+        )
+        parser.add_argument("--archive-dir", help="Archive directory (default: CLEARTRADE_ARCHIVE_DIR)")
+        parser.add_argument("--format", default="ndjson", choices=retention.ARCHIVE_FORMATS, help="Archive file format")
+        parser.add_argument("--no-archive", action="store_true", help="Delete rolled-up rows without archiving them")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be rolled up")
+        parser.add_argument(
+            "--mysql-partition",
+            action="store_true",
+            help="MySQL: partition the table by month (first run), add future months and drop emptied old ones",
+        )
+        parser.add_argument("--months-ahead", type=int, default=retention.PARTITION_MONTHS_AHEAD)
+
+    def handle(self, *args, **opts):
+        if opts["mysql_partition"] and connection.vendor != "mysql":
+            raise CommandError("--mysql-partition needs the MySQL backend (USE_MYSQL=true)")
+        if opts["dry_run"]:
+            info = retention.pending(opts["keep_days"])
+            self.stdout.write(
+                f"{info['rows']} rows before {info['cutoff']:%Y-%m-%d} (oldest {info['oldest'] or '-'}) would be rolled up"
+            )
+            return
+
+        start = time.perf_counter()
+        try:
+            totals = retention.apply_retention(
+                opts["keep_days"],
+                opts.get("archive_dir"),
+                archive=not opts["no_archive"],
+                fmt=opts["format"],
+                log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled {totals['rows']} rows from {totals['days']} days before {totals['cutoff']:%Y-%m-%d} "
+            f"into {totals['rollups']} daily rows in {time.perf_counter() - start:.1f}s"
+            + (f"; {len(totals['files'])} archive files" if totals["files"] else "")
+        ))
+        if opts["mysql_partition"]:
+            statements = retention.partition_mysql(opts["months_ahead"], totals["cutoff"], log=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f"Partitions up to date ({len(statements)} statements)"))
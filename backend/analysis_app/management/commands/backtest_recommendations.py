@@ -4,14 +4,13 @@ Backtesting (paper §4 future features): evaluate past recommendations vs next-p
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from core.models import StockPrice, FundamentalMetric, NewsHeadline
-from analysis_app.indicators import compute_indicators
+from analysis_app.indicators import compute_features, price_columns
 from analysis_app.sentiment import score_sentiment
-from analysis_app.agent import predict, fuse
+from analysis_app.agent import predict, fuse, model_features
 import pandas as pd
 import os
 
 MODEL_PATH = os.path.join(settings.BASE_DIR, "analysis_model.joblib")
-FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
 
 
 class Command(BaseCommand):
@@ -27,13 +26,15 @@ class Command(BaseCommand):
         days = max(50, opts.get("days", 252))
         use_full = opts.get("full", False)
 
-        qs = StockPrice.objects.filter(ticker=ticker).order_by("date")
-        df = pd.DataFrame([{"date": p.date, "close": p.close} for p in qs])
+        features = model_features(MODEL_PATH)
+        columns = ["date", *price_columns(features)]
+        qs = StockPrice.objects.filter(ticker=ticker).order_by("date").values_list(*columns)
+        df = pd.DataFrame(list(qs), columns=columns)
         if len(df) < 80:
             self.stdout.write(self.style.WARNING("Need 80+ price rows. Import prices first."))
             return
         df["date"] = pd.to_datetime(df["date"])
-        df = compute_indicators(df).dropna(subset=FEATURES)
+        df = compute_features(df, features).dropna(subset=features)
         df["next_ret"] = df["close"].pct_change().shift(-1)
 
         test_df = df.tail(days).head(-1)
@@ -43,7 +44,7 @@ class Command(BaseCommand):
 
         results = []
         for i, row in test_df.iterrows():
-            feats = {f: float(row[f]) for f in FEATURES}
+            feats = {f: float(row[f]) for f in features}
             next_ret = row["next_ret"]
             if pd.isna(next_ret):
                 continue
@@ -0,0 +1,72 @@
+"""
+Hot-path benchmark suite on seeded synthetic data, with JSON baselines and regression checks.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from analysis_app.benchmarks import compare, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark indicators, predict, fuse, fundamental score, sentiment, build_sequences, "
+        "backtest and the analyze view at several dataset sizes; save or compare JSON baselines"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickers", type=int, nargs="+", default=[1, 10, 100], help="Ticker counts, e.g. 1 10 100 1000")
+        parser.add_argument("--years", type=int, nargs="+", default=[1, 5], help="History lengths in years, e.g. 1 5 20")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per case (median is reported)")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--max-db-tickers", type=int, default=10, help="Tickers used for DB-backed cases per size")
+        parser.add_argument("--skip-db", action="store_true", help="Only run the pure-function cases")
+        parser.add_argument("--output", help="Write results JSON here (e.g. benchmarks/baseline.json)")
+        parser.add_argument("--compare", help="Baseline JSON to compare against")
+        parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+
+    def handle(self, *args, **opts):
+        with_db = not opts.get("skip_db")
+        old_db_name = None
+        if with_db:
+            # Throwaway database so benchmarks never touch real data.
+            setup_test_environment()
+            old_db_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(self.style.SUCCESS("Running benchmarks"))
+            report = run_suite(
+                ticker_sizes=opts["tickers"],
+                year_sizes=opts["years"],
+                repeat=opts["repeat"],
+                seed=opts["seed"],
+                with_db=with_db,
+                max_db_tickers=opts["max_db_tickers"],
+                log=self.stdout.write,
+            )
+        finally:
+            if with_db:
+                connection.creation.destroy_test_db(old_db_name, verbosity=0)
+                # An in-memory SQLite test DB survives destroy_test_db; reconnect to the real one.
+                connection.close()
+                teardown_test_environment()
+
+        if opts.get("output"):
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved {len(report['results'])} results to {opts['output']}")
+
+        if opts.get("compare"):
+            with open(opts["compare"], encoding="utf-8") as f:
+                baseline = json.load(f)
+            regressions = compare(report, baseline, opts["threshold"])
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regressions beyond {opts['threshold']:.0%}."))
+                return
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"  {r['case']:45s} {r['baseline'] * 1000:9.2f} ms → {r['current'] * 1000:9.2f} ms ({r['ratio']:.2f}x)"
+                ))
+            raise CommandError(f"{len(regressions)} benchmark regression(s) beyond {opts['threshold']:.0%}.")
@@ -0,0 +1,78 @@
+"""
+Parity and latency benchmark: compiled NumPy scorer vs sklearn predict_proba.
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import joblib
+import numpy as np
+import os
+import time
+
+from analysis_app.compiled_model import compiled_path, export_compiled, load_compiled
+from analysis_app.model_store import artifact_mtime
+from analysis_app.explainability import background_path
+
+MODEL_PATH = os.path.join(settings.BASE_DIR, "analysis_model.joblib")
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled NumPy scorer with sklearn: max probability difference and single-row / batch latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=MODEL_PATH, help="Path to analysis_model.joblib")
+        parser.add_argument("--rows", type=int, default=10000, help="Batch size for parity and batch timing")
+        parser.add_argument("--repeat", type=int, default=200, help="Single-row timing iterations")
+        parser.add_argument("--export", action="store_true", help="(Re)export the compiled artifact first")
+
+    def handle(self, *args, **opts):
+        model_path = opts["model"]
+        if not os.path.isfile(model_path):
+            self.stdout.write(self.style.ERROR(f"{model_path} not found. Run train_model.py first."))
+            return
+        model = joblib.load(model_path)
+        if opts.get("export") or artifact_mtime(compiled_path(model_path)) is None:
+            if export_compiled(model, model_path) is None:
+                self.stdout.write(self.style.ERROR("Unsupported model type for export."))
+                return
+        compiled = load_compiled(model_path)
+        if compiled is None:
+            self.stdout.write(self.style.ERROR("Compiled artifact is stale; rerun with --export."))
+            return
+
+        # Synthetic rows around the training mean (or standard normal if unknown)
+        rng = np.random.default_rng(42)
+        n_features = model.n_features_in_
+        bg = background_path(model_path)
+        center = joblib.load(bg) if os.path.isfile(bg) else np.zeros(n_features)
+        scale = np.maximum(np.abs(center) * 0.25, 1.0)
+        X = center + rng.normal(size=(max(1, opts["rows"]), n_features)) * scale
+
+        ref = model.predict_proba(X)
+        got = compiled.predict_proba(X)
+        max_diff = float(np.max(np.abs(ref - got)))
+        argmax_match = float(np.mean(ref.argmax(axis=1) == got.argmax(axis=1)))
+
+        repeat = max(1, opts["repeat"])
+        row = X[:1]
+        t_sk_1 = _time_per_call(lambda: model.predict_proba(row), repeat)
+        t_np_1 = _time_per_call(lambda: compiled.predict_proba(row), repeat)
+        t_sk_b = _time_per_call(lambda: model.predict_proba(X), 3)
+        t_np_b = _time_per_call(lambda: compiled.predict_proba(X), 3)
+
+        self.stdout.write(self.style.SUCCESS(f"Compiled scorer ({compiled.kind}) vs sklearn ({type(model).__name__})"))
+        self.stdout.write(f"  Parity: max |Δp| = {max_diff:.2e}, argmax agreement = {argmax_match:.2%}")
+        self.stdout.write(
+            f"  Single row: sklearn {t_sk_1 * 1e6:.0f} µs, compiled {t_np_1 * 1e6:.0f} µs "
+            f"({t_sk_1 / t_np_1:.1f}x)"
+        )
+        self.stdout.write(
+            f"  Batch of {len(X)}: sklearn {t_sk_b * 1e3:.1f} ms, compiled {t_np_b * 1e3:.1f} ms "
+            f"({t_sk_b / t_np_b:.1f}x)"
+        )
@@ -0,0 +1,111 @@
+"""
+Per-worker memory benchmark: private model copies vs memory-mapped shared artifacts.
+
+Forks N workers that each load every existing model artifact (model_store.preload)
+and touch its arrays, then reports per-worker RSS, PSS (shared pages divided among
+the processes mapping them) and private memory from /proc/self/smaps_rollup (Linux).
+RSS counts shared file pages in full; PSS and private memory show the real saving.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from analysis_app import model_store
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+
+
+def _memory_kb() -> dict:
+    out = {"rss": 0, "pss": 0, "private": 0}
+    with open(SMAPS_ROLLUP, encoding="utf-8") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            parts = rest.split()
+            if not parts or not parts[0].isdigit():
+                continue
+            kb = int(parts[0])
+            if key == "Rss":
+                out["rss"] = kb
+            elif key == "Pss":
+                out["pss"] = kb
+            elif key in ("Private_Clean", "Private_Dirty"):
+                out["private"] += kb
+    return out
+
+
+def _touch(obj) -> float:
+    """Read every array reachable from a cached artifact so its pages are resident."""
+    total = 0.0
+    if isinstance(obj, tuple):
+        for item in obj:
+            total += _touch(item)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            total += _touch(v)
+    elif isinstance(obj, np.ndarray):
+        total += float(np.asarray(obj).sum()) if obj.dtype.kind in "biuf" else 0.0
+    elif hasattr(obj, "__dict__"):
+        for v in vars(obj).values():
+            if isinstance(v, np.ndarray):
+                total += _touch(v)
+    return total
+
+
+def _worker(mmap: bool, barrier, queue):
+    model_store.MMAP_MODELS = mmap
+    model_store._CACHE.clear()
+    before = _memory_kb()
+    loaded = model_store.preload()
+    for _, obj in list(model_store._CACHE.values()):
+        _touch(obj)
+    # Measure while every worker is alive so PSS reflects the sharing
+    barrier.wait()
+    after = _memory_kb()
+    queue.put(({k: after[k] - before[k] for k in after}, loaded))
+    barrier.wait()
+
+
+class Command(BaseCommand):
+    help = "Measure per-worker RSS/PSS/private memory with private model copies vs memory-mapped shared artifacts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Number of forked worker processes")
+
+    def handle(self, *args, **opts):
+        if not os.path.exists(SMAPS_ROLLUP):
+            self.stdout.write(self.style.ERROR("Requires Linux /proc/self/smaps_rollup."))
+            return
+        n = max(1, opts.get("workers") or 4)
+        ctx = multiprocessing.get_context("fork")
+        results = {}
+        for label, mmap in (("private copies", False), ("memory-mapped", True)):
+            barrier = ctx.Barrier(n)
+            queue = ctx.Queue()
+            procs = [ctx.Process(target=_worker, args=(mmap, barrier, queue)) for _ in range(n)]
+            for p in procs:
+                p.start()
+            rows = [queue.get() for _ in procs]
+            for p in procs:
+                p.join()
+            if not rows[0][1]:
+                self.stdout.write(self.style.WARNING("No model artifacts found. Train the models first."))
+                return
+            results[label] = {k: sum(r[0][k] for r in rows) / n for k in ("rss", "pss", "private")}
+            results[label]["artifacts"] = rows[0][1]
+
+        self.stdout.write(self.style.SUCCESS(f"Model memory per worker ({n} workers)"))
+        for a in results["memory-mapped"]["artifacts"]:
+            self.stdout.write(f"  artifact: {a}")
+        for label, r in results.items():
+            self.stdout.write(
+                f"  {label:15s} RSS {r['rss'] / 1024:8.1f} MiB  PSS {r['pss'] / 1024:8.1f} MiB  "
+                f"private {r['private'] / 1024:8.1f} MiB"
+            )
+        copy, shared = results["private copies"], results["memory-mapped"]
+        self.stdout.write(
+            f"  Per-worker drop: RSS {(copy['rss'] - shared['rss']) / 1024:.1f} MiB, "
+            f"PSS {(copy['pss'] - shared['pss']) / 1024:.1f} MiB, "
+            f"private {(copy['private'] - shared['private']) / 1024:.1f} MiB"
+        )
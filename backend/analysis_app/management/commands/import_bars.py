@@ -0,0 +1,32 @@
+"""
+Bulk-load intraday bars from CSV into the columnar bar store (analysis_app.bar_store).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis_app.bar_store import BarStore
+
+
+class Command(BaseCommand):
+    help = "Import intraday bars CSV (Datetime, [Ticker], Open, High, Low, Close, Volume) into the bar store"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", required=True)
+        parser.add_argument("--ticker", help="Ticker for files without a Ticker column")
+        parser.add_argument("--tz", help="Timezone of naive timestamps, e.g. America/New_York (default UTC)")
+        parser.add_argument("--chunksize", type=int, default=1_000_000, help="CSV rows per chunk")
+        parser.add_argument("--dir", help="Bar store directory (default: CLEARTRADE_BAR_DIR)")
+
+    def handle(self, *args, **opts):
+        store = BarStore(opts.get("dir"))
+        start = time.perf_counter()
+        try:
+            n = store.ingest_csv(opts["csv"], ticker=(opts.get("ticker") or "").upper() or None, tz=opts.get("tz"),
+                                 chunksize=opts["chunksize"])
+        except (ValueError, KeyError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {n} bars into {store.root} in {elapsed:.1f}s ({n / max(elapsed, 1e-9):,.0f} bars/s)"
+        ))
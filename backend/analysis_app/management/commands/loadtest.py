@@ -0,0 +1,100 @@
+"""
+Load-test /api/analyze, /api/history and /api/chat offline against a seeded throwaway
+database, with Yahoo Finance replaced by an in-process stub.
+"""
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from analysis_app.benchmarks import seed_db, synthetic_headlines, synthetic_models, synthetic_prices
+from analysis_app.loadtest import YahooStub, parse_mix, run_load, serve_app, stubbed_yahoo, summarize
+from analysis_app.resilience import negative_cache, yahoo_breaker
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive /api/analyze, /api/history and /api/chat at a fixed concurrency against a seeded "
+        "throwaway database with a stubbed Yahoo backend; reports p50/p95/p99, RPS and error rates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Total requests to send")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+        parser.add_argument("--mix", default="analyze=1,history=3,chat=1", help="Endpoint weights, e.g. analyze=1,history=3,chat=1")
+        parser.add_argument("--tickers", type=int, default=20, help="Tickers seeded in the database")
+        parser.add_argument("--cold-tickers", type=int, default=5, help="Unseeded tickers that go through the Yahoo stub")
+        parser.add_argument("--unknown-tickers", type=int, default=0, help="Tickers the stub knows nothing about (typos/delisted)")
+        parser.add_argument("--years", type=int, default=2, help="Seeded price history per ticker")
+        parser.add_argument("--yahoo-latency", type=float, default=0.2, help="Stub latency per Yahoo call (seconds)")
+        parser.add_argument("--yahoo-jitter", type=float, default=0.05, help="Uniform ± jitter on the stub latency")
+        parser.add_argument("--yahoo-failure-rate", type=float, default=0.0, help="Fraction of stub calls that raise")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the summary JSON here")
+
+    def handle(self, *args, **opts):
+        try:
+            mix = parse_mix(opts["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        seed = opts["seed"]
+        setup_test_environment()
+        old_db_name = connection.settings_dict["NAME"]
+        tmpdir = tempfile.mkdtemp(prefix="cleartrade-load-")
+        if connection.vendor == "sqlite":
+            # File-backed so the server threads share one database.
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmpdir, "loadtest.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            prices = synthetic_prices(opts["tickers"], opts["years"], seed)
+            tickers = list(prices["ticker"].unique())
+            seed_db(prices, synthetic_headlines(tickers, 10, seed))
+            tickers += [f"COLD{i:03d}" for i in range(opts["cold_tickers"])]
+            tickers += [f"{YahooStub.UNKNOWN_PREFIX}{i:03d}" for i in range(opts["unknown_tickers"])]
+            # Start every run with a cold negative cache and a closed breaker
+            negative_cache.clear()
+            yahoo_breaker.reset()
+            connection.close()
+
+            stub = YahooStub(opts["yahoo_latency"], opts["yahoo_jitter"], opts["yahoo_failure_rate"], seed)
+            # The test environment runs with DEBUG off, so allow the local server's host explicitly.
+            allowed = [*settings.ALLOWED_HOSTS, "127.0.0.1"]
+            with override_settings(ALLOWED_HOSTS=allowed), synthetic_models(seed), stubbed_yahoo(stub), \
+                    serve_app() as (host, port):
+                self.stdout.write(self.style.SUCCESS(
+                    f"Load test: {opts['requests']} requests, concurrency {opts['concurrency']}, "
+                    f"{len(tickers)} tickers on http://{host}:{port}"
+                ))
+                run = run_load(host, port, tickers, mix, opts["requests"], opts["concurrency"], seed)
+        finally:
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            connection.close()
+            teardown_test_environment()
+
+        report = {"summary": summarize(run), "yahoo_stub": stub.counters(), "negative_cache": negative_cache.counters(),
+                  "yahoo_breaker": yahoo_breaker.counters(), "seconds": run["seconds"], "options": {
+            k: opts[k] for k in ("requests", "concurrency", "mix", "tickers", "cold_tickers", "unknown_tickers", "years",
+                                 "yahoo_latency", "yahoo_jitter", "yahoo_failure_rate", "seed")
+        }}
+        self.stdout.write(f"  {'endpoint':10s} {'reqs':>6s} {'rps':>8s} {'err%':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+        for name, s in report["summary"].items():
+            if not s["requests"]:
+                continue
+            self.stdout.write(
+                f"  {name:10s} {s['requests']:6d} {s['rps']:8.1f} {s['error_rate'] * 100:5.1f}% "
+                f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}"
+            )
+        counters = report["yahoo_stub"]
+        self.stdout.write(f"  Yahoo stub calls {counters['calls']}, failures {counters['failures']}")
+        self.stdout.write(f"  Negative cache {report['negative_cache']}")
+        self.stdout.write(f"  Yahoo breaker {report['yahoo_breaker']}")
+
+        if opts.get("output"):
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved summary to {opts['output']}")
@@ -0,0 +1,62 @@
+"""
+Profile the analyze pipeline offline for a list of tickers (local DB data only).
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analysis_app.pipeline import run_analysis
+from analysis_app.profiling import MODES, profile_call
+
+
+def _hottest_frames(folded_path: str, top: int) -> list[tuple[str, int]]:
+    """Leaf frames with the most samples (self time) from a collapsed-stack file."""
+    leaf = Counter()
+    with open(folded_path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            leaf[stack.rsplit(";", 1)[-1]] += int(count)
+    return leaf.most_common(top)
+
+
+class Command(BaseCommand):
+    help = "Run the analyze pipeline under a profiler for each ticker using only local data; writes flame-graph-ready reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tickers", nargs="+", help="Tickers to profile, e.g. AAPL MSFT")
+        parser.add_argument("--mode", choices=MODES, default="sample", help="sample (collapsed stacks) or cprofile")
+        parser.add_argument("--interval", type=float, default=0.001, help="Sampling interval in seconds")
+        parser.add_argument("--top", type=int, default=10, help="Hottest frames to print (sample mode)")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the Recommendation rows written by the pipeline (rolled back by default)",
+        )
+
+    def handle(self, *args, **opts):
+        for raw in opts["tickers"]:
+            ticker = raw.upper().strip()
+            with transaction.atomic():
+                (payload, status), info = profile_call(
+                    f"analyze-{ticker}",
+                    run_analysis,
+                    ticker,
+                    live=False,
+                    mode=opts["mode"],
+                    interval=opts["interval"],
+                )
+                if not opts.get("keep"):
+                    transaction.set_rollback(True)
+
+            if status != 200:
+                self.stdout.write(self.style.WARNING(f"{ticker}: {payload.get('error')}"))
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{ticker}: {payload['recommendation']} in {info['seconds'] * 1000:.1f} ms → {info['report']}"
+                )
+            )
+            if info["mode"] == "sample":
+                for frame, count in _hottest_frames(info["report"], opts["top"]):
+                    self.stdout.write(f"  {count:6d}  {frame}")
@@ -0,0 +1,25 @@
+"""
+Precompute per-ticker latest features (core.LatestFeatures) for the screener.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from analysis_app.screener import REFRESH_LOOKBACK_DAYS, refresh_latest_features
+
+
+class Command(BaseCommand):
+    help = "Recompute the latest indicators, fundamentals and news sentiment per ticker for /api/screener"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lookback-days",
+            type=int,
+            default=REFRESH_LOOKBACK_DAYS,
+            help="Calendar days of prices to load (must cover 60 trading days)",
+        )
+
+    def handle(self, *args, **opts):
+        start = time.perf_counter()
+        n = refresh_latest_features(opts["lookback_days"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {n} tickers in {time.perf_counter() - start:.1f}s"))
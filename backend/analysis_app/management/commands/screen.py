@@ -0,0 +1,58 @@
+"""
+Screen the whole universe from the command line (same engine as /api/screener).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis_app.screener import SORT_FIELDS, refresh_latest_features, screen
+
+
+class Command(BaseCommand):
+    help = "Screen all tickers by fused signal, RSI, volatility and fundamental score"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--signal", nargs="+", help="BUY, HOLD and/or SELL")
+        parser.add_argument("--rsi-min", type=float)
+        parser.add_argument("--rsi-max", type=float)
+        parser.add_argument("--volatility-min", type=float)
+        parser.add_argument("--volatility-max", type=float)
+        parser.add_argument("--fundamental-min", type=float)
+        parser.add_argument("--fundamental-max", type=float)
+        parser.add_argument("--min-confidence", type=float)
+        parser.add_argument("--sort", default="-confidence", help=f"One of {', '.join(SORT_FIELDS)}; '-' prefix for descending")
+        parser.add_argument("--page", type=int, default=1)
+        parser.add_argument("--page-size", type=int, default=25)
+        parser.add_argument("--refresh", action="store_true", help="Refresh precomputed features first")
+
+    def handle(self, *args, **opts):
+        if opts.get("refresh"):
+            self.stdout.write(f"Refreshed {refresh_latest_features()} tickers")
+        start = time.perf_counter()
+        try:
+            result = screen(
+                signals=opts.get("signal"),
+                rsi_min=opts.get("rsi_min"),
+                rsi_max=opts.get("rsi_max"),
+                volatility_min=opts.get("volatility_min"),
+                volatility_max=opts.get("volatility_max"),
+                fundamental_min=opts.get("fundamental_min"),
+                fundamental_max=opts.get("fundamental_max"),
+                min_confidence=opts.get("min_confidence"),
+                sort=opts["sort"],
+                page=opts["page"],
+                page_size=opts["page_size"],
+            )
+        except (ValueError, FileNotFoundError) as exc:
+            raise CommandError(str(exc))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['count']} of {result['universe']} tickers match ({elapsed:.1f} ms); page {result['page']}"
+        ))
+        for r in result["results"]:
+            fscore = "  n/a" if r["fundamental_score"] is None else f"{r['fundamental_score']:.2f}"
+            self.stdout.write(
+                f"  {r['ticker']:10s} {r['signal']:4s} conf={r['confidence']:.2f} RSI={r['rsi']:5.1f} "
+                f"vol={r['volatility']:.2f} fund={fscore}"
+            )
@@ -0,0 +1,113 @@
+"""
+Run the streaming signal engine (analysis_app.streaming) on a bar feed, or
+measure its throughput on a synthetic replay with --benchmark.
+"""
+import contextlib
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis_app import streaming
+from analysis_app.bar_store import INTERVALS
+
+MODEL_PATH = os.path.join(settings.BASE_DIR, "analysis_model.joblib")
+
+
+class Command(BaseCommand):
+    help = "Stream bars into incremental indicators and publish BUY/HOLD/SELL changes (NDJSON to stdout)"
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument("--listen", metavar="ADDRESS", help="Accept bars on host:port (TCP) or a Unix socket path")
+        source.add_argument("--file", help="Read bars from a CSV/NDJSON file ('-' = stdin)")
+        source.add_argument(
+            "--benchmark", action="store_true", help="Replay synthetic bars in-process and report bars/sec"
+        )
+        parser.add_argument("--follow", action="store_true", help="With --file, keep reading appended lines")
+        parser.add_argument("--model", default=MODEL_PATH, help="Technical model (default: analysis_model.joblib)")
+        parser.add_argument(
+            "--interval",
+            default="1m",
+            choices=list(INTERVALS),
+            help="Interval label stored with events and Recommendations",
+        )
+        parser.add_argument("--store", action="store_true", help="Also store each signal change as a Recommendation")
+        parser.add_argument("--quiet", action="store_true", help="Do not print events")
+        parser.add_argument("--batch-size", type=int, default=streaming.BATCH_SIZE, help="Bars per scoring pass")
+        parser.add_argument(
+            "--max-delay", type=float, default=streaming.MAX_DELAY, help="Seconds a bar may wait to be scored"
+        )
+        parser.add_argument(
+            "--min-change",
+            type=float,
+            default=streaming.MIN_CONFIDENCE_CHANGE,
+            help="Publish an unchanged signal only if confidence moved at least this much",
+        )
+        parser.add_argument(
+            "--context-ttl", type=float, default=streaming.CONTEXT_TTL, help="Seconds before fundamentals/news reload"
+        )
+        parser.add_argument("--no-context", action="store_true", help="Ignore fundamentals and news (technical + rules only)")
+        parser.add_argument("--tickers", type=int, default=500, help="--benchmark: synthetic tickers")
+        parser.add_argument("--bars", type=int, default=400, help="--benchmark: bars per ticker")
+
+    def handle(self, *args, **opts):
+        if opts["benchmark"]:
+            return self._benchmark(opts)
+        if not (opts.get("listen") or opts.get("file")):
+            raise CommandError("Pass --listen ADDRESS, --file PATH or --benchmark")
+        if not os.path.isfile(opts["model"]):
+            raise CommandError(f"{opts['model']} not found. Run train_model.py first.")
+
+        engine = self._engine(opts["model"], opts)
+        if not opts["quiet"]:
+            engine.hub.subscribe(streaming.ndjson_writer(self.stdout))
+        if opts["store"]:
+            engine.hub.subscribe(streaming.recommendation_writer(opts["interval"]))
+        if opts.get("listen"):
+            source = streaming.socket_source(opts["listen"])
+            self.stderr.write(f"Listening for bars on {opts['listen']}")
+        else:
+            source = streaming.file_source(opts["file"], follow=opts["follow"])
+        try:
+            stats = engine.run(source, opts["batch_size"], opts["max_delay"])
+        except KeyboardInterrupt:
+            engine.flush()
+            stats = engine.stats
+        self.stderr.write(self._format(stats))
+
+    def _engine(self, model_path, opts) -> streaming.StreamingEngine:
+        return streaming.StreamingEngine(
+            model_path,
+            interval=opts["interval"],
+            min_change=opts["min_change"],
+            context=not opts["no_context"],
+            context_ttl=opts["context_ttl"],
+        )
+
+    def _benchmark(self, opts):
+        bars = streaming.synthetic_source(opts["tickers"], opts["bars"])
+        with contextlib.ExitStack() as stack:
+            model_path = opts["model"]
+            if not os.path.isfile(model_path):
+                from analysis_app.benchmarks import synthetic_models
+
+                model_path = stack.enter_context(synthetic_models())
+            # Synthetic tickers have no fundamentals or news in the database
+            engine = self._engine(model_path, {**opts, "no_context": True})
+            if not opts["quiet"]:
+                engine.hub.subscribe(streaming.ndjson_writer(sys.stderr))
+            stats = engine.run(bars, opts["batch_size"], opts["max_delay"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {opts['tickers']} tickers × {opts['bars']} bars: " + self._format(stats)
+        ))
+
+    @staticmethod
+    def _format(stats: dict) -> str:
+        rate = stats.get("bars_per_second")
+        return (
+            f"{stats['bars']} bars, {stats['scored']} ticker scorings in {stats['flushes']} passes, "
+            f"{stats['events']} signal changes"
+            + (f" in {stats['seconds']:.2f}s ({rate:,.0f} bars/s)" if rate is not None else "")
+        )
@@ -0,0 +1,125 @@
+"""
+Concurrency stress test for SQLite: default settings vs the high-concurrency profile.
+
+For each profile, creates a scratch database file, forks N worker processes and has
+them hammer it for a fixed time with the app's write patterns: single Recommendation
+inserts, "check then bulk insert" price backfills inside a transaction (as
+live_data.ensure_prices_for_ticker does) and history reads. Reports throughput and
+the rate of "database is locked" errors per profile.
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import datetime as dt
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from core.models import Recommendation, StockPrice
+
+PROFILES = {
+    "default": {},
+    "concurrent": settings.SQLITE_CONCURRENT_OPTIONS,
+}
+
+
+def _add_alias(alias: str, path: str, options: dict) -> None:
+    base = dict(connections["default"].settings_dict)
+    base.update({"ENGINE": "django.db.backends.sqlite3", "NAME": path, "OPTIONS": dict(options)})
+    connections.settings[alias] = base
+
+
+def _create_schema(alias: str) -> None:
+    with connections[alias].schema_editor() as editor:
+        editor.create_model(StockPrice)
+        editor.create_model(Recommendation)
+    connections[alias].close()
+
+
+def _worker(alias: str, path: str, options: dict, seconds: float, seed: int, queue) -> None:
+    # Fresh connection per process; inherited sockets/handles must not be reused.
+    connections[alias].close()
+    _add_alias(alias, path, options)
+    rng = random.Random(seed)
+    counts = {"reads": 0, "writes": 0, "locked": 0, "other_errors": 0}
+    deadline = time.monotonic() + seconds
+    day0 = dt.date(2000, 1, 1)
+    while time.monotonic() < deadline:
+        ticker = f"T{rng.randrange(20):02d}"
+        op = rng.random()
+        try:
+            if op < 0.4:
+                Recommendation.objects.using(alias).create(
+                    ticker=ticker, signal="HOLD", confidence=0.5, explanation="stress"
+                )
+                counts["writes"] += 1
+            elif op < 0.6:
+                with transaction.atomic(using=alias):
+                    start = StockPrice.objects.using(alias).filter(ticker=ticker).count()
+                    StockPrice.objects.using(alias).bulk_create(
+                        [
+                            StockPrice(ticker=ticker, date=day0 + dt.timedelta(days=start + i),
+                                       open=1, high=1, low=1, close=1, volume=1)
+                            for i in range(50)
+                        ],
+                        ignore_conflicts=True,
+                    )
+                counts["writes"] += 1
+            else:
+                list(Recommendation.objects.using(alias).filter(ticker=ticker).order_by("-created_at")[:20])
+                counts["reads"] += 1
+        except OperationalError as exc:
+            key = "locked" if "locked" in str(exc) or "busy" in str(exc) else "other_errors"
+            counts[key] += 1
+    connections[alias].close()
+    queue.put(counts)
+
+
+class Command(BaseCommand):
+    help = "Stress SQLite with concurrent writers/readers under the default and high-concurrency profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent worker processes")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration per profile")
+        parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        ctx = multiprocessing.get_context("fork")
+        n = max(1, opts["workers"])
+        self.stdout.write(self.style.SUCCESS(f"SQLite stress: {n} workers, {opts['seconds']:.0f}s per profile"))
+        self.stdout.write(f"  {'profile':12s} {'ops/s':>9s} {'writes/s':>9s} {'reads/s':>9s} {'locked':>7s} {'locked%':>8s} {'other':>6s}")
+        for name in opts["profiles"]:
+            tmpdir = tempfile.mkdtemp(prefix="cleartrade-stress-")
+            path = os.path.join(tmpdir, "stress.sqlite3")
+            alias = f"stress_{name}"
+            options = PROFILES[name]
+            try:
+                _add_alias(alias, path, options)
+                _create_schema(alias)
+                queue = ctx.Queue()
+                procs = [
+                    ctx.Process(target=_worker, args=(alias, path, options, opts["seconds"], opts["seed"] + i, queue))
+                    for i in range(n)
+                ]
+                for p in procs:
+                    p.start()
+                rows = [queue.get() for _ in procs]
+                for p in procs:
+                    p.join()
+            finally:
+                connections[alias].close()
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+            total = {k: sum(r[k] for r in rows) for k in rows[0]}
+            attempts = total["reads"] + total["writes"] + total["locked"] + total["other_errors"]
+            secs = opts["seconds"]
+            self.stdout.write(
+                f"  {name:12s} {(total['reads'] + total['writes']) / secs:9.1f} {total['writes'] / secs:9.1f} "
+                f"{total['reads'] / secs:9.1f} {total['locked']:7d} {100 * total['locked'] / max(1, attempts):7.2f}% "
+                f"{total['other_errors']:6d}"
+            )
@@ -0,0 +1,106 @@
+"""
+Tune the decision-fusion thresholds over stored history (see analysis_app.fusion_sweep).
+"""
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis_app.fusion_sweep import METRICS, THRESHOLDS, load_history, sweep_history, threshold_grid
+
+MODEL_PATH = os.path.join(settings.BASE_DIR, "analysis_model.joblib")
+OPTIONS = {
+    "buy_prob_threshold": ("--buy-prob", "0.5:0.9:0.02"),
+    "fundamental_threshold": ("--fundamental", "0.3:0.8:0.05"),
+    "sentiment_threshold": ("--sentiment", "-0.3:0.3:0.05"),
+    "sell_fundamental_threshold": ("--sell-fundamental", None),
+    "sell_sentiment_threshold": ("--sell-sentiment", None),
+}
+
+
+def parse_values(spec: str) -> np.ndarray:
+    """'start:stop:step' (inclusive), 'a,b,c' or a single number."""
+    try:
+        if ":" in spec:
+            start, stop, step = (float(p) for p in spec.split(":"))
+            if step <= 0:
+                raise ValueError
+            return np.round(np.arange(start, stop + step / 2, step), 10)
+        return np.array([float(p) for p in spec.split(",") if p.strip()])
+    except ValueError:
+        raise CommandError(f"Bad threshold values {spec!r}; use start:stop:step, a,b,c or one number")
+
+
+class Command(BaseCommand):
+    help = "Evaluate many fusion threshold combinations (hit rate, return, signal mix) over historical data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=MODEL_PATH, help="Technical model (default: analysis_model.joblib)")
+        parser.add_argument("--tickers", nargs="+", help="Tickers to include (default: all with prices)")
+        parser.add_argument("--days", type=int, help="Keep the last N scored days per ticker")
+        parser.add_argument(
+            "--latest-context",
+            action="store_true",
+            help="Use each ticker's latest fundamentals and headlines for every day (like backtest --full)",
+        )
+        for name, (flag, default) in OPTIONS.items():
+            parser.add_argument(
+                flag,
+                default=default,
+                help=f"Values for {name} (current rule: {THRESHOLDS[name]}); start:stop:step or a,b,c",
+            )
+        parser.add_argument("--sort", default="hit_rate", choices=METRICS)
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--output", help="Write every combination to this .csv or .json file")
+
+    def handle(self, *args, **opts):
+        if not os.path.isfile(opts["model"]):
+            raise CommandError(f"{opts['model']} not found. Run train_model.py first.")
+        values = {
+            name: parse_values(opts[flag.lstrip("-").replace("-", "_")])
+            for name, (flag, _) in OPTIONS.items()
+            if opts[flag.lstrip("-").replace("-", "_")] is not None
+        }
+        grid = threshold_grid(**values)
+
+        start = time.perf_counter()
+        tickers = [t.upper() for t in opts["tickers"]] if opts.get("tickers") else None
+        history = load_history(opts["model"], tickers, opts.get("days"), opts.get("latest_context", False))
+        load_seconds = time.perf_counter() - start
+        n = len(history["forward_return"])
+        if not n:
+            raise CommandError("No scored history; import prices first.")
+
+        start = time.perf_counter()
+        results = sweep_history(history, grid)
+        sweep_seconds = time.perf_counter() - start
+        current = sweep_history(history, threshold_grid()).iloc[0]
+
+        self.stdout.write(
+            f"{n} ticker-days from {len(set(history['ticker']))} tickers loaded and scored in {load_seconds:.1f}s; "
+            f"{len(grid)} combinations swept in {sweep_seconds:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS("Current rule:"))
+        self.stdout.write(self._format(current))
+        self.stdout.write(self.style.SUCCESS(f"Top {opts['top']} by {opts['sort']}:"))
+        for _, row in results.sort_values(opts["sort"], ascending=False).head(opts["top"]).iterrows():
+            self.stdout.write(self._format(row))
+
+        output = opts.get("output")
+        if output:
+            if output.endswith(".json"):
+                results.to_json(output, orient="records", indent=2)
+            else:
+                results.to_csv(output, index=False)
+            self.stdout.write(f"Wrote {len(results)} rows to {output}")
+
+    @staticmethod
+    def _format(row) -> str:
+        thresholds = " ".join(f"{row[k]:.3g}" for k in THRESHOLDS)
+        return (
+            f"  [{thresholds}] hit={row['hit_rate']:.2%} trade_hit={row['trade_hit_rate']:.2%} "
+            f"avg_ret={row['avg_return'] * 1e4:.2f}bp total={row['total_return']:.3f} "
+            f"BUY/HOLD/SELL={row['buy_pct']:.0%}/{row['hold_pct']:.0%}/{row['sell_pct']:.0%}"
+        )
@@ -1,12 +1,38 @@
 from django.core.management.base import BaseCommand
 from core.models import NewsHeadline
-from analysis_app.sentiment_model import train_sentiment_model
+from analysis_app.sentiment_model import train_sentiment_model, train_sentiment_model_streaming
+
+
+def _iter_headline_chunks(chunk_size: int):
+    """Yield lists of headlines from the DB without loading the whole table."""
+    batch = []
+    qs = NewsHeadline.objects.order_by("id").values_list("headline", flat=True)
+    for headline in qs.iterator(chunk_size=chunk_size):
+        batch.append(headline)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 class Command(BaseCommand):
     help = "Train TF-IDF + Logistic Regression sentiment model on headlines in DB (weak labels from keywords)"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--streaming",
+            action="store_true",
+            help="Out-of-core mode: hashing vectorizer + SGD partial_fit over the whole table in chunks",
+        )
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Headlines per chunk (streaming mode)")
+        parser.add_argument("--workers", type=int, default=1, help="Processes for weak-label generation (streaming mode)")
+        parser.add_argument("--n-features", type=int, default=2 ** 18, help="Hashing space size (streaming mode)")
+
     def handle(self, *args, **opts):
+        if opts.get("streaming"):
+            return self._handle_streaming(opts)
+
         headlines = list(
             NewsHeadline.objects.values_list("headline", flat=True).distinct()[:5000]
         )
@@ -17,3 +43,22 @@ class Command(BaseCommand):
             return
         train_sentiment_model(headlines, labels=None)
         self.stdout.write(self.style.SUCCESS(f"Trained sentiment model on {len(headlines)} headlines."))
+
+    def _handle_streaming(self, opts):
+        if NewsHeadline.objects.count() < 50:
+            self.stdout.write(
+                self.style.WARNING("Need at least 50 headlines. Import news first (import_news_events).")
+            )
+            return
+        chunk_size = max(1, opts.get("chunk_size") or 50000)
+        stats = train_sentiment_model_streaming(
+            _iter_headline_chunks(chunk_size),
+            n_features=opts.get("n_features") or 2 ** 18,
+            workers=max(1, opts.get("workers") or 1),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trained streaming sentiment model on {stats['headlines']} headlines "
+                f"in {stats['seconds']:.1f}s ({stats['headlines_per_sec']:.0f} headlines/sec)."
+            )
+        )
@@ -0,0 +1,191 @@
+"""
+Lightweight in-process instrumentation: stage timers, counters and histograms.
+
+- `with stage("predict"):` times a block, records it in the
+  cleartrade_stage_seconds histogram and in the current request's Server-Timing list.
+- ServerTimingMiddleware adds a `Server-Timing` header (one entry per stage plus total)
+  and per-endpoint request counters/latency histograms.
+- metrics_view serves everything in Prometheus text format at /api/metrics.
+
+Metrics are per process; with several workers, scrape each one (or aggregate upstream).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# name -> {"help": str, "type": "counter"|"histogram", "series": {labels_tuple: value_or_state}}
+_metrics: dict = {}
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("cleartrade_request_timings", default=None)
+
+
+def _labels_key(labels: dict | None) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _metric(name: str, kind: str, help_text: str) -> dict:
+    m = _metrics.get(name)
+    if m is None:
+        m = _metrics[name] = {"help": help_text, "type": kind, "series": {}}
+    return m
+
+
+def inc(name: str, labels: dict | None = None, value: float = 1.0, help_text: str = "") -> None:
+    """Increment a counter."""
+    key = _labels_key(labels)
+    with _lock:
+        series = _metric(name, "counter", help_text)["series"]
+        series[key] = series.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, labels: dict | None = None, help_text: str = "") -> None:
+    """Record one observation in a histogram (seconds)."""
+    key = _labels_key(labels)
+    with _lock:
+        series = _metric(name, "histogram", help_text)["series"]
+        state = series.get(key)
+        if state is None:
+            state = series[key] = {"buckets": [0] * len(DEFAULT_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                state["buckets"][i] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage (histogram + Server-Timing entry for the current request)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name: str, elapsed: float) -> None:
+    """Record a stage timed elsewhere (e.g. in a worker process), as stage() does."""
+    observe(
+        "cleartrade_stage_seconds",
+        elapsed,
+        {"stage": name},
+        help_text="Time spent in each analysis pipeline stage.",
+    )
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+
+
+@contextmanager
+def capture_stages():
+    """Collect the (stage, seconds) pairs recorded in this block, to replay with record_stage()."""
+    timings: list = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        for name in sorted(_metrics):
+            m = _metrics[name]
+            if m["help"]:
+                lines.append(f"# HELP {name} {m['help']}")
+            lines.append(f"# TYPE {name} {m['type']}")
+            for key, value in sorted(m["series"].items()):
+                if m["type"] == "counter":
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+                    continue
+                for bound, count in zip(DEFAULT_BUCKETS, value["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """GET /api/metrics – Prometheus scrape endpoint."""
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ServerTimingMiddleware:
+    """Collect stage timings per request and emit them as a Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _skip(request) -> bool:
+        return not request.path.startswith("/api/") or request.path.startswith("/api/metrics")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self._skip(request):
+            return self.get_response(request)
+        timings: list = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if self._skip(request):
+            return await self.get_response(request)
+        timings: list = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    def _finish(self, request, response, timings: list, total: float):
+        # Route pattern (not raw path) keeps label cardinality bounded
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.route if match is not None else "unmatched"
+        labels = {"endpoint": endpoint, "status": str(response.status_code)}
+        inc("cleartrade_requests_total", labels, help_text="API requests by endpoint and status.")
+        observe(
+            "cleartrade_request_seconds",
+            total,
+            {"endpoint": endpoint},
+            help_text="End-to-end API request latency.",
+        )
+        entries = [f"{name};dur={secs * 1000:.1f}" for name, secs in timings]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(entries)
+        # Let the cross-origin React app read the timings in the browser
+        response["Timing-Allow-Origin"] = "*"
+        return response
@@ -2,20 +2,27 @@ import numpy as np
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from analysis_app.agent import FEATURES, save_model_features
+from analysis_app.compiled_model import export_compiled
+from analysis_app.explainability import save_background
+from analysis_app.model_store import dump_joblib
 
-FEATURES = ["ma_10", "ma_30", "rsi", "volatility"]
 
-
-def add_labels(df: pd.DataFrame) -> pd.DataFrame:
+def add_labels(df: pd.DataFrame, by: str | None = None) -> pd.DataFrame:
     """
     Label each row with a discrete trend class based on next-day return:
     - 2 = BUY  if future return > +0.5%
     - 0 = SELL if future return < -0.5%
     - 1 = HOLD otherwise
+
+    For a multi-ticker long frame sorted by (ticker, date), pass by="ticker"
+    so returns never cross from one ticker into the next.
     """
     df = df.copy()
-    df["future_ret"] = df["close"].pct_change().shift(-1)
+    if by is None:
+        df["future_ret"] = df["close"].pct_change().shift(-1)
+    else:
+        df["future_ret"] = df.groupby(by, sort=False)["close"].pct_change().groupby(df[by], sort=False).shift(-1)
 
     df["y"] = np.where(
         df["future_ret"] > 0.005,
@@ -26,7 +33,7 @@ def add_labels(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def train_save(df: pd.DataFrame, model_path: str, model_type: str = "logreg"):
+def train_save(df: pd.DataFrame, model_path: str, model_type: str = "logreg", features=None):
     """
     Train a supervised classifier on engineered technical indicators.
 
@@ -34,11 +41,13 @@ def train_save(df: pd.DataFrame, model_path: str, model_type: str = "logreg"):
     - model_type=\"forest\"  → non-linear Random Forest model
 
     Both models expose predict_proba, so they can be used interchangeably
-    by the agent layer.
+    by the agent layer. `features` (default: agent.FEATURES) is saved next to
+    the model so prediction uses the same columns.
     """
-    df = df.dropna(subset=FEATURES + ["y"])
+    features = list(features or FEATURES)
+    df = df.dropna(subset=features + ["y"])
 
-    X = df[FEATURES].values
+    X = df[features].values
     y = df["y"].values
 
     model_type = (model_type or "logreg").lower()
@@ -57,4 +66,9 @@ def train_save(df: pd.DataFrame, model_path: str, model_type: str = "logreg"):
 
     model.fit(X, y)
 
-    joblib.dump(model, model_path)
\ No newline at end of file
+    dump_joblib(model, model_path)
+    save_model_features(model_path, features)
+    # Background mean for closed-form linear SHAP in explainability.py
+    save_background(model_path, X)
+    # sklearn-free scorer used by agent.predict when present
+    export_compiled(model, model_path)
@@ -0,0 +1,147 @@
+"""
+Shared model artifacts across worker processes.
+
+Artifacts are stored uncompressed so they can be opened with memory mapping:
+- joblib files (sklearn estimators) via joblib.load(mmap_mode="r"), which maps
+  their NumPy arrays (e.g. sentiment coef_, TF-IDF idf_) instead of copying them;
+- directories of raw .npy files plus a manifest.json (compiled technical model,
+  LSTM weights) via np.load(mmap_mode="r").
+
+Mapped pages live in the OS page cache, so every worker on a host shares one copy.
+With fork-based servers (e.g. gunicorn --preload), set CLEARTRADE_PRELOAD_MODELS=true
+so wsgi.py/asgi.py call preload() in the master before workers are forked.
+Set CLEARTRADE_MMAP_MODELS=false to load private in-memory copies instead.
+"""
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+
+MMAP_MODELS = os.getenv("CLEARTRADE_MMAP_MODELS", "true").lower() == "true"
+MANIFEST = "manifest.json"
+
+# absolute path -> (mtime_ns, loaded object)
+_CACHE: dict = {}
+
+
+def _mmap_mode():
+    return "r" if MMAP_MODELS else None
+
+
+def _version_file(path: str) -> str:
+    return os.path.join(path, MANIFEST) if os.path.isdir(path) else path
+
+
+def artifact_mtime(path: str) -> int | None:
+    """mtime_ns of a joblib file or of an .npy directory's manifest; None if missing."""
+    try:
+        return os.stat(_version_file(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached(path: str, loader):
+    path = os.path.abspath(path)
+    mtime = artifact_mtime(path)
+    if mtime is None:
+        return None
+    cached = _CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    obj = loader(path)
+    _CACHE[path] = (mtime, obj)
+    return obj
+
+
+def load_joblib(path: str):
+    """joblib.load with memory-mapped arrays, cached per file version. None if missing."""
+    return _cached(path, lambda p: joblib.load(p, mmap_mode=_mmap_mode()))
+
+
+def dump_joblib(obj, path: str) -> None:
+    """
+    Uncompressed joblib.dump via a temp file + rename, so workers that have the
+    old file mapped are never left reading a truncated file.
+    """
+    tmp = path + ".tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def save_npy_dir(path: str, arrays: dict, meta: dict | None = None) -> str:
+    """
+    Write arrays as raw .npy files plus manifest.json (written last) into `path`.
+    The new directory is swapped in atomically-ish; processes that already mapped
+    the old files keep reading them until they reload.
+    """
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(arr), allow_pickle=False)
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"arrays": sorted(arrays), "meta": meta or {}}, f)
+    old = path + ".old"
+    if os.path.isdir(path):
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def read_npy_dir(path: str, mmap_mode: str | None = "r"):
+    """
+    (arrays, meta) from a save_npy_dir directory, not cached; None if missing.
+    For data that is read and dropped: each mapped array keeps a file descriptor
+    open until it is garbage collected.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    arrays = {
+        name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in manifest["arrays"]
+    }
+    return arrays, manifest.get("meta", {})
+
+
+def _read_npy_dir(path: str):
+    return read_npy_dir(path, mmap_mode=_mmap_mode())
+
+
+def load_npy_dir(path: str):
+    """(arrays, meta) from a save_npy_dir directory, memory-mapped and cached. None if missing."""
+    return _cached(path, _read_npy_dir)
+
+
+def preload() -> list[str]:
+    """
+    Load every model artifact that exists into this process's cache.
+    Call before forking workers so they inherit the mappings.
+    """
+    from django.conf import settings
+    from analysis_app.compiled_model import load_compiled
+    from analysis_app.explainability import _entry
+    from analysis_app.lstm_model import LSTM_WEIGHTS_DIR
+    from analysis_app.sentiment_model import SENTIMENT_MODEL_PATH, SENTIMENT_VECTORIZER_PATH
+
+    loaded = []
+    # views use a cwd-relative path, management commands use BASE_DIR; warm both cache keys
+    for model_path in ("analysis_model.joblib", os.path.join(settings.BASE_DIR, "analysis_model.joblib")):
+        if not os.path.isfile(model_path):
+            continue
+        load_compiled(model_path)
+        _entry(model_path)
+        if os.path.abspath(model_path) not in loaded:
+            loaded.append(os.path.abspath(model_path))
+    for path in (SENTIMENT_MODEL_PATH, SENTIMENT_VECTORIZER_PATH):
+        if load_joblib(path) is not None:
+            loaded.append(path)
+    if load_npy_dir(LSTM_WEIGHTS_DIR) is not None:
+        loaded.append(LSTM_WEIGHTS_DIR)
+    return loaded
@@ -0,0 +1,223 @@
+"""
+The full analysis pipeline behind /api/analyze (technical + fundamental + sentiment
+→ fusion → stored Recommendation), callable without an HTTP request.
+
+The stages are split into I/O (load_*, store) and CPU (score, explain) functions so
+run_analysis (sequential) and async_pipeline.run_analysis_async (concurrent) share them.
+
+interval="1d" (default) reads daily StockPrice rows; any other bar_store interval
+("5m", "1h", ...) reads the newest INTRADAY_BARS bars from the intraday bar store.
+Indicator windows count bars, so MA-10 on 5m bars spans 50 minutes.
+"""
+import os
+
+import pandas as pd
+
+from core.models import StockPrice, FundamentalMetric, NewsHeadline, Recommendation
+from analysis_app.indicators import BASE_FEATURES as INDICATOR_NAMES, compute_features, compute_indicators, price_columns
+from analysis_app.sentiment import score_sentiment
+from analysis_app.agent import (
+    predict,
+    fuse,
+    summarize_for_human,
+    compute_fundamental_score,
+    model_features,
+)
+from analysis_app.bar_store import BarStore, interval_seconds
+from analysis_app.live_data import ensure_prices_for_ticker, ensure_fundamentals_and_news
+from analysis_app import write_behind
+from analysis_app.metrics import inc, stage
+
+MODEL_PATH = "analysis_model.joblib"
+LSTM_SEQUENCE_LEN = 20
+MIN_PRICE_ROWS = 60
+PRICES_ERROR = {"error": "Need at least 60 rows of prices for indicators."}
+# Bars loaded per intraday analysis; bounds memory and indicator time at any interval
+INTRADAY_BARS = int(os.getenv("CLEARTRADE_INTRADAY_BARS", "500"))
+
+
+def load_prices(ticker: str, interval: str = "1d") -> pd.DataFrame | None:
+    """
+    Price history for the ticker (date, close, plus any OHLCV columns the model's
+    features need), or None when there are too few rows for indicators.
+    """
+    columns = ["date", *price_columns(model_features(MODEL_PATH))]
+    if interval != "1d":
+        interval_seconds(interval)
+        with stage("bar_store"):
+            bars = BarStore().bars(ticker, interval, limit=INTRADAY_BARS)
+        return bars[columns] if len(bars) >= MIN_PRICE_ROWS else None
+    with stage("db_prices"):
+        rows = list(StockPrice.objects.filter(ticker=ticker).order_by("date").values_list(*columns))
+    if len(rows) < MIN_PRICE_ROWS:
+        return None
+    return pd.DataFrame(rows, columns=columns)
+
+
+def load_fundamentals(ticker: str) -> tuple:
+    """(pe_ratio, earnings_growth, revenue_growth) from the latest snapshot, or Nones."""
+    with stage("db_fundamentals"):
+        fund = FundamentalMetric.objects.filter(ticker=ticker).order_by("-period_end").first()
+    if not fund:
+        return None, None, None
+    return fund.pe_ratio, fund.earnings_growth, fund.revenue_growth
+
+
+def load_headlines(ticker: str) -> list[str]:
+    with stage("db_news"):
+        return list(
+            NewsHeadline.objects.filter(ticker=ticker).order_by("-date").values_list("headline", flat=True)[:10]
+        )
+
+
+def score(prices: pd.DataFrame, fundamentals: tuple, headlines: list[str]) -> dict:
+    """
+    CPU-bound part of the pipeline: indicators, sentiment, model prediction and fusion.
+    Touches no database, so it can run in any thread or executor.
+    """
+    pe, eg, rg = fundamentals
+    extra = [f for f in model_features(MODEL_PATH) if f not in INDICATOR_NAMES]
+    with stage("indicators"):
+        df = prices.copy()
+        df["date"] = pd.to_datetime(df["date"])
+        if extra:
+            # One pass computes the base indicators and the model's extended features
+            df = compute_features(df, extra).dropna(subset=["ret", *INDICATOR_NAMES, *extra])
+        else:
+            df = compute_indicators(df).dropna()
+    latest = df.iloc[-1]
+
+    feats = {
+        "ma_10": float(latest["ma_10"]),
+        "ma_30": float(latest["ma_30"]),
+        "rsi": float(latest["rsi"]),
+        "volatility": float(latest["volatility"]),
+        **{f: float(latest[f]) for f in extra},
+    }
+    # Build sequence for LSTM if available (last LSTM_SEQUENCE_LEN rows)
+    feats_sequence = None
+    if len(df) >= LSTM_SEQUENCE_LEN:
+        try:
+            feats_sequence = df.iloc[-LSTM_SEQUENCE_LEN:][list(INDICATOR_NAMES)].values.astype("float32")
+        except Exception:
+            pass
+
+    if headlines:
+        with stage("sentiment"):
+            sentiment = score_sentiment(headlines)
+    else:
+        sentiment = None
+
+    with stage("predict"):
+        signal, conf, probs = predict(MODEL_PATH, feats, feats_sequence=feats_sequence)
+    with stage("fuse"):
+        final_signal, final_conf, explanation = fuse(
+            signal, conf, pe, eg, rg, sentiment, probs=probs
+        )
+        fundamental_score = compute_fundamental_score(pe, eg, rg)
+
+    summary = summarize_for_human(
+        final_signal,
+        final_conf,
+        feats,
+        pe,
+        eg,
+        rg,
+        sentiment,
+    )
+    return {
+        "signal": final_signal,
+        "confidence": final_conf,
+        "explanation": explanation,
+        "summary": summary,
+        "probs": probs,
+        "features": feats,
+        "fundamentals": fundamentals,
+        "fundamental_score": fundamental_score,
+        "sentiment": sentiment,
+    }
+
+
+def store(ticker: str, scored: dict, interval: str = "1d") -> Recommendation:
+    """Insert the Recommendation, or queue it when write-behind is enabled."""
+    feats = scored["features"]
+    pe, eg, rg = scored["fundamentals"]
+    with stage("db_insert"):
+        rec = Recommendation(
+            ticker=ticker,
+            interval=interval,
+            signal=scored["signal"],
+            confidence=scored["confidence"],
+            explanation=scored["explanation"],
+            ma_10=feats["ma_10"],
+            ma_30=feats["ma_30"],
+            rsi=feats["rsi"],
+            volatility=feats["volatility"],
+            sentiment=scored["sentiment"],
+            pe_ratio=pe,
+            earnings_growth=eg,
+            revenue_growth=rg,
+        )
+        if write_behind.ENABLED:
+            write_behind.buffer.add(rec)
+        else:
+            rec.save(force_insert=True)
+    inc("cleartrade_signals_total", {"signal": rec.signal}, help_text="Recommendations produced by signal.")
+    return rec
+
+
+def explain(scored: dict) -> tuple:
+    """(feature_importance, shap_values) for the technical model."""
+    from analysis_app.explainability import get_feature_importance, get_shap_values
+
+    names = model_features(MODEL_PATH)
+    with stage("explain"):
+        feature_importance = get_feature_importance(MODEL_PATH, scored["features"], scored["probs"], names)
+        shap_values = get_shap_values(MODEL_PATH, scored["features"], names)
+    return feature_importance, shap_values
+
+
+def build_payload(ticker: str, rec: Recommendation, scored: dict, explained: tuple) -> dict:
+    pe, eg, rg = scored["fundamentals"]
+    feature_importance, shap_values = explained
+    return {
+        "ticker": ticker,
+        "interval": rec.interval,
+        "recommendation": rec.signal,
+        "confidence": rec.confidence,
+        "explanation": rec.explanation,
+        "summary": scored["summary"],
+        "class_probabilities": scored["probs"],
+        "features": scored["features"],
+        "fundamentals": {"pe_ratio": pe, "earnings_growth": eg, "revenue_growth": rg},
+        "fundamental_score": scored["fundamental_score"],
+        "sentiment": scored["sentiment"],
+        "feature_importance": feature_importance,
+        "shap_values": shap_values,
+    }
+
+
+def run_analysis(ticker: str, live: bool = True, interval: str = "1d") -> tuple[dict, int]:
+    """
+    Run the pipeline for one (already normalised) ticker.
+    live=False skips the Yahoo Finance fetches and uses only data already in the DB.
+    Returns (payload, http_status).
+    """
+    # If we don't already have enough historical data for this ticker,
+    # try to fetch recent prices from Yahoo Finance on the fly.
+    if live and interval == "1d":
+        with stage("live_prices"):
+            ensure_prices_for_ticker(ticker)
+    if live:
+        # Best-effort fetch of fundamentals and recent news so those panels are
+        # populated for well-known tickers during the demo.
+        with stage("live_fundamentals_news"):
+            ensure_fundamentals_and_news(ticker)
+
+    prices = load_prices(ticker, interval)
+    if prices is None:
+        return dict(PRICES_ERROR), 400
+
+    scored = score(prices, load_fundamentals(ticker), load_headlines(ticker))
+    rec = store(ticker, scored, interval)
+    return build_payload(ticker, rec, scored, explain(scored)), 200
@@ -0,0 +1,217 @@
+"""
+On-demand profiling for single analysis requests.
+
+Two modes:
+- "sample" (default): a background thread samples the request thread's stack every
+  few milliseconds and writes collapsed stacks ("a;b;c 12" per line), which
+  flamegraph.pl, speedscope or inferno render directly as a flame graph.
+- "cprofile": deterministic cProfile; writes a .prof file (snakeviz, pstats) and a
+  text summary sorted by cumulative time.
+
+Views opt in with @profiled; only staff users can trigger it, via ?profile=sample|cprofile
+or the X-ClearTrade-Profile header. Reports go to settings.CLEARTRADE_PROFILE_DIR.
+
+Async views (analyze_async, analyze_batch) are profiled for the whole coroutine.
+Their stages run on executor threads, so "sample" samples every thread (each
+stack is rooted at its thread's name), and "cprofile" sees only the event-loop
+thread: coroutine steps plus time spent awaiting the executors. Both also pick
+up any other request the process serves meanwhile, so profile on a quiet worker.
+"""
+import asyncio
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+MODES = ("sample", "cprofile")
+DEFAULT_INTERVAL = 0.001
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack (or every other thread's, if thread_id is None) into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int | None, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames.get(self.thread_id)}
+            else:
+                frames.pop(threading.get_ident(), None)
+                if not frames.keys() <= names.keys():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack and self.thread_id is None:
+                    stack.append(names.get(ident, str(ident)))
+                if stack:
+                    self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _report_path(label: str, suffix: str) -> str:
+    out_dir = getattr(settings, "CLEARTRADE_PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+    os.makedirs(out_dir, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(out_dir, f"{safe}-{stamp}-{os.getpid()}{suffix}")
+
+
+def _write_cprofile(label: str, prof: cProfile.Profile, elapsed: float) -> dict:
+    path = _report_path(label, ".prof")
+    prof.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(30)
+    with open(path[: -len(".prof")] + ".txt", "w", encoding="utf-8") as f:
+        f.write(text.getvalue())
+    return {"mode": "cprofile", "report": path, "seconds": elapsed}
+
+
+def _write_folded(label: str, sampler: _StackSampler, elapsed: float) -> dict:
+    path = _report_path(label, ".folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sampler.counts.most_common():
+            f.write(f"{stack} {count}\n")
+    return {
+        "mode": "sample",
+        "report": path,
+        "seconds": elapsed,
+        "samples": sum(sampler.counts.values()),
+    }
+
+
+def profile_call(label: str, fn, *args, mode: str = "sample", interval: float = DEFAULT_INTERVAL, **kwargs):
+    """
+    Run fn(*args, **kwargs) under the chosen profiler and write the report.
+    Returns (result, info) where info = {"mode", "report", "seconds", ...}.
+    """
+    mode = mode if mode in MODES else "sample"
+    start = time.perf_counter()
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        result = prof.runcall(fn, *args, **kwargs)
+        return result, _write_cprofile(label, prof, time.perf_counter() - start)
+
+    sampler = _StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        sampler.stop()
+    return result, _write_folded(label, sampler, time.perf_counter() - start)
+
+
+async def profile_call_async(label: str, coro_fn, *args, mode: str = "sample", interval: float = DEFAULT_INTERVAL, **kwargs):
+    """profile_call for a coroutine function; see the module docstring for what each mode covers."""
+    mode = mode if mode in MODES else "sample"
+    start = time.perf_counter()
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            result = await coro_fn(*args, **kwargs)
+        finally:
+            prof.disable()
+        return result, _write_cprofile(label, prof, time.perf_counter() - start)
+
+    sampler = _StackSampler(None, interval)
+    sampler.start()
+    try:
+        result = await coro_fn(*args, **kwargs)
+    finally:
+        sampler.stop()
+    return result, _write_folded(label, sampler, time.perf_counter() - start)
+
+
+def _mode_for(value: str | None, user) -> str | None:
+    if not value or user is None or not getattr(user, "is_staff", False):
+        return None
+    value = value.strip().lower()
+    return value if value in MODES else "sample"
+
+
+def _asked(request) -> str | None:
+    return request.GET.get("profile") or request.META.get("HTTP_X_CLEARTRADE_PROFILE")
+
+
+def requested_mode(request) -> str | None:
+    """Profiling mode asked for by a staff user on this request, or None."""
+    value = _asked(request)
+    if not value:
+        return None
+    return _mode_for(value, getattr(request, "user", None))
+
+
+async def arequested_mode(request) -> str | None:
+    """requested_mode for async views (loads the user with request.auser())."""
+    value = _asked(request)
+    if not value:
+        return None
+    auser = getattr(request, "auser", None)
+    return _mode_for(value, await auser() if auser is not None else None)
+
+
+def _attach(response, info: dict):
+    response["X-ClearTrade-Profile-Report"] = os.path.basename(info["report"])
+    if isinstance(getattr(response, "data", None), dict):
+        response.data["profile"] = info
+    elif response.get("Content-Type", "").startswith("application/json"):
+        body = json.loads(response.content)
+        if isinstance(body, dict):
+            response.content = json.dumps({**body, "profile": info})
+    return response
+
+
+def profiled(label: str):
+    """
+    View decorator (place under @api_view, or directly on an async view): when a
+    staff user sends ?profile=..., run the view under the profiler and attach
+    the report location to the response.
+    """
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                mode = await arequested_mode(request)
+                if mode is None:
+                    return await view(request, *args, **kwargs)
+                response, info = await profile_call_async(label, view, request, *args, mode=mode, **kwargs)
+                return _attach(response, info)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            mode = requested_mode(request)
+            if mode is None:
+                return view(request, *args, **kwargs)
+            response, info = profile_call(label, view, request, *args, mode=mode, **kwargs)
+            return _attach(response, info)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,196 @@
+"""
+Push updates for watchlists: /api/stream (Server-Sent Events, ASGI).
+
+Each event loop (one per ASGI worker) runs a single RecommendationFeed. While
+anyone is subscribed it polls for new Recommendation rows every
+CLEARTRADE_PUSH_POLL_SECONDS, restricted to the tickers someone is watching, so
+the database sees one small indexed query per tick however many clients are
+connected. Rows from any process (analyze views in other workers,
+`stream_signals --store`, batch jobs) are picked up the same way.
+
+Ids do not become visible in commit order: on MySQL, or with write-behind
+bulk inserts, a lower id can commit after a higher one is already visible. Each
+poll therefore re-reads the ids allocated in the last
+CLEARTRADE_PUSH_RESCAN_SECONDS (default 5) and skips the ones already seen. Only
+ids older than that window are treated as settled.
+
+A row is pushed only if its ticker's signal changed, or its confidence moved by
+more than CLEARTRADE_PUSH_MIN_CHANGE (default: any change), since the last
+snapshot for that ticker and interval. Fan-out goes through a ticker →
+subscribers index. Each subscriber keeps only the newest unsent snapshot per
+ticker, so a slow client gets the latest state rather than a growing backlog.
+"""
+import asyncio
+import collections
+import os
+import time
+import weakref
+
+from django.db.models import Max
+
+from core.models import Recommendation
+from analysis_app.async_db import db_to_async
+from analysis_app.metrics import inc
+
+POLL_SECONDS = float(os.getenv("CLEARTRADE_PUSH_POLL_SECONDS", "1.0"))
+MIN_CHANGE = float(os.getenv("CLEARTRADE_PUSH_MIN_CHANGE", "0"))
+RESCAN_SECONDS = float(os.getenv("CLEARTRADE_PUSH_RESCAN_SECONDS", "5"))
+HEARTBEAT_SECONDS = 15.0
+MAX_WATCHLIST = 200
+# Above this many watched tickers, poll every new row instead of a long IN list
+MAX_FILTER_TICKERS = 1000
+
+FIELDS = (
+    "id", "ticker", "interval", "created_at", "signal", "confidence", "explanation",
+    "ma_10", "ma_30", "rsi", "volatility", "sentiment", "pe_ratio", "earnings_growth", "revenue_growth",
+)
+
+_feeds: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class Subscription:
+    def __init__(self, tickers, interval: str | None):
+        self.tickers = frozenset(tickers)
+        self.interval = interval
+        self._pending: dict = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, snapshot: dict) -> None:
+        # Replaces an unsent snapshot of the same ticker/interval
+        self._pending[(snapshot["ticker"], snapshot["interval"])] = snapshot
+        self._ready.set()
+
+    async def next(self, timeout: float = HEARTBEAT_SECONDS) -> list[dict]:
+        """Snapshots waiting for this client, oldest row first; [] after `timeout` seconds idle."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        snapshots, self._pending = self._pending, {}
+        return sorted(snapshots.values(), key=lambda s: s["id"])
+
+
+class RecommendationFeed:
+    def __init__(
+        self, poll_seconds: float = POLL_SECONDS, min_change: float = MIN_CHANGE, rescan_seconds: float = RESCAN_SECONDS
+    ):
+        self.poll_seconds = poll_seconds
+        self.min_change = min_change
+        self.rescan_seconds = rescan_seconds
+        self._watchers: dict[str, set[Subscription]] = {}
+        # (ticker, interval) -> (signal, confidence) last pushed, newest id seen
+        self._last: dict = {}
+        self._floor = None  # ids up to here are settled: committed, or never will be
+        self._seen: set = set()  # ids above the floor already polled
+        self._marks: collections.deque = collections.deque()  # (monotonic time, max id) per poll
+        self._task: asyncio.Task | None = None
+
+    async def subscribe(self, tickers, interval: str | None = None) -> Subscription:
+        """Register a watchlist; the subscription starts with each ticker's latest snapshot."""
+        sub = Subscription(tickers, interval)
+        latest_id, rows = await db_to_async(self._latest)(sorted(sub.tickers), interval)
+        if self._floor is None:
+            self._floor = latest_id
+        for row in rows:
+            key = (row["ticker"], row["interval"])
+            if row["id"] <= self._floor or row["id"] in self._seen:
+                self._last.setdefault(key, (row["signal"], row["confidence"], row["id"]))
+            sub.offer(_snapshot(row))
+        for ticker in sub.tickers:
+            self._watchers.setdefault(ticker, set()).add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for ticker in sub.tickers:
+            watchers = self._watchers.get(ticker)
+            if watchers is not None:
+                watchers.discard(sub)
+                if not watchers:
+                    del self._watchers[ticker]
+                    self._last = {k: v for k, v in self._last.items() if k[0] != ticker}
+
+    @staticmethod
+    def _latest(tickers: list[str], interval: str | None) -> tuple[int, list[dict]]:
+        latest_id = Recommendation.objects.aggregate(last=Max("id"))["last"] or 0
+        qs = Recommendation.objects.filter(ticker__in=tickers)
+        if interval:
+            qs = qs.filter(interval=interval)
+        ids = [r["last"] for r in qs.values("ticker", "interval").annotate(last=Max("id"))]
+        return latest_id, list(Recommendation.objects.filter(id__in=ids).values(*FIELDS))
+
+    def _new_rows(self, tickers: list[str] | None) -> list[dict]:
+        now = time.monotonic()
+        latest_id = Recommendation.objects.aggregate(last=Max("id"))["last"] or 0
+        # Every id allocated before a poll at least rescan_seconds old has committed by now
+        while self._marks and self._marks[0][0] <= now - self.rescan_seconds:
+            self._floor = max(self._floor, self._marks.popleft()[1])
+        self._marks.append((now, latest_id))
+        self._seen = {i for i in self._seen if i > self._floor}
+        if latest_id <= self._floor:
+            return []
+        qs = Recommendation.objects.filter(id__gt=self._floor)
+        if tickers is not None:
+            qs = qs.filter(ticker__in=tickers)
+        ids = [i for i in qs.values_list("id", flat=True) if i not in self._seen]
+        if not ids:
+            return []
+        self._seen.update(ids)
+        return list(Recommendation.objects.filter(id__in=ids).order_by("id").values(*FIELDS))
+
+    async def _run(self) -> None:
+        while self._watchers:
+            await asyncio.sleep(self.poll_seconds)
+            watched = list(self._watchers)
+            try:
+                rows = await db_to_async(self._new_rows)(
+                    watched if len(watched) <= MAX_FILTER_TICKERS else None
+                )
+            except Exception:
+                inc("cleartrade_push_poll_errors_total", help_text="Failed polls of the push feed.")
+                continue
+            self.publish(rows)
+        # Idle: the next subscriber starts again from its initial snapshot
+        self._floor = None
+        self._seen = set()
+        self._marks.clear()
+
+    def publish(self, rows: list[dict]) -> int:
+        """Push rows that change their ticker's signal/confidence to its watchers; returns snapshots sent."""
+        sent = 0
+        for row in rows:
+            watchers = self._watchers.get(row["ticker"])
+            if not watchers:
+                continue
+            key = (row["ticker"], row["interval"])
+            last = self._last.get(key)
+            if last is not None:
+                if row["id"] < last[2]:
+                    continue  # committed late, but a newer row of this ticker is already out
+                if last[0] == row["signal"] and abs(row["confidence"] - last[1]) <= self.min_change:
+                    self._last[key] = (last[0], last[1], row["id"])
+                    continue
+            self._last[key] = (row["signal"], row["confidence"], row["id"])
+            snapshot = _snapshot(row)
+            for sub in watchers:
+                if sub.interval is None or sub.interval == row["interval"]:
+                    sub.offer(snapshot)
+                    sent += 1
+        if sent:
+            inc("cleartrade_push_snapshots_total", value=sent, help_text="Recommendation snapshots pushed to subscribers.")
+        return sent
+
+
+def _snapshot(row: dict) -> dict:
+    return {**row, "created_at": row["created_at"].isoformat() if row["created_at"] else None}
+
+
+def get_feed() -> RecommendationFeed:
+    """The feed of the running event loop (tasks and events belong to one loop)."""
+    loop = asyncio.get_running_loop()
+    feed = _feeds.get(loop)
+    if feed is None:
+        feed = _feeds[loop] = RecommendationFeed()
+    return feed
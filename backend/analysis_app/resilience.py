@@ -0,0 +1,175 @@
+"""
+Negative-result cache and circuit breaker for upstream (Yahoo Finance) calls.
+
+- NegativeCache remembers keys that returned no data (typos, delisted symbols) for
+  a TTL, so live_data stops re-downloading them on every request.
+- CircuitBreaker fails fast after `failure_threshold` consecutive failures (errors
+  or calls slower than `slow_call_seconds`), stays open for `reset_timeout`, then
+  lets one trial call through (half-open) and closes again if it succeeds.
+
+Both keep plain integer counters (see .counters()) and mirror them to the metrics
+module. The clock is injectable so behaviour can be checked without sleeping.
+"""
+import os
+import threading
+import time
+
+from analysis_app.metrics import inc
+
+NEGATIVE_CACHE_TTL = float(os.getenv("CLEARTRADE_NEGATIVE_CACHE_TTL", "900"))
+YAHOO_BREAKER_FAILURES = int(os.getenv("CLEARTRADE_YAHOO_BREAKER_FAILURES", "5"))
+YAHOO_BREAKER_RESET = float(os.getenv("CLEARTRADE_YAHOO_BREAKER_RESET", "30"))
+YAHOO_SLOW_CALL = float(os.getenv("CLEARTRADE_YAHOO_SLOW_CALL", "10"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+
+class NegativeCache:
+    def __init__(self, ttl: float = NEGATIVE_CACHE_TTL, max_entries: int = 10_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._expires: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def add(self, key) -> None:
+        with self._lock:
+            if len(self._expires) >= self.max_entries:
+                now = self.clock()
+                self._expires = {k: t for k, t in self._expires.items() if t > now}
+                if len(self._expires) >= self.max_entries:
+                    self._expires.pop(next(iter(self._expires)))
+            self._expires[key] = self.clock() + self.ttl
+            self.stores += 1
+        inc("cleartrade_negative_cache_total", {"event": "store"}, help_text="Negative cache stores, hits and misses.")
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            expires = self._expires.get(key)
+            hit = expires is not None and expires > self.clock()
+            if expires is not None and not hit:
+                del self._expires[key]
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        inc("cleartrade_negative_cache_total", {"event": "hit" if hit else "miss"})
+        return hit
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires.clear()
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "entries": len(self._expires)}
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = YAHOO_BREAKER_FAILURES,
+        reset_timeout: float = YAHOO_BREAKER_RESET,
+        slow_call_seconds: float = YAHOO_SLOW_CALL,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def _admit(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN or (state == self.HALF_OPEN and self._trial_running):
+                self.rejected += 1
+                rejected = True
+            else:
+                self._trial_running = state == self.HALF_OPEN
+                self.calls += 1
+                rejected = False
+        if rejected:
+            inc("cleartrade_breaker_rejected_total", {"breaker": self.name}, help_text="Calls rejected by an open circuit breaker.")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def _record(self, ok: bool) -> None:
+        opened = False
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self._consecutive = 0
+                self._state = self.CLOSED
+            else:
+                self.failures += 1
+                self._consecutive += 1
+                if self._state == self.HALF_OPEN or self._consecutive >= self.failure_threshold:
+                    opened = self._state != self.OPEN
+                    self._state = self.OPEN
+                    self._opened_at = self.clock()
+                    if opened:
+                        self.opened += 1
+        if not ok:
+            inc("cleartrade_breaker_failures_total", {"breaker": self.name}, help_text="Failed or slow upstream calls.")
+        if opened:
+            inc("cleartrade_breaker_opened_total", {"breaker": self.name}, help_text="Times a circuit breaker opened.")
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn through the breaker; raises CircuitOpenError while open."""
+        self._admit()
+        start = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            self._record(False)
+            raise
+        self._record(self.clock() - start <= self.slow_call_seconds)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive = 0
+            self._trial_running = False
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.opened,
+            }
+
+
+yahoo_breaker = CircuitBreaker("yahoo")
+negative_cache = NegativeCache()
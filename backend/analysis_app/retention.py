@@ -0,0 +1,301 @@
+"""
+Retention for the Recommendation table: full rows for the last N days, one
+RecommendationDaily row per ticker, interval and UTC day before that.
+
+apply_retention() walks the days older than the cutoff, oldest first, one day
+at a time, so memory and transaction size are bounded by a single day. Each day:
+
+1. the day's highest id is read once; both steps below only touch rows with
+   id <= that bound, so a row backfilled into the day in between is left for
+   the next pass instead of being deleted without an archive;
+2. its raw rows are written to <archive_dir>/<YYYY>/<YYYY-MM-DD>.ndjson.gz (or
+   .csv.gz) with history.export_chunks, through a temp file renamed into place;
+3. in one transaction, the day is rolled up with a GROUP BY (counts per signal,
+   mean confidence, the last row's signal/confidence/explanation), merged into
+   any rollup already stored for that day, and the raw rows are deleted in
+   DELETE_BATCH-row batches.
+
+A crash between steps leaves either nothing or a spare archive file, never a
+day counted twice. Running it again later only touches days past the cutoff
+that still have raw rows.
+
+On MySQL the table can also be range-partitioned by month of created_at
+(partition_mysql). Retention then drops the partitions that lie wholly before
+the cutoff, since they are empty after the rollup, and adds future months.
+"""
+import datetime as dt
+import gzip
+import os
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from core.models import Recommendation, RecommendationDaily
+from analysis_app.history import FIELDS, export_chunks
+
+DELETE_BATCH = 10_000
+ARCHIVE_FORMATS = ("ndjson", "csv")
+PARTITION_MONTHS_AHEAD = 3
+
+
+def cutoff_for(keep_days: int) -> dt.datetime:
+    """Start of the oldest UTC day that keeps full detail."""
+    today = timezone.now().astimezone(dt.timezone.utc).date()
+    return dt.datetime.combine(today - dt.timedelta(days=keep_days), dt.time(), tzinfo=dt.timezone.utc)
+
+
+def _day_bounds(day: dt.date) -> tuple[dt.datetime, dt.datetime]:
+    start = dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc)
+    return start, start + dt.timedelta(days=1)
+
+
+def last_id(day: dt.date) -> int | None:
+    """Highest id among the day's raw rows (None if there are none)."""
+    start, end = _day_bounds(day)
+    return Recommendation.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(last=Max("id"))["last"]
+
+
+def archive_day(day: dt.date, archive_dir: str, fmt: str = "ndjson", max_id: int | None = None) -> str:
+    """
+    Write the day's raw rows (all fields, oldest first; only id <= max_id if given)
+    to a gzip file; returns its path.
+    """
+    start, end = _day_bounds(day)
+    folder = os.path.join(archive_dir, f"{day:%Y}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{day:%Y-%m-%d}.{fmt}.gz")
+    n = 1
+    while os.path.exists(path):  # re-run for late rows: keep earlier archives
+        path = os.path.join(folder, f"{day:%Y-%m-%d}.{n}.{fmt}.gz")
+        n += 1
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8", newline="") as f:
+            for part in export_chunks(None, FIELDS, start, end, fmt=fmt, max_id=max_id):
+                f.write(part)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def rollup_day(day: dt.date, max_id: int | None = None) -> tuple[int, int]:
+    """
+    Fold the day's raw rows with id <= max_id (default: all of them now) into
+    RecommendationDaily and delete them, atomically. Pass the bound the archive
+    used so that exactly the archived rows are removed.
+    Returns (rows removed, rollup rows written).
+    """
+    start, end = _day_bounds(day)
+    with transaction.atomic():
+        raw = Recommendation.objects.filter(created_at__gte=start, created_at__lt=end)
+        # Rows arriving later (backfills, or a skewed clock) wait for the next run
+        if max_id is None:
+            max_id = raw.aggregate(last=Max("id"))["last"]
+        if max_id is None:
+            return 0, 0
+        raw = raw.filter(id__lte=max_id)
+        # The group's last row in history order (created_at, id); ids of backfilled rows need not follow time
+        latest = raw.filter(ticker=OuterRef("ticker"), interval=OuterRef("interval")).order_by("-created_at", "-id")
+        groups = list(
+            raw.values("ticker", "interval").annotate(
+                n=Count("id"),
+                buy=Count("id", filter=Q(signal="BUY")),
+                hold=Count("id", filter=Q(signal="HOLD")),
+                sell=Count("id", filter=Q(signal="SELL")),
+                mean=Avg("confidence"),
+                first_at=Min("created_at"),
+                last_id=Subquery(latest.values("id")[:1]),
+            )
+        )
+        last = Recommendation.objects.in_bulk([g["last_id"] for g in groups])
+        existing = {
+            (r.ticker, r.interval): r
+            for r in RecommendationDaily.objects.select_for_update().filter(
+                day=day, ticker__in={g["ticker"] for g in groups}
+            )
+        }
+        new, changed = [], []
+        for g in groups:
+            rec = last[g["last_id"]]
+            row = existing.get((g["ticker"], g["interval"]))
+            if row is None:
+                row = RecommendationDaily(
+                    ticker=g["ticker"], interval=g["interval"], day=day,
+                    count=0, buy_count=0, hold_count=0, sell_count=0, mean_confidence=0.0,
+                    first_at=g["first_at"], last_at=rec.created_at,
+                )
+                new.append(row)
+            else:
+                changed.append(row)
+            total = row.count + g["n"]
+            row.mean_confidence = (row.mean_confidence * row.count + g["mean"] * g["n"]) / total
+            row.count = total
+            row.buy_count += g["buy"]
+            row.hold_count += g["hold"]
+            row.sell_count += g["sell"]
+            row.first_at = min(row.first_at, g["first_at"])
+            if rec.created_at >= row.last_at or row.pk is None:
+                row.last_at = rec.created_at
+                row.last_signal = rec.signal
+                row.last_confidence = rec.confidence
+                row.last_explanation = rec.explanation
+                row.last_rsi = rec.rsi
+                row.last_sentiment = rec.sentiment
+        RecommendationDaily.objects.bulk_create(new, batch_size=1000)
+        RecommendationDaily.objects.bulk_update(
+            changed,
+            ["count", "buy_count", "hold_count", "sell_count", "mean_confidence", "first_at", "last_at",
+             "last_signal", "last_confidence", "last_explanation", "last_rsi", "last_sentiment"],
+            batch_size=1000,
+        )
+        removed = 0
+        while True:
+            ids = list(raw.order_by().values_list("id", flat=True)[:DELETE_BATCH])
+            if not ids:
+                break
+            removed += Recommendation.objects.filter(id__in=ids).delete()[0]
+    return removed, len(groups)
+
+
+def expired_days(cutoff: dt.datetime):
+    """Yield each UTC day before `cutoff` that still has raw rows, oldest first."""
+    while True:
+        oldest = Recommendation.objects.filter(created_at__lt=cutoff).aggregate(first=Min("created_at"))["first"]
+        if oldest is None:
+            return
+        yield oldest.astimezone(dt.timezone.utc).date()
+
+
+def apply_retention(
+    keep_days: int | None = None,
+    archive_dir: str | None = None,
+    archive: bool = True,
+    fmt: str = "ndjson",
+    log=None,
+) -> dict:
+    """Archive, roll up and delete every day older than `keep_days`; returns totals."""
+    keep_days = settings.CLEARTRADE_RETENTION_DAYS if keep_days is None else keep_days
+    archive_dir = archive_dir or settings.CLEARTRADE_ARCHIVE_DIR
+    if keep_days < 1:
+        raise ValueError("keep_days must be at least 1")
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"archive format must be one of {', '.join(ARCHIVE_FORMATS)}")
+    cutoff = cutoff_for(keep_days)
+    totals = {"days": 0, "rows": 0, "rollups": 0, "files": [], "cutoff": cutoff}
+    for day in expired_days(cutoff):
+        max_id = last_id(day)
+        if archive:
+            path = archive_day(day, archive_dir, fmt, max_id=max_id)
+            totals["files"].append(path)
+        removed, rollups = rollup_day(day, max_id)
+        totals["days"] += 1
+        totals["rows"] += removed
+        totals["rollups"] += rollups
+        if log:
+            log(f"{day}: {removed} rows → {rollups} daily rows" + (f", archived to {path}" if archive else ""))
+    return totals
+
+
+def pending(keep_days: int | None = None) -> dict:
+    """What apply_retention would process now (rows and days before the cutoff)."""
+    keep_days = settings.CLEARTRADE_RETENTION_DAYS if keep_days is None else keep_days
+    cutoff = cutoff_for(keep_days)
+    stats = Recommendation.objects.filter(created_at__lt=cutoff).aggregate(
+        rows=Count("id"), first=Min("created_at")
+    )
+    return {"cutoff": cutoff, "rows": stats["rows"], "oldest": stats["first"]}
+
+
+# --- MySQL range partitioning -------------------------------------------------
+
+
+def _table() -> str:
+    return Recommendation._meta.db_table
+
+
+def _month_start(day: dt.date) -> dt.date:
+    return day.replace(day=1)
+
+
+def _next_month(day: dt.date) -> dt.date:
+    return (day.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+
+def _month_bound(month: dt.date) -> dt.datetime:
+    return dt.datetime.combine(month, dt.time(), tzinfo=dt.timezone.utc)
+
+
+def _partition_sql(month: dt.date) -> str:
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{_next_month(month):%Y-%m-%d}'))"
+
+
+def mysql_partitions() -> list[str]:
+    """Partition names of the Recommendation table, oldest first ([] if not partitioned)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [_table()],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def partition_mysql(months_ahead: int = PARTITION_MONTHS_AHEAD, cutoff: dt.datetime | None = None, log=None) -> list[str]:
+    """
+    Partition the Recommendation table by month of created_at (MySQL only), or
+    maintain existing partitions: add months up to `months_ahead` ahead and drop
+    months that end on or before `cutoff`. Returns the statements executed.
+
+    MySQL requires the partitioning column in every unique key, so the first run
+    changes the primary key to (id, created_at); id stays AUTO_INCREMENT and unique.
+    """
+    if connection.vendor != "mysql":
+        raise ValueError("Partitioning is only supported on MySQL")
+    table = connection.ops.quote_name(_table())
+    today = timezone.now().astimezone(dt.timezone.utc).date()
+    last_month = _month_start(today)
+    for _ in range(months_ahead):
+        last_month = _next_month(last_month)
+    statements = []
+    existing = mysql_partitions()
+    if not existing:
+        first = Recommendation.objects.aggregate(first=Min("created_at"))["first"]
+        month = _month_start(first.astimezone(dt.timezone.utc).date() if first else today)
+        parts = []
+        while month <= last_month:
+            parts.append(_partition_sql(month))
+            month = _next_month(month)
+        parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        statements.append(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+        statements.append(f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(parts)})")
+    else:
+        months = sorted(dt.datetime.strptime(p[1:], "%Y%m").date() for p in existing if p != "pmax")
+        month = _next_month(months[-1]) if months else _month_start(today)
+        parts = []
+        while month <= last_month:
+            parts.append(_partition_sql(month))
+            month = _next_month(month)
+        if parts:
+            parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+            statements.append(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(parts)})")
+        if cutoff is not None:
+            # Whole months before the cutoff that retention has emptied; keep at least one range partition
+            old = [
+                m for m in months[:-1]
+                if _next_month(m) <= cutoff.date()
+                and not Recommendation.objects.filter(created_at__lt=_month_bound(_next_month(m))).filter(
+                    created_at__gte=_month_bound(m)
+                ).exists()
+            ]
+            if old:
+                statements.append(f"ALTER TABLE {table} DROP PARTITION {', '.join(f'p{m:%Y%m}' for m in old)}")
+    with connection.cursor() as cursor:
+        for sql in statements:
+            if log:
+                log(sql)
+            cursor.execute(sql)
+    return statements
@@ -0,0 +1,240 @@
+"""
+Cross-sectional screener: technical model + fundamental score + fusion rules for
+every ticker in one vectorized pass.
+
+refresh_latest_features() precomputes each ticker's latest indicators, fundamentals
+and news sentiment into core.LatestFeatures. score_universe() loads that table into
+NumPy arrays, scores all rows with one predict_proba call and agent.fuse_many, and
+caches the result until the table or the model artifact changes. screen() then
+filters, sorts and paginates with array masks, so a request costs milliseconds.
+
+The screener uses the tabular model only (no LSTM sequences), like a plain
+/api/analyze call when no LSTM is trained, and only models trained on the base
+features (LatestFeatures stores those).
+"""
+import datetime as dt
+import threading
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Max
+
+from core.models import StockPrice, FundamentalMetric, NewsHeadline, LatestFeatures
+from analysis_app import pipeline
+from analysis_app.agent import LABELS, compute_fundamental_score_many, fuse_many, load_model, model_features
+from analysis_app.indicators import BASE_FEATURES as FEATURES, compute_indicators_long
+from analysis_app.model_store import artifact_mtime
+from analysis_app.sentiment import score_sentiment_many
+
+SIGNALS = {v: k for k, v in LABELS.items()}
+SORT_FIELDS = (
+    "ticker", "confidence", "prob_buy", "rsi", "volatility", "fundamental_score",
+    "sentiment", "ma_10", "ma_30", "close",
+)
+MAX_PAGE_SIZE = 500
+# Calendar days of prices loaded per refresh; enough for MA-30 plus RSI/volatility warm-up.
+REFRESH_LOOKBACK_DAYS = 120
+
+_COLUMNS = ("ticker", "as_of", "close", *FEATURES, "sentiment", "pe_ratio", "earnings_growth", "revenue_growth")
+_lock = threading.Lock()
+_cache: dict = {"key": None, "data": None}
+
+
+def refresh_latest_features(lookback_days: int = REFRESH_LOOKBACK_DAYS) -> int:
+    """
+    Recompute LatestFeatures for every ticker with enough recent prices, and
+    delete the rows of tickers that no longer qualify (delisted, too little
+    fresh data). Returns the number of tickers written.
+    """
+    last = StockPrice.objects.aggregate(last=Max("date"))["last"]
+    if last is None:
+        _replace_latest([])
+        return 0
+    since = last - dt.timedelta(days=lookback_days)
+    prices = pd.DataFrame(
+        StockPrice.objects.filter(date__gte=since).order_by("ticker", "date").values_list("ticker", "date", "close"),
+        columns=["ticker", "date", "close"],
+    )
+
+    # float64 so the stored features equal what /api/analyze computes for the ticker
+    ind = compute_indicators_long(prices, dtype=np.float64)
+    counts = ind.groupby("ticker", sort=False)["close"].transform("size")
+    newest = ind[counts >= pipeline.MIN_PRICE_ROWS].groupby("ticker", sort=False).tail(1).dropna(subset=FEATURES)
+    latest = {
+        row.ticker: {"as_of": row.date, "close": float(row.close), **{f: float(getattr(row, f)) for f in FEATURES}}
+        for row in newest.itertuples(index=False)
+    }
+    if not latest:
+        _replace_latest([])
+        return 0
+
+    fundamentals = {}
+    for f in FundamentalMetric.objects.filter(ticker__in=list(latest)).order_by("period_end"):
+        fundamentals[f.ticker] = f  # later period_end wins
+    headlines: dict[str, list[str]] = {}
+    for ticker, text in NewsHeadline.objects.filter(ticker__in=list(latest)).order_by("ticker", "-date").values_list(
+        "ticker", "headline"
+    ):
+        group = headlines.setdefault(ticker, [])
+        if len(group) < 10:
+            group.append(text)
+    sentiment = score_sentiment_many(headlines) if headlines else {}
+
+    rows = []
+    for ticker, feats in latest.items():
+        fund = fundamentals.get(ticker)
+        rows.append(LatestFeatures(
+            ticker=ticker,
+            sentiment=sentiment.get(ticker),
+            pe_ratio=fund.pe_ratio if fund else None,
+            earnings_growth=fund.earnings_growth if fund else None,
+            revenue_growth=fund.revenue_growth if fund else None,
+            **feats,
+        ))
+    _replace_latest(rows)
+    return len(rows)
+
+
+def _replace_latest(rows: list) -> None:
+    """Upsert `rows` and delete every other LatestFeatures row, in one transaction."""
+    update_fields = [c for c in _COLUMNS if c != "ticker"] + ["updated_at"]
+    keep = {r.ticker for r in rows}
+    with transaction.atomic():
+        stale = [t for t in LatestFeatures.objects.values_list("ticker", flat=True) if t not in keep]
+        # Chunked: a NOT IN over the whole universe can exceed SQLite's variable limit
+        for i in range(0, len(stale), 500):
+            LatestFeatures.objects.filter(ticker__in=stale[i:i + 500]).delete()
+        LatestFeatures.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True, unique_fields=["ticker"], update_fields=update_fields
+        )
+
+
+def score_universe(model_path: str | None = None) -> dict:
+    """
+    All LatestFeatures rows as arrays plus model/fusion outputs, cached until the
+    table or the model artifact changes.
+    """
+    model_path = model_path or pipeline.MODEL_PATH
+    version = LatestFeatures.objects.aggregate(n=Count("id"), last=Max("updated_at"))
+    key = (version["n"], version["last"], model_path, artifact_mtime(model_path))
+    with _lock:
+        if _cache["key"] == key:
+            return _cache["data"]
+
+    if model_features(model_path) != FEATURES:
+        raise ValueError(f"The screener needs a technical model trained on {FEATURES}")
+    rows = list(LatestFeatures.objects.values_list(*_COLUMNS))
+    data = {"ticker": np.array([r[0] for r in rows], dtype=object), "as_of": np.array([r[1] for r in rows], dtype=object)}
+    for i, name in enumerate(_COLUMNS[2:], start=2):
+        data[name] = np.array([np.nan if r[i] is None else r[i] for r in rows], dtype=np.float64)
+
+    n = len(rows)
+    if n:
+        probs = np.asarray(load_model(model_path).predict_proba(np.column_stack([data[f] for f in FEATURES])))
+        tech = probs.argmax(axis=1)
+        tech_conf = probs.max(axis=1)
+        prob_buy = probs[:, 2] if probs.shape[1] > 2 else np.where(tech == 2, tech_conf, 0.0)
+    else:
+        tech = np.zeros(0, dtype=int)
+        tech_conf = prob_buy = np.zeros(0)
+    data["fundamental_score"] = compute_fundamental_score_many(
+        data["pe_ratio"], data["earnings_growth"], data["revenue_growth"]
+    )
+    data["signal"], data["confidence"] = fuse_many(tech, tech_conf, prob_buy, data["fundamental_score"], data["sentiment"])
+    data["technical_signal"] = tech
+    data["prob_buy"] = prob_buy
+
+    with _lock:
+        _cache["key"], _cache["data"] = key, data
+    return data
+
+
+def _between(values: np.ndarray, lo, hi) -> np.ndarray:
+    mask = np.ones(values.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if lo is not None:
+            mask &= values >= lo
+        if hi is not None:
+            mask &= values <= hi
+    return mask
+
+
+def _num(value: float):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def screen(
+    signals: list[str] | None = None,
+    rsi_min: float | None = None,
+    rsi_max: float | None = None,
+    volatility_min: float | None = None,
+    volatility_max: float | None = None,
+    fundamental_min: float | None = None,
+    fundamental_max: float | None = None,
+    min_confidence: float | None = None,
+    sort: str = "-confidence",
+    page: int = 1,
+    page_size: int = 50,
+    model_path: str | None = None,
+) -> dict:
+    """Filter, sort and paginate the scored universe; raises ValueError for bad arguments."""
+    field = sort.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)} (prefix '-' for descending)")
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    wanted = []
+    for s in signals or []:
+        if s.upper() not in SIGNALS:
+            raise ValueError("signal must be BUY, HOLD or SELL")
+        wanted.append(SIGNALS[s.upper()])
+
+    data = score_universe(model_path)
+    mask = np.ones(len(data["ticker"]), dtype=bool)
+    if wanted:
+        mask &= np.isin(data["signal"], wanted)
+    mask &= _between(data["rsi"], rsi_min, rsi_max)
+    mask &= _between(data["volatility"], volatility_min, volatility_max)
+    if fundamental_min is not None or fundamental_max is not None:
+        # Tickers without fundamentals never satisfy a fundamental-score filter
+        mask &= _between(data["fundamental_score"], fundamental_min, fundamental_max)
+    if min_confidence is not None:
+        mask &= data["confidence"] >= min_confidence
+    idx = np.flatnonzero(mask)
+
+    keys = data[field][idx]
+    if field == "ticker":
+        order = np.argsort(keys.astype(str), kind="stable")
+    else:
+        # NaNs last in both directions; ties broken by ticker
+        filled = np.where(np.isnan(keys), np.inf, -keys if sort.startswith("-") else keys)
+        order = np.lexsort((data["ticker"][idx].astype(str), filled))
+    if sort.startswith("-") and field == "ticker":
+        order = order[::-1]
+    idx = idx[order]
+
+    start = (page - 1) * page_size
+    page_idx = idx[start:start + page_size]
+    results = [
+        {
+            "ticker": data["ticker"][i],
+            "as_of": data["as_of"][i],
+            "signal": LABELS[int(data["signal"][i])],
+            "confidence": float(data["confidence"][i]),
+            "technical_signal": LABELS[int(data["technical_signal"][i])],
+            "prob_buy": float(data["prob_buy"][i]),
+            "fundamental_score": _num(data["fundamental_score"][i]),
+            "sentiment": _num(data["sentiment"][i]),
+            "close": float(data["close"][i]),
+            **{f: float(data[f][i]) for f in FEATURES},
+        }
+        for i in page_idx
+    ]
+    return {
+        "count": int(len(idx)),
+        "universe": int(len(data["ticker"])),
+        "page": page,
+        "page_size": page_size,
+        "results": results,
+    }
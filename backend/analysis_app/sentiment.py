@@ -4,7 +4,9 @@ Uses: optional FinBERT → TF-IDF+LR if trained → keyword fallback.
 """
 from analysis_app.sentiment_model import (
     score_sentiment_finbert,
+    score_sentiment_finbert_many,
     score_sentiment_tfidf_lr,
+    score_sentiment_tfidf_lr_many,
 )
 
 
@@ -17,3 +19,22 @@ def score_sentiment(headlines: list[str]) -> float:
         return finbert_score
     # TF-IDF + LR if model exists, else keyword fallback
     return score_sentiment_tfidf_lr(headlines)
+
+
+def score_sentiment_many(groups: dict[str, list[str]]) -> dict[str, float]:
+    """
+    Score many tickers' headlines at once: {ticker: [headlines]} → {ticker: score}.
+    Same FinBERT → TF-IDF+LR → keyword order as score_sentiment, but each stage
+    scores all headlines in one batched call and reduces per ticker.
+    """
+    out = {t: 0.0 for t, hs in groups.items() if not hs}
+    pending = {t: hs for t, hs in groups.items() if hs}
+    if not pending:
+        return out
+    finbert_scores = score_sentiment_finbert_many(pending)
+    if finbert_scores:
+        out.update(finbert_scores)
+        pending = {t: hs for t, hs in pending.items() if t not in finbert_scores}
+    if pending:
+        out.update(score_sentiment_tfidf_lr_many(pending))
+    return {t: out[t] for t in groups}
@@ -1,11 +1,14 @@
 """
 Sentiment model: TF-IDF + Logistic Regression (paper §4, §8.3).
 Optional FinBERT when transformers/torch available.
+Large corpora: hashing vectorizer + SGD trained out-of-core via partial_fit.
 """
 import os
 import re
-import joblib
-from typing import List
+import time
+from typing import Dict, Iterable, List
+
+from analysis_app.model_store import dump_joblib, load_joblib
 
 # Default: keyword-based weak labels for training TF-IDF+LR when no labeled data
 POS = {"gain", "gains", "up", "rise", "surge", "strong", "record", "profit", "growth", "bullish", "upgrade"}
@@ -20,6 +23,10 @@ def _tokenize(text: str) -> List[str]:
     return [t for t in text.split() if len(t) > 1]
 
 
+# Same tokens as _tokenize (runs of word chars, length > 1) in a single findall.
+_WORD_RE = re.compile(r"\w{2,}")
+
+
 def _keyword_score(headline: str) -> float:
     tokens = _tokenize(headline)
     p = sum(1 for t in tokens if t in POS)
@@ -30,6 +37,29 @@ def _keyword_score(headline: str) -> float:
     return (p - n) / total
 
 
+def _weak_label(headline: str) -> int:
+    """Keyword weak label: 2=positive, 0=negative, 1=neutral."""
+    s = _keyword_score(headline)
+    if s > 0.15:
+        return 2
+    if s < -0.15:
+        return 0
+    return 1
+
+
+def _weak_labels(texts: List[str]) -> List[int]:
+    return [_weak_label(t) for t in texts]
+
+
+def _load_sentiment_model():
+    """Shared (memory-mapped, cached) model + vectorizer; raises if not trained."""
+    model = load_joblib(SENTIMENT_MODEL_PATH)
+    vectorizer = load_joblib(SENTIMENT_VECTORIZER_PATH)
+    if model is None or vectorizer is None:
+        raise FileNotFoundError(SENTIMENT_MODEL_PATH)
+    return model, vectorizer
+
+
 def score_sentiment_tfidf_lr(headlines: List[str]) -> float:
     """
     Score sentiment using trained TF-IDF + Logistic Regression if available.
@@ -40,8 +70,7 @@ def score_sentiment_tfidf_lr(headlines: List[str]) -> float:
     try:
         import numpy as np
         from sklearn.feature_extraction.text import TfidfVectorizer
-        model = joblib.load(SENTIMENT_MODEL_PATH)
-        vectorizer = joblib.load(SENTIMENT_VECTORIZER_PATH)
+        model, vectorizer = _load_sentiment_model()
         X = vectorizer.transform(headlines)
         # Model predicts 0=neg, 1=neutral, 2=pos; we map to score
         preds = model.predict(X)
@@ -61,6 +90,77 @@ def _score_keyword_fallback(headlines: List[str]) -> float:
     return float(sum(scores) / len(scores)) if scores else 0.0
 
 
+def _flatten_groups(groups: Dict[str, List[str]]):
+    """Flatten {ticker: headlines} into (keys, texts, segment ids) for one batched pass."""
+    import numpy as np
+    keys = list(groups)
+    texts: List[str] = []
+    seg: List[int] = []
+    for i, k in enumerate(keys):
+        hs = groups[k] or []
+        texts.extend(hs)
+        seg.extend([i] * len(hs))
+    return keys, texts, np.asarray(seg, dtype=np.int64)
+
+
+def _segment_means(scores, seg, n_groups: int):
+    """Per-group mean of `scores` where seg[i] is the group of row i (empty groups → 0.0)."""
+    import numpy as np
+    sums = np.bincount(seg, weights=scores, minlength=n_groups)
+    counts = np.bincount(seg, minlength=n_groups)
+    return np.divide(sums, counts, out=np.zeros(n_groups), where=counts > 0)
+
+
+def _keyword_scores(headlines: List[str]):
+    """Vector of _keyword_score for each headline, tokenizing with a single regex pass."""
+    import numpy as np
+    out = np.zeros(len(headlines))
+    for i, h in enumerate(headlines):
+        p = n = 0
+        for t in _WORD_RE.findall((h or "").lower()):
+            if t in POS:
+                p += 1
+            elif t in NEG:
+                n += 1
+        if p + n:
+            out[i] = (p - n) / (p + n)
+    return out
+
+
+def score_sentiment_keyword_many(groups: Dict[str, List[str]]) -> Dict[str, float]:
+    """Keyword fallback for many tickers at once: one pass over all headlines, segment means per ticker."""
+    keys, texts, seg = _flatten_groups(groups)
+    if not texts:
+        return {k: 0.0 for k in keys}
+    means = _segment_means(_keyword_scores(texts), seg, len(keys))
+    return {k: float(m) for k, m in zip(keys, means)}
+
+
+def score_sentiment_tfidf_lr_many(groups: Dict[str, List[str]]) -> Dict[str, float]:
+    """
+    Batched score_sentiment_tfidf_lr: all headlines go through one vectorizer.transform
+    and one predict_proba call, then are reduced per ticker with segment means.
+    Falls back to the keyword scorer if the model is missing.
+    """
+    keys, texts, seg = _flatten_groups(groups)
+    if not texts:
+        return {k: 0.0 for k in keys}
+    try:
+        import numpy as np
+        model, vectorizer = _load_sentiment_model()
+        X = vectorizer.transform(texts)
+        probs = model.predict_proba(X) if hasattr(model, "predict_proba") else None
+        if probs is not None and probs.shape[1] >= 3:
+            scores = probs[:, 2] - probs[:, 0]
+        else:
+            preds = model.predict(X)
+            scores = np.where(preds == 2, 0.5, np.where(preds == 0, -0.5, 0.0))
+        means = np.clip(_segment_means(scores, seg, len(keys)), -1.0, 1.0)
+        return {k: float(m) for k, m in zip(keys, means)}
+    except Exception:
+        return score_sentiment_keyword_many(groups)
+
+
 def score_sentiment_finbert(headlines: List[str]) -> float | None:
     """
     Optional: use FinBERT-style model if transformers/torch installed.
@@ -92,6 +192,42 @@ def score_sentiment_finbert(headlines: List[str]) -> float | None:
         return None
 
 
+def score_sentiment_finbert_many(groups: Dict[str, List[str]]) -> Dict[str, float] | None:
+    """
+    Batched score_sentiment_finbert: up to 20 headlines per ticker, one forward pass.
+    Returns {ticker: score} for tickers with at least one non-empty headline,
+    or None if transformers/torch are not available.
+    """
+    try:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        import numpy as np
+        import torch
+        texts: List[str] = []
+        seg: List[int] = []
+        keys = list(groups)
+        for i, k in enumerate(keys):
+            for text in (groups[k] or [])[:20]:
+                if (text or "").strip():
+                    texts.append(text[:512])
+                    seg.append(i)
+        if not texts:
+            return None
+        model_name = "ProsusAI/finbert"
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            probs = torch.softmax(model(**inputs).logits, dim=1).numpy()
+        # finbert: 0=positive, 1=negative, 2=neutral
+        seg_arr = np.asarray(seg, dtype=np.int64)
+        means = _segment_means(probs[:, 0] - probs[:, 1], seg_arr, len(keys))
+        present = np.bincount(seg_arr, minlength=len(keys)) > 0
+        return {k: float(m) for k, m, ok in zip(keys, means, present) if ok}
+    except Exception:
+        return None
+
+
 def train_sentiment_model(texts: List[str], labels: List[int] | None = None):
     """
     Train TF-IDF + Logistic Regression. If labels is None, use keyword-based weak labels:
@@ -102,19 +238,79 @@ def train_sentiment_model(texts: List[str], labels: List[int] | None = None):
     if not texts:
         return
     if labels is None:
-        labels = []
-        for t in texts:
-            s = _keyword_score(t)
-            if s > 0.15:
-                labels.append(2)
-            elif s < -0.15:
-                labels.append(0)
-            else:
-                labels.append(1)
+        labels = _weak_labels(texts)
     vectorizer = TfidfVectorizer(max_features=2000, ngram_range=(1, 2), min_df=1)
     X = vectorizer.fit_transform(texts)
     y = labels
     model = LogisticRegression(max_iter=500)
     model.fit(X, y)
-    joblib.dump(model, SENTIMENT_MODEL_PATH)
-    joblib.dump(vectorizer, SENTIMENT_VECTORIZER_PATH)
+    dump_joblib(model, SENTIMENT_MODEL_PATH)
+    dump_joblib(vectorizer, SENTIMENT_VECTORIZER_PATH)
+
+
+def train_sentiment_model_streaming(
+    chunks: Iterable[List[str]],
+    n_features: int = 2 ** 18,
+    workers: int = 1,
+    epochs: int = 1,
+) -> dict:
+    """
+    Out-of-core training for large headline tables.
+
+    `chunks` yields lists of headlines (e.g. a DB iterator batched by the caller).
+    Uses a stateless HashingVectorizer (no vocabulary to fit or hold in memory)
+    and SGDClassifier(loss="log_loss") updated with partial_fit per chunk.
+    Weak labels are generated in a process pool when workers > 1.
+    The saved model/vectorizer pair is drop-in for score_sentiment_tfidf_lr.
+    If epochs > 1, `chunks` must be re-iterable (a list or similar).
+    Returns {"headlines", "seconds", "headlines_per_sec"}.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+
+    vectorizer = HashingVectorizer(
+        n_features=n_features,
+        ngram_range=(1, 2),
+        alternate_sign=False,
+        norm="l2",
+    )
+    model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    classes = np.array([0, 1, 2])
+
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        for _ in range(max(1, epochs)):
+            for texts in chunks:
+                texts = [t or "" for t in texts]
+                if not texts:
+                    continue
+                if pool is not None:
+                    step = max(1, len(texts) // workers)
+                    parts = [texts[i : i + step] for i in range(0, len(texts), step)]
+                    labels = [y for part in pool.map(_weak_labels, parts) for y in part]
+                else:
+                    labels = _weak_labels(texts)
+                X = vectorizer.transform(texts)
+                model.partial_fit(X, labels, classes=classes)
+                total += len(texts)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    if total == 0:
+        return {"headlines": 0, "seconds": elapsed, "headlines_per_sec": 0.0}
+    dump_joblib(model, SENTIMENT_MODEL_PATH)
+    dump_joblib(vectorizer, SENTIMENT_VECTORIZER_PATH)
+    return {
+        "headlines": total,
+        "seconds": elapsed,
+        "headlines_per_sec": total / elapsed if elapsed > 0 else float("inf"),
+    }
@@ -0,0 +1,198 @@
+"""
+Single-flight coalescing for analyze requests.
+
+Concurrent requests for the same ticker and the same data version share one pipeline
+run: the first caller (leader) runs it, the others wait and get the leader's payload,
+so a burst on a popular ticker costs one fetch, one model pass and one Recommendation.
+
+- In-process (CLEARTRADE_SINGLEFLIGHT, default on): threads wait on an Event, for at
+  most CLEARTRADE_SINGLEFLIGHT_WAIT seconds before running the work themselves. Async
+  callers all await one detached Task of their event loop through asyncio.shield, so
+  a cancelled caller (client disconnect, timeout), leader included, never cancels the
+  shared run for the others.
+- Cross-process (set CLEARTRADE_SINGLEFLIGHT_DIR to a shared directory; Unix only):
+  workers serialise on an flock per key and followers reuse the leader's result file
+  if it was written within CLEARTRADE_SINGLEFLIGHT_TTL seconds.
+
+The data version is the latest price date/row count (or, for intraday intervals, the
+interval and the bar store's newest partition version) plus the newest fundamentals and
+news ids, so once new data lands (e.g. the leader's live fetch) later requests run
+the pipeline again instead of reusing an outdated result.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import Count, Max
+
+from core.models import StockPrice, FundamentalMetric, NewsHeadline
+from analysis_app.async_db import db_to_async
+from analysis_app.bar_store import BarStore
+from analysis_app.metrics import inc
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process coalescing unavailable
+    fcntl = None
+
+ENABLED = os.getenv("CLEARTRADE_SINGLEFLIGHT", "true").lower() == "true"
+SHARED_DIR = os.getenv("CLEARTRADE_SINGLEFLIGHT_DIR", "")
+SHARED_TTL = float(os.getenv("CLEARTRADE_SINGLEFLIGHT_TTL", "2.0"))
+WAIT_SECONDS = float(os.getenv("CLEARTRADE_SINGLEFLIGHT_WAIT", "30"))
+
+
+def data_version(ticker: str, interval: str = "1d") -> str:
+    if interval == "1d":
+        prices = StockPrice.objects.filter(ticker=ticker).aggregate(last=Max("date"), n=Count("id"))
+        price_version = f"{prices['last']}:{prices['n']}"
+    else:
+        price_version = f"{interval}:{BarStore().version(ticker)}"
+    fund = FundamentalMetric.objects.filter(ticker=ticker).aggregate(last=Max("id"))["last"]
+    news = NewsHeadline.objects.filter(ticker=ticker).aggregate(last=Max("id"))["last"]
+    return f"{price_version}:{fund}:{news}"
+
+
+def _count(role: str) -> None:
+    inc("cleartrade_singleflight_total", {"role": role}, help_text="Analyze calls by single-flight role.")
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe in-process coalescing: one fn() per key at a time, result shared."""
+
+    def __init__(self, wait_seconds: float = WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            _count("follower")
+            if not call.event.wait(self.wait_seconds):
+                # Leader is stuck (hung upstream call): don't queue behind it forever
+                _count("wait_timeout")
+                return fn(*args)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        _count("leader")
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """Coalescing for coroutines; flights are tracked per event loop."""
+
+    def __init__(self):
+        self._loops: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    async def do(self, key, coro_fn, *args):
+        flights = self._loops.setdefault(asyncio.get_running_loop(), {})
+        task = flights.get(key)
+        if task is not None:
+            _count("follower")
+        else:
+            _count("leader")
+            # Detached from the leader's request task: cancelling any caller leaves the flight running
+            task = flights[key] = asyncio.ensure_future(coro_fn(*args))
+
+            def done(task, flights=flights, key=key):
+                if flights.get(key) is task:
+                    del flights[key]
+                if not task.cancelled():
+                    # Consume the exception if every caller has gone
+                    task.exception()
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+
+def _shared_path(key: tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+    return os.path.join(SHARED_DIR, digest)
+
+
+def _read_fresh(path: str):
+    try:
+        if time.time() - os.path.getmtime(path) > SHARED_TTL:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return tuple(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def cross_process(key: tuple, fn, *args):
+    """Serialise fn per key across processes with an flock; reuse a fresh result file."""
+    if not SHARED_DIR or fcntl is None:
+        return fn(*args)
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    path = _shared_path(key)
+    with open(path + ".lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            shared = _read_fresh(path + ".json")
+            if shared is not None:
+                _count("shared")
+                return shared
+            result = fn(*args)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f, default=float)
+            os.replace(tmp, path + ".json")
+            return result
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_flight = SingleFlight()
+_async_flight = AsyncSingleFlight()
+
+
+def coalesced(ticker: str, fn, *args, interval: str = "1d"):
+    """Run fn(*args) (a pipeline call returning (payload, status)) once per ticker + interval + data version."""
+    if not ENABLED:
+        return fn(*args)
+    key = ("analyze", ticker, data_version(ticker, interval))
+    payload, status = _flight.do(key, cross_process, key, fn, *args)
+    # Callers may decorate their payload (e.g. profiling info); don't share mutations
+    return dict(payload), status
+
+
+async def coalesced_async(ticker: str, coro_fn, *args, interval: str = "1d"):
+    if not ENABLED:
+        return await coro_fn(*args)
+    key = ("analyze", ticker, await db_to_async(data_version)(ticker, interval))
+    if SHARED_DIR and fcntl is not None:
+        # Hold the cross-process lock in a worker thread; the pipeline itself stays async
+        run = lambda: cross_process(key, async_to_sync(coro_fn), *args)  # noqa: E731
+        payload, status = await _async_flight.do(key, sync_to_async(run, thread_sensitive=False))
+    else:
+        payload, status = await _async_flight.do(key, coro_fn, *args)
+    return dict(payload), status
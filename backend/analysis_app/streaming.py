@@ -0,0 +1,449 @@
+"""
+Streaming signal engine: consume bars as they arrive, keep each ticker's
+indicators up to date incrementally, and publish a ticker's signal only when it
+changes.
+
+Sources are plain iterables of Bar (or None, meaning "nothing arrived, flush
+now"): replay_source/synthetic_source replay a price frame in-process,
+file_source reads (and optionally tails) a CSV/NDJSON file, and socket_source
+accepts line-delimited bars from any number of TCP or Unix-socket producers.
+
+StreamingEngine.process() updates one ticker's IncrementalFeatures per bar and
+marks the ticker dirty only if the model's inputs changed. flush() then scores
+all dirty tickers with one predict_proba call and agent.fuse_many, and
+publishes an event for each ticker whose fused signal changed or whose
+confidence moved by at least `min_change`. run() flushes every `batch_size`
+bars or after `max_delay` seconds, so a ticker that gets several bars within
+one batch is scored once, on its newest bar. Fundamentals and news sentiment
+are loaded in bulk per flush for new tickers and reloaded after `context_ttl`
+seconds.
+
+Subscribers are called synchronously from the engine loop with a list of
+events, so they should be quick (write a line, hand off to a queue).
+"""
+import json
+import math
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from core.models import FundamentalMetric, NewsHeadline
+from analysis_app.agent import LABELS, compute_fundamental_score_many, fuse, fuse_many, load_model, model_features
+from analysis_app.indicators import BASE_FEATURES, IncrementalFeatures
+from analysis_app.metrics import inc
+from analysis_app.sentiment import score_sentiment_many
+
+BATCH_SIZE = 512
+MAX_DELAY = 0.05  # seconds a bar may wait before its ticker is scored
+MIN_CONFIDENCE_CHANGE = 0.01
+CONTEXT_TTL = 300.0
+POLL_SECONDS = 0.2
+
+_CSV_FIELDS = ("ticker", "ts", "open", "high", "low", "close", "volume")
+
+
+class Bar(NamedTuple):
+    ticker: str
+    ts: object  # epoch seconds or an ISO timestamp string, passed through to events
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def parse_bar(line: str) -> Bar | None:
+    """
+    One bar from a JSON object ({"ticker", "ts", "open", "high", "low", "close",
+    "volume"}; only ticker and close are required) or a CSV line
+    "ticker,ts,open,high,low,close,volume" (or "ticker,ts,close").
+    Blank lines, comments and a CSV header give None; malformed lines raise ValueError.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Bad JSON bar: {exc}")
+        if not isinstance(row, dict) or "ticker" not in row or "close" not in row:
+            raise ValueError("JSON bars need at least ticker and close")
+        ts = row.get("ts", row.get("datetime", row.get("date")))
+        close = float(row["close"])
+        return Bar(
+            str(row["ticker"]).upper().strip(), ts,
+            float(row.get("open", close)), float(row.get("high", close)), float(row.get("low", close)), close,
+            float(row.get("volume", math.nan)),
+        )
+    parts = [p.strip() for p in line.split(",")]
+    if parts[0].lower() == "ticker":
+        return None
+    if len(parts) == 3:
+        close = float(parts[2])
+        return Bar(parts[0].upper(), _ts(parts[1]), close, close, close, close, math.nan)
+    if len(parts) != len(_CSV_FIELDS):
+        raise ValueError(f"CSV bars need {','.join(_CSV_FIELDS)} or ticker,ts,close")
+    return Bar(parts[0].upper(), _ts(parts[1]), *(float(p) for p in parts[2:]))
+
+
+def _ts(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _parse_or_skip(line: str) -> Bar | None:
+    try:
+        return parse_bar(line)
+    except ValueError:
+        inc("cleartrade_stream_bad_lines_total", help_text="Streamed lines skipped because they were not valid bars.")
+        return None
+
+
+def replay_source(frame) -> Iterator[Bar]:
+    """
+    Bars from a long price frame (ticker, date, open, high, low, close, volume)
+    in time order, tickers interleaved as they would arrive live.
+    """
+    frame = frame.sort_values(["date", "ticker"], kind="stable")
+    ts = frame["date"].to_numpy(dtype="datetime64[s]").astype(np.int64).tolist()
+    columns = [frame[c].tolist() for c in ("ticker", "open", "high", "low", "close", "volume")]
+    for ticker, t, o, h, l, c, v in zip(columns[0], ts, *columns[1:]):
+        yield Bar(ticker, t, o, h, l, c, v)
+
+
+def synthetic_source(n_tickers: int, n_bars: int, seed: int = 42) -> list[Bar]:
+    """n_bars seeded GBM bars per ticker (benchmarks.synthetic_prices), materialised for replay."""
+    from analysis_app.benchmarks import TRADING_DAYS, synthetic_prices
+
+    prices = synthetic_prices(n_tickers, -(-n_bars // TRADING_DAYS), seed)
+    prices = prices[prices.groupby("ticker", sort=False).cumcount() < n_bars]
+    return list(replay_source(prices))
+
+
+def file_source(path: str, follow: bool = False, poll: float = POLL_SECONDS) -> Iterator[Bar | None]:
+    """
+    Bars from a CSV/NDJSON file ("-" = stdin). With follow=True, keep reading
+    lines appended later (like tail -f), yielding None while idle; a file that
+    shrinks (truncated or rotated in place) is read again from the start.
+    Malformed lines are skipped.
+    """
+    if path == "-":
+        for line in sys.stdin:
+            bar = _parse_or_skip(line)
+            if bar is not None:
+                yield bar
+        return
+    with open(path, encoding="utf-8") as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if line.endswith("\n") or (line and not follow):
+                bar = _parse_or_skip(partial + line)
+                partial = ""
+                if bar is not None:
+                    yield bar
+                continue
+            # Keep an incomplete last line until the writer finishes it
+            partial += line
+            if not follow:
+                return
+            if os.path.getsize(path) < f.tell():
+                f.seek(0)
+                partial = ""
+            yield None
+            time.sleep(poll)
+
+
+def socket_source(address: str, poll: float = POLL_SECONDS, stop: threading.Event | None = None) -> Iterator[Bar | None]:
+    """
+    Listen on "host:port" (TCP) or a filesystem path (Unix socket) and yield
+    bars from every connected producer, one bar per line. Yields None when no
+    data arrived within `poll` seconds. Malformed lines are skipped.
+    """
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        server = socket.create_server((host or "127.0.0.1", int(port)), reuse_port=False)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(address)
+        server.listen()
+    server.setblocking(False)
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ)
+    buffers: dict = {}
+    try:
+        while stop is None or not stop.is_set():
+            events = sel.select(poll)
+            if not events:
+                yield None
+                continue
+            for key, _ in events:
+                if key.fileobj is server:
+                    conn, _ = server.accept()
+                    conn.setblocking(False)
+                    sel.register(conn, selectors.EVENT_READ)
+                    buffers[conn] = b""
+                    continue
+                conn = key.fileobj
+                try:
+                    data = conn.recv(65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    # Producer dropped (connection reset): forget it and its partial line, keep serving the rest
+                    sel.unregister(conn)
+                    conn.close()
+                    buffers.pop(conn, None)
+                    inc("cleartrade_stream_dropped_connections_total", help_text="Bar producers dropped after a socket error.")
+                    continue
+                if not data:
+                    # Producer closed: its last line may lack a newline
+                    sel.unregister(conn)
+                    conn.close()
+                    data = buffers.pop(conn)
+                else:
+                    data, _, buffers[conn] = (buffers[conn] + data).rpartition(b"\n")
+                for line in data.decode("utf-8", "replace").splitlines():
+                    bar = _parse_or_skip(line)
+                    if bar is not None:
+                        yield bar
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+        if server.family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+
+
+class SignalHub:
+    """Fan-out of signal-change events to in-process subscribers."""
+
+    def __init__(self):
+        self._subscribers: list = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """callback(events: list[dict]) for every published batch; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers = [*self._subscribers, callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not callback]
+
+        return unsubscribe
+
+    def publish(self, events: list[dict]) -> None:
+        if events:
+            for callback in self._subscribers:
+                callback(events)
+
+
+def ndjson_writer(stream):
+    """Subscriber writing one JSON line per event to a text stream."""
+
+    def write(events):
+        stream.write("".join(json.dumps(e, default=str) + "\n" for e in events))
+        stream.flush()
+
+    return write
+
+
+def recommendation_writer(interval: str):
+    """
+    Subscriber storing each signal change as a Recommendation (via pipeline.store,
+    so CLEARTRADE_WRITE_BEHIND applies), with the same explanation /api/analyze writes.
+    """
+    from analysis_app import pipeline
+
+    def write(events):
+        for e in events:
+            pe, eg, rg = e["fundamentals"]
+            _, _, explanation = fuse(
+                e["technical_signal"], e["technical_confidence"], pe, eg, rg, e["sentiment"], probs=e["probs"]
+            )
+            scored = {
+                "signal": e["signal"],
+                "confidence": e["confidence"],
+                "explanation": explanation,
+                "features": e["features"],
+                "sentiment": e["sentiment"],
+                "fundamentals": e["fundamentals"],
+            }
+            pipeline.store(e["ticker"], scored, interval)
+
+    return write
+
+
+class _TickerState:
+    __slots__ = ("features", "values", "inputs", "bar", "signal", "confidence", "context_at", "fundamentals", "sentiment")
+
+    def __init__(self, features):
+        self.features = IncrementalFeatures(features)
+        self.values = None
+        self.inputs = None
+        self.bar = None
+        self.signal = None
+        self.confidence = None
+        self.context_at = None
+        self.fundamentals = (None, None, None)
+        self.sentiment = None
+
+
+class StreamingEngine:
+    def __init__(
+        self,
+        model_path: str,
+        hub: SignalHub | None = None,
+        interval: str = "1m",
+        min_change: float = MIN_CONFIDENCE_CHANGE,
+        context: bool = True,
+        context_ttl: float = CONTEXT_TTL,
+    ):
+        self.model_path = model_path
+        self.hub = hub or SignalHub()
+        self.interval = interval
+        self.min_change = min_change
+        self.context = context
+        self.context_ttl = context_ttl
+        self.inputs = model_features(model_path)
+        # Base features are always kept too: they are stored on Recommendation rows
+        self.features = list(dict.fromkeys([*BASE_FEATURES, *self.inputs]))
+        self.tickers: dict[str, _TickerState] = {}
+        self.dirty: set[str] = set()
+        self.stats = {"bars": 0, "scored": 0, "flushes": 0, "events": 0}
+
+    def process(self, bar: Bar) -> None:
+        state = self.tickers.get(bar.ticker)
+        if state is None:
+            state = self.tickers[bar.ticker] = _TickerState(self.features)
+        values = state.features.update(bar.close, bar.high, bar.low, bar.volume)
+        state.bar = bar
+        self.stats["bars"] += 1
+        inputs = tuple(values[f] for f in self.inputs)
+        # Nothing the model sees has changed, or still warming up (NaN)
+        if inputs == state.inputs or any(math.isnan(v) for v in values.values()):
+            return
+        state.values, state.inputs = values, inputs
+        self.dirty.add(bar.ticker)
+
+    def _refresh_context(self, tickers: list[str]) -> None:
+        now = time.monotonic()
+        stale = [
+            t for t in tickers
+            if self.tickers[t].context_at is None or now - self.tickers[t].context_at >= self.context_ttl
+        ]
+        if not stale:
+            return
+        fundamentals = {}
+        for ticker, pe, eg, rg in FundamentalMetric.objects.filter(ticker__in=stale).order_by("period_end").values_list(
+            "ticker", "pe_ratio", "earnings_growth", "revenue_growth"
+        ):
+            fundamentals[ticker] = (pe, eg, rg)  # later period_end wins
+        headlines: dict[str, list[str]] = {}
+        for ticker, text in NewsHeadline.objects.filter(ticker__in=stale).order_by("ticker", "-date").values_list(
+            "ticker", "headline"
+        ):
+            group = headlines.setdefault(ticker, [])
+            if len(group) < 10:
+                group.append(text)
+        sentiment = score_sentiment_many(headlines) if headlines else {}
+        for ticker in stale:
+            state = self.tickers[ticker]
+            state.context_at = now
+            state.fundamentals = fundamentals.get(ticker, (None, None, None))
+            state.sentiment = sentiment.get(ticker)
+
+    def flush(self) -> list[dict]:
+        """Score every dirty ticker in one pass and publish the signal changes."""
+        if not self.dirty:
+            return []
+        tickers = sorted(self.dirty)
+        self.dirty.clear()
+        self.stats["flushes"] += 1
+        self.stats["scored"] += len(tickers)
+        states = [self.tickers[t] for t in tickers]
+        if self.context:
+            self._refresh_context(tickers)
+
+        probs = np.asarray(load_model(self.model_path).predict_proba(np.array([s.inputs for s in states], dtype=np.float64)))
+        tech = probs.argmax(axis=1)
+        tech_conf = probs.max(axis=1)
+        prob_buy = probs[:, 2] if probs.shape[1] > 2 else np.where(tech == 2, tech_conf, 0.0)
+        fund = np.array([[np.nan if v is None else v for v in s.fundamentals] for s in states], dtype=np.float64)
+        fundamental_score = compute_fundamental_score_many(fund[:, 0], fund[:, 1], fund[:, 2])
+        sentiment = np.array([np.nan if s.sentiment is None else s.sentiment for s in states], dtype=np.float64)
+        final, confidence = fuse_many(tech, tech_conf, prob_buy, fundamental_score, sentiment)
+
+        events = []
+        for i, (ticker, state) in enumerate(zip(tickers, states)):
+            signal, conf = LABELS[int(final[i])], float(confidence[i])
+            if state.signal == signal and abs(conf - state.confidence) < self.min_change:
+                continue
+            bar = state.bar
+            events.append({
+                "ticker": ticker,
+                "interval": self.interval,
+                "ts": bar.ts,
+                "close": bar.close,
+                "signal": signal,
+                "confidence": conf,
+                "previous_signal": state.signal,
+                "previous_confidence": state.confidence,
+                "technical_signal": LABELS[int(tech[i])],
+                "technical_confidence": float(tech_conf[i]),
+                "probs": probs[i].tolist(),
+                "features": state.values,
+                "fundamentals": state.fundamentals,
+                "fundamental_score": None if np.isnan(fundamental_score[i]) else float(fundamental_score[i]),
+                "sentiment": state.sentiment,
+            })
+            state.signal, state.confidence = signal, conf
+        self.stats["events"] += len(events)
+        self.hub.publish(events)
+        return events
+
+    def run(
+        self,
+        source: Iterable[Bar | None],
+        batch_size: int = BATCH_SIZE,
+        max_delay: float = MAX_DELAY,
+        limit: int | None = None,
+    ) -> dict:
+        """
+        Process bars from `source` until it ends (or `limit` bars), flushing every
+        `batch_size` bars, after `max_delay` seconds, and whenever the source is idle.
+        Returns stats (bars, scored, flushes, events, seconds, bars_per_second).
+        """
+        start = time.perf_counter()
+        pending = 0
+        deadline = None
+        process = self.process
+        for bar in source:
+            if bar is not None:
+                process(bar)
+                pending += 1
+                if deadline is None:
+                    deadline = time.monotonic() + max_delay
+            if pending and (bar is None or pending >= batch_size or time.monotonic() >= deadline):
+                self.flush()
+                pending, deadline = 0, None
+            if limit is not None and self.stats["bars"] >= limit:
+                break
+        self.flush()
+        seconds = time.perf_counter() - start
+        return {**self.stats, "seconds": seconds, "bars_per_second": self.stats["bars"] / max(seconds, 1e-9)}
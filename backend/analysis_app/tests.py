@@ -1,3 +1,724 @@
-from django.test import TestCase
+import asyncio
+import datetime as dt
+import gzip
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from yfinance.exceptions import YFTzMissingError
+
+from core.models import LatestFeatures, Recommendation, RecommendationDaily, StockPrice
+from analysis_app import live_data, retention
+from analysis_app.bar_store import BarStore
+from analysis_app.history import history_page
+from analysis_app.indicators import PANEL_COLUMNS, compute_indicators, compute_indicators_long, compute_indicators_panel
+from analysis_app.push import RecommendationFeed, Subscription
+from analysis_app.resilience import CircuitBreaker, CircuitOpenError, NegativeCache
+from analysis_app.screener import refresh_latest_features
+from analysis_app.singleflight import AsyncSingleFlight, SingleFlight
+from analysis_app.streaming import socket_source
+from analysis_app.write_behind import RecommendationBuffer
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class StubTicker:
+    """Stands in for yfinance.Ticker: history() returns `frame` or raises `error`."""
+
+    def __init__(self, frame=None, error=None):
+        self.frame = pd.DataFrame() if frame is None else frame
+        self.error = error
+        self.calls = 0
+
+    def history(self, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.frame
+
+
+class StubYahoo:
+    def __init__(self, ticker: StubTicker):
+        self.ticker = ticker
+
+    def Ticker(self, symbol):  # noqa: N802 - mirrors yfinance
+        return self.ticker
+
+
+class NegativeCacheTests(SimpleTestCase):
+    def test_entry_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = NegativeCache(ttl=60, clock=clock)
+        cache.add("AAA")
+        self.assertIn("AAA", cache)
+        clock.advance(59.9)
+        self.assertIn("AAA", cache)
+        clock.advance(0.2)
+        self.assertNotIn("AAA", cache)
+        self.assertEqual(cache.counters(), {"hits": 2, "misses": 1, "stores": 1, "entries": 0})
+
+    def test_full_cache_drops_expired_entries_first(self):
+        clock = FakeClock()
+        cache = NegativeCache(ttl=10, max_entries=2, clock=clock)
+        cache.add("old")
+        clock.advance(20)
+        cache.add("a")
+        cache.add("b")
+        self.assertIn("a", cache)
+        self.assertIn("b", cache)
+        self.assertNotIn("old", cache)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30, slow_call_seconds=5, clock=self.clock)
+
+    def fail(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(self._raise)
+
+    @staticmethod
+    def _raise():
+        raise ConnectionError("boom")
+
+    def test_opens_after_consecutive_failures_and_rejects(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "never")
+        counters = self.breaker.counters()
+        self.assertEqual((counters["calls"], counters["failures"], counters["rejected"], counters["opened"]), (3, 3, 1, 1))
+
+    def test_success_resets_the_failure_streak(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_success_closes(self):
+        for _ in range(3):
+            self.fail()
+        self.clock.advance(30)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_failure_reopens(self):
+        for _ in range(3):
+            self.fail()
+        self.clock.advance(30)
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.counters()["opened"], 2)
+        self.clock.advance(29)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "never")
+
+    def test_half_open_admits_one_trial_at_a_time(self):
+        for _ in range(3):
+            self.fail()
+        self.clock.advance(30)
+
+        def trial():
+            # A second caller while the trial is still running is rejected
+            with self.assertRaises(CircuitOpenError):
+                self.breaker.call(lambda: "never")
+            return "ok"
+
+        self.assertEqual(self.breaker.call(trial), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_calls_count_as_failures(self):
+        def slow():
+            self.clock.advance(6)
+            return "late"
+
+        for _ in range(3):
+            self.assertEqual(self.breaker.call(slow), "late")
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class YahooFetchTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = NegativeCache(ttl=900, clock=self.clock)
+        self.breaker = CircuitBreaker("yahoo-test", failure_threshold=2, reset_timeout=30, clock=self.clock)
+        for name, value in (("negative_cache", self.cache), ("yahoo_breaker", self.breaker)):
+            patcher = mock.patch.object(live_data, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def use(self, ticker: StubTicker) -> StubTicker:
+        patcher = mock.patch.object(live_data, "yf", StubYahoo(ticker))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return ticker
+
+    def test_upstream_error_is_a_breaker_failure_not_a_negative_entry(self):
+        stub = self.use(StubTicker(error=ConnectionError("DNS failure")))
+        self.assertFalse(live_data.ensure_prices_for_ticker("AAA"))
+        self.assertFalse(live_data.ensure_prices_for_ticker("AAA"))
+        self.assertEqual(stub.calls, 2)
+        self.assertEqual(self.cache.counters()["stores"], 0)
+        self.assertEqual(self.breaker.counters()["failures"], 2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        # Open breaker: fail fast, still nothing cached
+        self.assertFalse(live_data.ensure_prices_for_ticker("AAA"))
+        self.assertEqual(stub.calls, 2)
+        self.assertEqual(self.cache.counters()["stores"], 0)
+
+    def test_clean_empty_result_is_negatively_cached(self):
+        stub = self.use(StubTicker())
+        self.assertFalse(live_data.ensure_prices_for_ticker("NOPE"))
+        self.assertFalse(live_data.ensure_prices_for_ticker("NOPE"))
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual(self.breaker.counters()["failures"], 0)
+        self.clock.advance(901)
+        self.assertFalse(live_data.ensure_prices_for_ticker("NOPE"))
+        self.assertEqual(stub.calls, 2)
+
+    def test_missing_ticker_error_counts_as_empty(self):
+        stub = self.use(StubTicker(error=YFTzMissingError("GONE")))
+        self.assertFalse(live_data.ensure_prices_for_ticker("GONE"))
+        self.assertIn(("prices", "GONE"), self.cache)
+        self.assertEqual(self.breaker.counters()["failures"], 0)
+        self.assertEqual(stub.calls, 1)
+
+    def test_prices_are_stored(self):
+        dates = pd.bdate_range("2024-01-01", periods=70, name="Date")
+        frame = pd.DataFrame(
+            {"Open": 10.0, "High": 11.0, "Low": 9.0, "Close": 10.5, "Volume": 1000}, index=dates
+        )
+        self.use(StubTicker(frame=frame))
+        self.assertTrue(live_data.ensure_prices_for_ticker("AAA"))
+        self.assertEqual(self.breaker.counters()["failures"], 0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_cancelled_leader_does_not_fail_followers(self):
+        flight = AsyncSingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return "payload"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do("k", work))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do("k", work)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return results
+
+        self.assertEqual(asyncio.run(main()), ["payload", "payload"])
+        self.assertEqual(len(runs), 1)
+
+    def test_async_error_reaches_every_caller(self):
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad")
+
+        async def main():
+            return await asyncio.gather(*(flight.do("k", work) for _ in range(3)), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in asyncio.run(main())))
+
+    def test_follower_stops_waiting_for_a_stuck_leader(self):
+        flight = SingleFlight(wait_seconds=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=("k", release.wait, 5))
+        leader.start()
+        try:
+            self.assertEqual(flight.do("k", lambda: "own run"), "own run")
+        finally:
+            release.set()
+            leader.join()
+
+
+class StreamViewTests(TestCase):
+    def test_stream_needs_asgi(self):
+        response = self.client.get("/api/stream", {"tickers": "AAA"})
+        self.assertEqual(response.status_code, 501)
+        self.assertIn("ASGI", response.json()["error"])
+
+
+class HistoryTests(TestCase):
+    def test_page_requires_a_ticker(self):
+        Recommendation.objects.create(ticker="AAA", signal="BUY", confidence=0.7, explanation="x")
+        response = self.client.get("/api/history")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "ticker is required"})
+        with self.assertRaises(ValueError):
+            history_page("")
+        self.assertEqual(len(self.client.get("/api/history", {"ticker": "AAA"}).json()["history"]), 1)
+
+
+class SocketSourceTests(SimpleTestCase):
+    def test_reset_producer_does_not_stop_the_source(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        stop = threading.Event()
+        source = socket_source(f"127.0.0.1:{port}", poll=0.05, stop=stop)
+        self.assertIsNone(next(source))  # listening, nothing sent yet
+
+        bad = socket.create_connection(("127.0.0.1", port))
+        good = socket.create_connection(("127.0.0.1", port))
+        bad.sendall(b"AAA,1,10.0\nAAA,2,1")
+        # SO_LINGER 0: close() sends a RST, so the server's recv raises ConnectionResetError
+        bad.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        time.sleep(0.05)
+        bad.close()
+        good.sendall(b"BBB,1,20.0\nBBB,2,21.0\n")
+        good.close()
+
+        bars = []
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len([b for b in bars if b.ticker == "BBB"]) < 2:
+            bar = next(source)
+            if bar is not None:
+                bars.append(bar)
+        stop.set()
+        source.close()
+        self.assertEqual([b.close for b in bars if b.ticker == "BBB"], [20.0, 21.0])
+        self.assertNotIn(2, [b.ts for b in bars if b.ticker == "AAA"])
+
+
+class PushFeedTests(TestCase):
+    def rec(self, pk, ticker, signal="BUY", confidence=0.6):
+        return Recommendation.objects.create(id=pk, ticker=ticker, signal=signal, confidence=confidence, explanation="")
+
+    def test_late_committed_lower_id_is_still_polled(self):
+        feed = RecommendationFeed(rescan_seconds=60)
+        feed._floor = 0
+        self.rec(1, "AAA")
+        self.rec(3, "BBB")
+        self.assertEqual([r["id"] for r in feed._new_rows(None)], [1, 3])
+        self.rec(2, "CCC")  # id allocated before 3, visible only now
+        self.assertEqual([r["id"] for r in feed._new_rows(None)], [2])
+        self.assertEqual(feed._new_rows(None), [])
+
+    def test_ids_older_than_the_rescan_window_are_settled(self):
+        feed = RecommendationFeed(rescan_seconds=0)
+        feed._floor = 0
+        self.rec(5, "AAA")
+        self.assertEqual([r["id"] for r in feed._new_rows(None)], [5])
+        feed._new_rows(None)
+        self.assertEqual((feed._floor, feed._seen), (5, set()))
+
+    def test_late_older_row_does_not_replace_a_newer_snapshot(self):
+        async def main():
+            feed = RecommendationFeed()
+            sub = Subscription(["AAA"], None)
+            feed._watchers["AAA"] = {sub}
+            row = {"ticker": "AAA", "interval": "1d", "created_at": None, "confidence": 0.7}
+            self.assertEqual(feed.publish([{**row, "id": 10, "signal": "BUY"}]), 1)
+            self.assertEqual(feed.publish([{**row, "id": 12, "signal": "BUY"}]), 0)
+            self.assertEqual(feed.publish([{**row, "id": 11, "signal": "SELL"}]), 0)
+            self.assertEqual(feed.publish([{**row, "id": 13, "signal": "SELL"}]), 1)
+            return [s["id"] for s in await sub.next(0.1)]
+
+        self.assertEqual(asyncio.run(main()), [13])
+
+
+class PanelIndicatorTests(SimpleTestCase):
+    @staticmethod
+    def ragged_prices() -> pd.DataFrame:
+        """Tickers with different start dates, lengths and date gaps, in no particular order."""
+        rng = np.random.default_rng(1)
+        dates = pd.bdate_range("2022-01-03", periods=120)
+        frames = []
+        for i, (start, n) in enumerate([(0, 120), (17, 80), (40, 25), (5, 60)]):
+            d = dates[start:start + n]
+            if i == 3:
+                d = d.delete([10, 11, 30])
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(d))))
+            frames.append(pd.DataFrame({"ticker": f"T{i}", "date": d, "close": close}))
+        return pd.concat(frames[::-1], ignore_index=True)
+
+    def assert_matches_per_ticker(self, prices: pd.DataFrame, columns_for):
+        for ticker, rows in prices.groupby("ticker"):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", FutureWarning)  # pct_change over NaN closes
+                expected = compute_indicators(rows).reset_index(drop=True)
+            got = columns_for(ticker, expected["date"])
+            for name in PANEL_COLUMNS:
+                np.testing.assert_allclose(
+                    got[name], expected[name].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=f"{ticker} {name}"
+                )
+
+    def test_long_matches_per_ticker(self):
+        prices = self.ragged_prices()
+        prices.loc[prices.sample(5, random_state=0).index, "close"] = np.nan
+        out = compute_indicators_long(prices, dtype=np.float64)
+        self.assertEqual(len(out), len(prices))
+        self.assert_matches_per_ticker(
+            prices, lambda t, _dates: {c: out.loc[out.ticker == t, c].to_numpy() for c in PANEL_COLUMNS}
+        )
+
+    def test_panel_matches_per_ticker(self):
+        prices = self.ragged_prices()
+        # Missing (ticker, date) cells are NaN; shuffled rows check the date sort
+        wide = prices.pivot(index="date", columns="ticker", values="close").sample(frac=1, random_state=0)
+        self.assertTrue(wide.isna().any().any())
+        panel = compute_indicators_panel(wide, dtype=np.float64)
+        self.assert_matches_per_ticker(
+            prices, lambda t, dates: {c: panel[c][t].reindex(dates).to_numpy() for c in PANEL_COLUMNS}
+        )
+        missing = wide.sort_index().isna().to_numpy()
+        self.assertTrue(np.isnan(panel["rsi"].to_numpy()[missing]).all())
+
+    def test_float32_stays_close(self):
+        prices = self.ragged_prices()
+        low = compute_indicators_long(prices)
+        high = compute_indicators_long(prices, dtype=np.float64)
+        self.assertEqual(low["rsi"].dtype, np.float32)
+        np.testing.assert_allclose(low["ma_30"], high["ma_30"], rtol=1e-6)
+
+
+class ScreenerRefreshTests(TestCase):
+    def seed(self, ticker: str, days: int = 90):
+        dates = pd.bdate_range("2024-01-01", periods=days)
+        close = 100 + np.cumsum(np.random.default_rng(len(ticker)).normal(0, 1, days))
+        StockPrice.objects.bulk_create(
+            StockPrice(ticker=ticker, date=d.date(), open=c, high=c + 1, low=c - 1, close=c, volume=1000)
+            for d, c in zip(dates, close)
+        )
+
+    def test_tickers_that_drop_out_are_removed(self):
+        self.seed("AAA")
+        self.seed("BBB")
+        self.assertEqual(refresh_latest_features(), 2)
+        StockPrice.objects.filter(ticker="BBB").delete()
+        self.assertEqual(refresh_latest_features(), 1)
+        self.assertEqual(list(LatestFeatures.objects.values_list("ticker", flat=True)), ["AAA"])
+        StockPrice.objects.all().delete()
+        self.assertEqual(refresh_latest_features(), 0)
+        self.assertFalse(LatestFeatures.objects.exists())
+
+
+class BarStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.store = BarStore(self.root)
+
+    @staticmethod
+    def minute_bars(start: str, n: int) -> dict:
+        ts = np.datetime64(start, "s").astype(np.int64) + 60 * np.arange(n)
+        close = 100 + np.arange(n, dtype=float)
+        return {"ts": ts, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": np.full(n, 10)}
+
+    def test_path_like_tickers_are_rejected(self):
+        for bad in ("..", ".", "../..", "A/B", "", "X" * 17):
+            with self.assertRaises(ValueError):
+                self.store.write(bad, self.minute_bars("2024-01-02", 3))
+            with self.assertRaises(ValueError):
+                self.store.bars(bad, "1h")
+        self.assertEqual(os.listdir(self.root), [])
+        for good in ("BRK-B", "BRK.B", "^GSPC", "EURUSD=X"):
+            self.assertEqual(self.store.write(good, self.minute_bars("2024-01-02", 3)), 3)
+
+    def test_csv_ticker_column_cannot_escape_the_root(self):
+        path = os.path.join(self.root, "bars.csv")
+        pd.DataFrame({
+            "Datetime": ["2024-01-02 14:30"], "Ticker": ["../../evil"],
+            "Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [1],
+        }).to_csv(path, index=False)
+        with self.assertRaises(ValueError):
+            self.store.ingest_csv(path)
+        self.assertEqual(os.listdir(self.root), ["bars.csv"])
+
+    def test_intraday_analyze_rejects_bad_tickers(self):
+        response = self.client.get("/api/analyze", {"ticker": "..", "interval": "1h"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("invalid ticker", response.json()["error"])
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    def test_reads_do_not_hold_file_descriptors(self):
+        for t in range(5):
+            for month in range(1, 7):
+                self.store.write(f"T{t}", self.minute_bars(f"2024-{month:02d}-02", 120))
+        before = len(os.listdir("/proc/self/fd"))
+        for t in range(5):
+            self.assertEqual(len(self.store.bars(f"T{t}", "1h")), 12)
+        self.assertLessEqual(len(os.listdir("/proc/self/fd")), before)
+
+
+class AsyncProfilingTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        settings = override_settings(CLEARTRADE_PROFILE_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.staff = User.objects.create_user("staff", password="x", is_staff=True)
+
+        def busy_work(ticker):
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+            return {"ticker": ticker}, 200
+
+        async def fake_analysis(ticker, live=True, interval="1d"):
+            return await sync_to_async(busy_work, thread_sensitive=False)(ticker)
+
+        async def fake_batch(tickers, live=True, interval="1d"):
+            return {t: {**(await fake_analysis(t))[0], "status": 200} for t in tickers}
+
+        for name, value in (("run_analysis_async", fake_analysis), ("run_batch_async", fake_batch)):
+            patcher = mock.patch(f"analysis_app.views.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_async_analyze_sample_covers_executor_threads(self):
+        self.client.force_login(self.staff)
+        response = self.client.get("/api/analyze/async", {"ticker": "AAA", "profile": "sample"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["ticker"], "AAA")
+        self.assertEqual(body["profile"]["mode"], "sample")
+        with open(body["profile"]["report"], encoding="utf-8") as f:
+            folded = f.read()
+        self.assertIn("busy_work", folded)
+        self.assertEqual(os.path.basename(body["profile"]["report"]), response["X-ClearTrade-Profile-Report"])
+
+    def test_batch_cprofile_via_header(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            "/api/analyze/batch", {"tickers": ["AAA", "BBB"]}, content_type="application/json",
+            HTTP_X_CLEARTRADE_PROFILE="cprofile",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body["results"]), {"AAA", "BBB"})
+        self.assertEqual(body["profile"]["mode"], "cprofile")
+        self.assertTrue(os.path.isfile(body["profile"]["report"]))
+
+    def test_non_staff_is_not_profiled(self):
+        self.client.force_login(User.objects.create_user("user", password="x"))
+        response = self.client.get("/api/analyze/async", {"ticker": "AAA", "profile": "sample"})
+        self.assertNotIn("profile", response.json())
+        self.assertFalse(response.has_header("X-ClearTrade-Profile-Report"))
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+class RecordingBuffer(RecommendationBuffer):
+    """Write-behind buffer whose flushes only record what they would write."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flushed = []
+        self.flushed_event = threading.Event()
+
+    def flush(self) -> int:
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.flushed.append(len(batch))
+            self.flushed_event.set()
+        return len(batch)
+
+
+class WriteBehindTests(TestCase):
+    @staticmethod
+    def rec(ticker="AAA", confidence=0.6):
+        return Recommendation(ticker=ticker, signal="BUY", confidence=confidence, explanation="x")
+
+    def test_full_batch_flushes_before_the_delay(self):
+        buffer = RecordingBuffer(batch_size=3, max_delay=30)
+        buffer.add(self.rec())
+        buffer.add(self.rec())
+        self.assertFalse(buffer.flushed_event.wait(0.2))
+        buffer.add(self.rec())
+        self.assertTrue(buffer.flushed_event.wait(5))
+        self.assertEqual(buffer.flushed, [3])
+
+    def test_partial_batch_flushes_after_the_delay(self):
+        buffer = RecordingBuffer(batch_size=100, max_delay=0.2)
+        start = time.monotonic()
+        buffer.add(self.rec())
+        self.assertTrue(buffer.flushed_event.wait(5))
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(buffer.flushed, [1])
+
+    def test_shutdown_flush_writes_everything_queued(self):
+        buffer = RecommendationBuffer(batch_size=1000, max_delay=60)
+        for ticker in ("AAA", "BBB", "AAA"):
+            buffer.add(self.rec(ticker))
+        self.assertTrue(buffer.has_pending("BBB"))
+        self.assertEqual(buffer.flush(), 3)  # what atexit runs
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Recommendation.objects.count(), 3)
+
+    def test_bad_rows_are_dead_lettered_and_the_rest_written(self):
+        buffer = RecommendationBuffer(batch_size=1000, max_delay=60)
+        rows = [self.rec(f"T{i}") for i in range(10)]
+        rows[3] = self.rec("BAD1", confidence=None)
+        rows[8] = self.rec("BAD2", confidence=None)
+        for rec in rows:
+            buffer.add(rec)
+        self.assertEqual(buffer.flush(), 8)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(sorted(r.ticker for r, _ in buffer.dead_letters), ["BAD1", "BAD2"])
+        self.assertIn("IntegrityError", buffer.dead_letters[0][1])
+        self.assertEqual(Recommendation.objects.count(), 8)
+        # The queue keeps moving
+        buffer.add(self.rec("NEXT"))
+        self.assertEqual(buffer.flush(), 1)
+
+    def test_unavailable_database_keeps_rows_queued(self):
+        buffer = RecommendationBuffer(batch_size=1000, max_delay=60)
+        for ticker in ("AAA", "BBB"):
+            buffer.add(self.rec(ticker))
+        with mock.patch.object(Recommendation.objects, "bulk_create", side_effect=OperationalError("database is locked")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual([r.ticker for r in buffer._pending], ["AAA", "BBB"])
+        self.assertEqual(len(buffer.dead_letters), 0)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(Recommendation.objects.count(), 2)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, True)
+        self.day = (timezone.now() - dt.timedelta(days=20)).astimezone(dt.timezone.utc).date()
+
+    def at(self, hour: int) -> dt.datetime:
+        return dt.datetime.combine(self.day, dt.time(hour), tzinfo=dt.timezone.utc)
+
+    @staticmethod
+    def add(ticker, when, signal, confidence, interval="1d"):
+        rec = Recommendation.objects.create(
+            ticker=ticker, interval=interval, signal=signal, confidence=confidence,
+            explanation=f"{signal} at {when:%H:%M}", rsi=50.0, sentiment=0.1,
+        )
+        Recommendation.objects.filter(pk=rec.pk).update(created_at=when)  # auto_now_add ignores a given value
+        return rec.pk
+
+    def run_retention(self):
+        return retention.apply_retention(keep_days=10, archive_dir=self.archive_dir)
+
+    def archived_ids(self, paths) -> list[int]:
+        ids = []
+        for path in paths:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                ids.extend(json.loads(line)["id"] for line in f if line.strip())
+        return sorted(ids)
+
+    def test_rollup_archive_and_idempotence(self):
+        old = [
+            self.add("AAA", self.at(10), "BUY", 0.6),
+            self.add("AAA", self.at(12), "SELL", 0.8),
+            # Highest id but not the latest row: last_* must follow created_at
+            self.add("AAA", self.at(11), "HOLD", 0.7),
+            self.add("AAA", self.at(11), "BUY", 0.9, interval="1h"),
+            self.add("BBB", self.at(9), "SELL", 0.4),
+            self.add("BBB", self.at(15), "SELL", 0.6),
+        ]
+        recent = self.add("AAA", timezone.now(), "BUY", 0.5)
+
+        totals = self.run_retention()
+        self.assertEqual((totals["days"], totals["rows"], totals["rollups"]), (1, 6, 3))
+        self.assertEqual(list(Recommendation.objects.values_list("id", flat=True)), [recent])
+
+        daily = RecommendationDaily.objects.get(ticker="AAA", interval="1d", day=self.day)
+        self.assertEqual((daily.count, daily.buy_count, daily.hold_count, daily.sell_count), (3, 1, 1, 1))
+        self.assertAlmostEqual(daily.mean_confidence, 0.7)
+        self.assertEqual((daily.first_at, daily.last_at), (self.at(10), self.at(12)))
+        self.assertEqual((daily.last_signal, daily.last_confidence, daily.last_explanation), ("SELL", 0.8, "SELL at 12:00"))
+        self.assertEqual(RecommendationDaily.objects.get(ticker="AAA", interval="1h").count, 1)
+        bbb = RecommendationDaily.objects.get(ticker="BBB")
+        self.assertEqual((bbb.count, bbb.sell_count, bbb.last_at), (2, 2, self.at(15)))
+        self.assertAlmostEqual(bbb.mean_confidence, 0.5)
+
+        self.assertEqual(len(totals["files"]), 1)
+        self.assertTrue(totals["files"][0].endswith(f"{self.day:%Y-%m-%d}.ndjson.gz"))
+        self.assertEqual(self.archived_ids(totals["files"]), sorted(old))
+        with gzip.open(totals["files"][0], "rt", encoding="utf-8") as f:
+            first = json.loads(f.readline())
+        self.assertEqual(set(first), set(retention.FIELDS))
+
+        again = self.run_retention()
+        self.assertEqual((again["days"], again["rows"], again["files"]), (0, 0, []))
+        self.assertEqual(RecommendationDaily.objects.count(), 3)
+
+    def test_late_rows_merge_into_the_existing_rollup(self):
+        RecommendationDaily.objects.create(
+            ticker="AAA", interval="1d", day=self.day, count=2, buy_count=2, hold_count=0, sell_count=0,
+            mean_confidence=0.5, first_at=self.at(9), last_at=self.at(10), last_signal="BUY",
+            last_confidence=0.5, last_explanation="BUY at 10:00",
+        )
+        self.add("AAA", self.at(8), "HOLD", 0.2)
+        self.add("AAA", self.at(13), "SELL", 0.8)
+        self.assertEqual(self.run_retention()["rollups"], 1)
+        daily = RecommendationDaily.objects.get(ticker="AAA")
+        self.assertEqual((daily.count, daily.buy_count, daily.hold_count, daily.sell_count), (4, 2, 1, 1))
+        self.assertAlmostEqual(daily.mean_confidence, 0.5)
+        self.assertEqual((daily.first_at, daily.last_at, daily.last_signal), (self.at(8), self.at(13), "SELL"))
+
+    def test_row_backfilled_between_archive_and_rollup_is_archived(self):
+        ids = [self.add("AAA", self.at(10), "BUY", 0.6), self.add("AAA", self.at(11), "HOLD", 0.7)]
+        archive_day = retention.archive_day
+
+        def archive_then_backfill(*args, **kwargs):
+            path = archive_day(*args, **kwargs)
+            if len(ids) == 2:
+                ids.append(self.add("AAA", self.at(9), "SELL", 0.8))
+            return path
+
+        with mock.patch.object(retention, "archive_day", archive_then_backfill):
+            totals = self.run_retention()
+        # The backfilled row is left by the first pass and archived by the next one
+        self.assertEqual(len(totals["files"]), 2)
+        self.assertEqual(self.archived_ids(totals["files"]), sorted(ids))
+        self.assertFalse(Recommendation.objects.exists())
+        daily = RecommendationDaily.objects.get(ticker="AAA")
+        self.assertEqual((daily.count, daily.sell_count, daily.first_at, daily.last_signal), (3, 1, self.at(9), "HOLD"))
+
+    def test_chat_answers_from_rollups_once_raw_rows_are_gone(self):
+        self.add("AAA", self.at(10), "BUY", 0.6)
+        self.add("AAA", self.at(12), "SELL", 0.8)
+        self.run_retention()
+        response = self.client.post("/api/chat", {"ticker": "AAA", "question": "Why?"}, content_type="application/json")
+        self.assertEqual(response.json(), {"answer": "SELL at 12:00"})
+        response = self.client.post("/api/chat", {"ticker": "AAA", "question": "Confidence?"}, content_type="application/json")
+        self.assertEqual(response.json(), {"answer": "Confidence = 0.80."})
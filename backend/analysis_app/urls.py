@@ -1,8 +1,16 @@
 from django.urls import path
-from .views import analyze, history, chat
+from .views import analyze, analyze_async, analyze_batch, history, history_daily, history_export, chat, screener, stream
+from .metrics import metrics_view
 
 urlpatterns = [
     path("analyze", analyze),
+    path("analyze/async", analyze_async),
+    path("analyze/batch", analyze_batch),
     path("history", history),
+    path("history/daily", history_daily),
+    path("history/export", history_export),
     path("chat", chat),
+    path("screener", screener),
+    path("stream", stream),
+    path("metrics", metrics_view),
 ]
\ No newline at end of file
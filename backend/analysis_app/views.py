@@ -1,131 +1,236 @@
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-import pandas as pd
-
-from core.models import StockPrice, FundamentalMetric, NewsHeadline, Recommendation
-from analysis_app.indicators import compute_indicators
-from analysis_app.sentiment import score_sentiment
-from analysis_app.agent import (
-    predict,
-    fuse,
-    summarize_for_human,
-    compute_fundamental_score,
-    FEATURES as INDICATOR_NAMES,
-)
-from analysis_app.live_data import ensure_prices_for_ticker, ensure_fundamentals_and_news
 
-MODEL_PATH = "analysis_model.joblib"
-LSTM_SEQUENCE_LEN = 20
+from core.models import Recommendation, RecommendationDaily
+from analysis_app.bar_store import INTERVALS, check_ticker
+from analysis_app.async_pipeline import BATCH_MAX_TICKERS, run_analysis_async, run_batch_async
+from analysis_app.history import (
+    DEFAULT_LIMIT, EXPORT_FIELDS, FORMATS, MAX_LIMIT, aiter_chunks, daily_history, export_chunks, history_page,
+    parse_fields, parse_time,
+)
+from analysis_app.pipeline import run_analysis
+from analysis_app.profiling import profiled
+from analysis_app.push import HEARTBEAT_SECONDS, MAX_WATCHLIST, get_feed
+from analysis_app.screener import screen
+from analysis_app.singleflight import coalesced, coalesced_async
+from analysis_app.write_behind import flush_pending
 
 @api_view(["GET"])
+@profiled("analyze")
 def analyze(request):
     ticker = request.query_params.get("ticker", "").upper().strip()
     if not ticker:
         return Response({"error": "ticker is required"}, status=400)
+    interval = request.query_params.get("interval", "1d")
+    if interval not in INTERVALS:
+        return Response({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+    if interval != "1d":
+        try:
+            check_ticker(ticker)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+    payload, status = coalesced(ticker, run_analysis, ticker, True, interval, interval=interval)
+    return Response(payload, status=status)
+
+@require_GET
+@profiled("analyze_async")
+async def analyze_async(request):
+    """Async /api/analyze for ASGI servers: overlaps the I/O stages of one analysis."""
+    ticker = request.GET.get("ticker", "").upper().strip()
+    if not ticker:
+        return JsonResponse({"error": "ticker is required"}, status=400)
+    interval = request.GET.get("interval", "1d")
+    if interval not in INTERVALS:
+        return JsonResponse({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+    if interval != "1d":
+        try:
+            check_ticker(ticker)
+        except ValueError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+    payload, status = await coalesced_async(ticker, run_analysis_async, ticker, True, interval, interval=interval)
+    return JsonResponse(payload, status=status)
+
+@csrf_exempt
+@require_POST
+@profiled("analyze_batch")
+async def analyze_batch(request):
+    """POST {"tickers": [...]} – analyze up to BATCH_MAX_TICKERS tickers concurrently."""
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "invalid JSON body"}, status=400)
+    raw = body.get("tickers") if isinstance(body, dict) else None
+    if not isinstance(raw, list) or not raw:
+        return JsonResponse({"error": "tickers (a non-empty list) is required"}, status=400)
+    tickers = list(dict.fromkeys(str(t).upper().strip() for t in raw if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return JsonResponse({"error": f"at most {BATCH_MAX_TICKERS} tickers per batch"}, status=400)
 
-    # If we don't already have enough historical data for this ticker,
-    # try to fetch recent prices from Yahoo Finance on the fly.
-    ensure_prices_for_ticker(ticker)
-    # Best-effort fetch of fundamentals and recent news so those panels are
-    # populated for well-known tickers during the demo.
-    ensure_fundamentals_and_news(ticker)
-
-    qs = StockPrice.objects.filter(ticker=ticker).order_by("date")
-    if qs.count() < 60:
-        return Response({"error": "Need at least 60 rows of prices for indicators."}, status=400)
-
-    df = pd.DataFrame([{"date": p.date, "close": p.close} for p in qs])
-    df["date"] = pd.to_datetime(df["date"])
-    df = compute_indicators(df).dropna()
-    latest = df.iloc[-1]
-
-    feats = {
-        "ma_10": float(latest["ma_10"]),
-        "ma_30": float(latest["ma_30"]),
-        "rsi": float(latest["rsi"]),
-        "volatility": float(latest["volatility"]),
-    }
-    # Build sequence for LSTM if available (last LSTM_SEQUENCE_LEN rows)
-    feats_sequence = None
-    if len(df) >= LSTM_SEQUENCE_LEN:
+    interval = body.get("interval", "1d")
+    if interval not in INTERVALS:
+        return JsonResponse({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+    if interval != "1d":
         try:
-            feats_sequence = df.iloc[-LSTM_SEQUENCE_LEN:][list(INDICATOR_NAMES)].values.astype("float32")
-        except Exception:
-            pass
-
-    fund = FundamentalMetric.objects.filter(ticker=ticker).order_by("-period_end").first()
-    pe = fund.pe_ratio if fund else None
-    eg = fund.earnings_growth if fund else None
-    rg = fund.revenue_growth if fund else None
-
-    news = NewsHeadline.objects.filter(ticker=ticker).order_by("-date")[:10]
-    if news:
-        sentiment = score_sentiment([n.headline for n in news])
-    else:
-        sentiment = None
-
-    signal, conf, probs = predict(MODEL_PATH, feats, feats_sequence=feats_sequence)
-    final_signal, final_conf, explanation = fuse(
-        signal, conf, pe, eg, rg, sentiment, probs=probs
-    )
-    fundamental_score = compute_fundamental_score(pe, eg, rg)
-
-    summary = summarize_for_human(
-        final_signal,
-        final_conf,
-        feats,
-        pe,
-        eg,
-        rg,
-        sentiment,
-    )
-
-    rec = Recommendation.objects.create(
-        ticker=ticker,
-        signal=final_signal,
-        confidence=final_conf,
-        explanation=explanation,
-        ma_10=feats["ma_10"],
-        ma_30=feats["ma_30"],
-        rsi=feats["rsi"],
-        volatility=feats["volatility"],
-        sentiment=sentiment,
-        pe_ratio=pe,
-        earnings_growth=eg,
-        revenue_growth=rg,
-    )
-
-    from analysis_app.explainability import get_feature_importance, get_shap_values
-
-    feature_importance = get_feature_importance(MODEL_PATH, feats, probs)
-    shap_values = get_shap_values(MODEL_PATH, feats)
-
-    return Response({
-        "ticker": ticker,
-        "recommendation": rec.signal,
-        "confidence": rec.confidence,
-        "explanation": rec.explanation,
-        "summary": summary,
-        "class_probabilities": probs,
-        "features": feats,
-        "fundamentals": {"pe_ratio": pe, "earnings_growth": eg, "revenue_growth": rg},
-        "fundamental_score": fundamental_score,
-        "sentiment": sentiment,
-        "feature_importance": feature_importance,
-        "shap_values": shap_values,
-    })
+            for ticker in tickers:
+                check_ticker(ticker)
+        except ValueError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+    results = await run_batch_async(tickers, interval=interval)
+    return JsonResponse({"results": results})
+
+@require_GET
+async def stream(request):
+    """
+    GET /api/stream?tickers=AAPL,MSFT[&interval=1d] – Server-Sent Events. Sends each
+    ticker's latest recommendation, then a new snapshot whenever its signal or
+    confidence changes; a comment line every HEARTBEAT_SECONDS keeps proxies open.
+    Serve under ASGI: each open stream holds a task, not a worker thread.
+    """
+    if not isinstance(request, ASGIRequest):
+        # WSGI would drain the endless event iterator before sending anything, pinning a thread
+        return JsonResponse({"error": "/api/stream requires an ASGI server (e.g. uvicorn backend.asgi:application)"}, status=501)
+    tickers = list(dict.fromkeys(t.upper().strip() for t in request.GET.get("tickers", "").split(",") if t.strip()))
+    if not tickers:
+        return JsonResponse({"error": "tickers is required"}, status=400)
+    if len(tickers) > MAX_WATCHLIST:
+        return JsonResponse({"error": f"at most {MAX_WATCHLIST} tickers per stream"}, status=400)
+    interval = request.GET.get("interval") or None
+    if interval is not None and interval not in INTERVALS:
+        return JsonResponse({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+
+    feed = get_feed()
+    sub = await feed.subscribe(tickers, interval)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                snapshots = await sub.next(HEARTBEAT_SECONDS)
+                if not snapshots:
+                    yield ": keep-alive\n\n"
+                for snap in snapshots:
+                    data = json.dumps(snap, cls=DjangoJSONEncoder)
+                    yield f"id: {snap['id']}\nevent: recommendation\ndata: {data}\n\n"
+        finally:
+            feed.unsubscribe(sub)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: do not buffer the stream
+    return response
+
+def history_payload(ticker: str, **options) -> dict:
+    """
+    A page of a ticker's recommendations, by default the latest 20 (shared by the
+    API and the in-process MCP server); options as history.history_page.
+    """
+    flush_pending(ticker)
+    return history_page(ticker, **options)
+
+def chat_answer(ticker: str, question: str) -> dict:
+    """Answer a follow-up question from the latest recommendation; question is lower-cased."""
+    flush_pending(ticker)
+    last = Recommendation.objects.filter(ticker=ticker).order_by("-created_at").first()
+    if not last:
+        daily = RecommendationDaily.objects.filter(ticker=ticker).order_by("-day", "-last_at").first()
+        if daily:
+            # Only rolled-up history is left (apply_retention): answer from that day's last recommendation
+            last = Recommendation(
+                ticker=ticker, signal=daily.last_signal, confidence=daily.last_confidence,
+                explanation=daily.last_explanation, rsi=daily.last_rsi, sentiment=daily.last_sentiment,
+            )
+    if not last:
+        return {"answer": "No recommendation found. Run Analyze first."}
+
+    if "why" in question or "explain" in question:
+        return {"answer": last.explanation}
+    if "confidence" in question:
+        return {"answer": f"Confidence = {last.confidence:.2f}."}
+    if "rsi" in question:
+        return {"answer": f"RSI = {last.rsi:.2f}. Above 70 is overbought; below 30 is oversold."}
+    if "sentiment" in question or "news" in question:
+        return {"answer": f"Sentiment score = {last.sentiment:.2f} (positive>0, negative<0)."}
+    return {"answer": "Try: 'Why?', 'Confidence?', 'RSI?', 'Sentiment?'."}
 
 @api_view(["GET"])
 def history(request):
-    ticker = request.query_params.get("ticker", "").upper().strip()
-    qs = Recommendation.objects.filter(ticker=ticker).order_by("-created_at")[:20]
-    return Response({
-        "ticker": ticker,
-        "history": [
-            {"created_at": r.created_at, "signal": r.signal, "confidence": r.confidence, "explanation": r.explanation}
-            for r in qs
-        ]
-    })
+    """
+    GET /api/history?ticker=AAPL&fields=created_at,signal,confidence&start=2024-01-01&end=2024-06-30
+    &interval=1d&limit=100&order=desc&cursor=...&compact=true
+    """
+    params = request.query_params
+    ticker = params.get("ticker", "").upper().strip()
+    try:
+        payload = history_payload(
+            ticker,
+            fields=parse_fields(params.get("fields")),
+            start=parse_time(params.get("start")),
+            end=parse_time(params.get("end"), end=True),
+            interval=params.get("interval") or None,
+            cursor=params.get("cursor") or None,
+            limit=int(params.get("limit", DEFAULT_LIMIT)),
+            order=params.get("order", "desc"),
+            compact=params.get("compact", "").lower() in ("1", "true", "yes"),
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response(payload)
+
+@api_view(["GET"])
+def history_daily(request):
+    """GET /api/history/daily?ticker=AAPL&start=2023-01-01&end=2023-12-31&interval=1d&limit=365"""
+    params = request.query_params
+    ticker = params.get("ticker", "").upper().strip()
+    try:
+        payload = daily_history(
+            ticker,
+            start=parse_time(params.get("start")),
+            end=parse_time(params.get("end"), end=True),
+            interval=params.get("interval") or None,
+            limit=int(params.get("limit", MAX_LIMIT)),
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response(payload)
+
+@require_GET
+def history_export(request):
+    """
+    GET /api/history/export?format=ndjson|csv[&ticker=AAPL&fields=...&start=...&end=...&interval=1d]
+    Streams every matching row, oldest first, in keyset chunks (all tickers if none given).
+    """
+    params = request.GET
+    ticker = params.get("ticker", "").upper().strip() or None
+    fmt = params.get("format", "ndjson")
+    try:
+        chunks = export_chunks(
+            ticker,
+            fields=parse_fields(params.get("fields"), default=EXPORT_FIELDS),
+            start=parse_time(params.get("start")),
+            end=parse_time(params.get("end"), end=True),
+            interval=params.get("interval") or None,
+            fmt=fmt,
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if ticker:
+        flush_pending(ticker)
+
+    content = aiter_chunks(chunks) if isinstance(request, ASGIRequest) else chunks
+    response = StreamingHttpResponse(content, content_type=FORMATS[fmt])
+    name = f"recommendations-{ticker or 'all'}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{name}"'
+    return response
 
 @api_view(["POST"])
 def chat(request):
@@ -134,16 +239,35 @@ def chat(request):
     if not ticker or not question:
         return Response({"error": "ticker and question are required"}, status=400)
 
-    last = Recommendation.objects.filter(ticker=ticker).order_by("-created_at").first()
-    if not last:
-        return Response({"answer": "No recommendation found. Run Analyze first."})
+    return Response(chat_answer(ticker, question))
 
-    if "why" in question or "explain" in question:
-        return Response({"answer": last.explanation})
-    if "confidence" in question:
-        return Response({"answer": f"Confidence = {last.confidence:.2f}."})
-    if "rsi" in question:
-        return Response({"answer": f"RSI = {last.rsi:.2f}. Above 70 is overbought; below 30 is oversold."})
-    if "sentiment" in question or "news" in question:
-        return Response({"answer": f"Sentiment score = {last.sentiment:.2f} (positive>0, negative<0)."})
-    return Response({"answer": "Try: 'Why?', 'Confidence?', 'RSI?', 'Sentiment?'."})
\ No newline at end of file
+def _float_param(params, name):
+    value = params.get(name)
+    return float(value) if value not in (None, "") else None
+
+@api_view(["GET"])
+def screener(request):
+    """
+    GET /api/screener?signal=BUY&rsi_min=30&rsi_max=70&volatility_max=0.4&fundamental_min=0.6
+    &min_confidence=0.5&sort=-confidence&page=1&page_size=50
+    """
+    params = request.query_params
+    try:
+        result = screen(
+            signals=[s for s in params.get("signal", "").split(",") if s.strip()],
+            rsi_min=_float_param(params, "rsi_min"),
+            rsi_max=_float_param(params, "rsi_max"),
+            volatility_min=_float_param(params, "volatility_min"),
+            volatility_max=_float_param(params, "volatility_max"),
+            fundamental_min=_float_param(params, "fundamental_min"),
+            fundamental_max=_float_param(params, "fundamental_max"),
+            min_confidence=_float_param(params, "min_confidence"),
+            sort=params.get("sort", "-confidence"),
+            page=int(params.get("page", 1)),
+            page_size=int(params.get("page_size", 50)),
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    except FileNotFoundError:
+        return Response({"error": "Technical model not trained yet."}, status=503)
+    return Response(result)
@@ -0,0 +1,158 @@
+"""
+Optional write-behind buffer for Recommendation inserts.
+
+With CLEARTRADE_WRITE_BEHIND=true, pipeline.store() hands the unsaved Recommendation
+to the buffer instead of inserting it, and the response is built from the in-memory
+object. A background thread writes buffered rows with one bulk_create per batch when
+CLEARTRADE_WRITE_BEHIND_BATCH rows are waiting or CLEARTRADE_WRITE_BEHIND_SECONDS
+have passed since the oldest one was queued. Pending rows are flushed at interpreter
+exit (atexit), and history/chat flush first when the ticker they read has rows waiting,
+so clients still read their own writes.
+
+created_at is stamped when the row is written, i.e. up to the flush interval after
+the request. When a bulk insert fails because the database is unavailable
+(OperationalError, InterfaceError: locked, gone away) the unwritten rows stay
+queued and are retried. Any other error means some row is bad: the batch is
+bisected, the good rows are written, and each row that fails on its own goes to
+buffer.dead_letters (the newest DEAD_LETTER_MAX, with the error) and is counted
+in metrics, so one bad row never blocks the queue. Beyond MAX_PENDING queued rows
+the oldest are dropped (counted in metrics).
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+
+from analysis_app.metrics import inc, observe
+
+ENABLED = os.getenv("CLEARTRADE_WRITE_BEHIND", "false").lower() == "true"
+BATCH_SIZE = int(os.getenv("CLEARTRADE_WRITE_BEHIND_BATCH", "100"))
+MAX_DELAY = float(os.getenv("CLEARTRADE_WRITE_BEHIND_SECONDS", "1.0"))
+MAX_PENDING = 50_000
+DEAD_LETTER_MAX = 1000
+# Errors that say nothing about the rows: keep them queued and retry
+RETRYABLE = (OperationalError, InterfaceError)
+
+
+class RecommendationBuffer:
+    def __init__(self, batch_size: int = BATCH_SIZE, max_delay: float = MAX_DELAY):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self._pending: list = []
+        self.dead_letters: deque = deque(maxlen=DEAD_LETTER_MAX)
+        self._oldest = 0.0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = None
+
+    def add(self, rec) -> None:
+        with self._cond:
+            first = not self._pending
+            if first:
+                self._oldest = time.monotonic()
+            self._pending.append(rec)
+            overflow = len(self._pending) - MAX_PENDING
+            if overflow > 0:
+                del self._pending[:overflow]
+                inc("cleartrade_write_behind_dropped_total", value=overflow,
+                    help_text="Buffered recommendations dropped because the queue was full.")
+            self._ensure_thread()
+            # Wake the flusher to start the delay timer, or to flush a full batch now
+            if first or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def has_pending(self, ticker: str) -> bool:
+        with self._cond:
+            return any(r.ticker == ticker for r in self._pending)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            written, rejected = self._write(batch)
+            if rejected:
+                self.dead_letters.extend(rejected)
+                inc("cleartrade_write_behind_rejected_total", value=len(rejected),
+                    help_text="Buffered recommendations the database refused (kept in dead_letters).")
+            if written:
+                observe("cleartrade_write_behind_flush_seconds", time.perf_counter() - start,
+                        help_text="Time per write-behind bulk insert.")
+                inc("cleartrade_write_behind_rows_total", value=written, help_text="Recommendations written by write-behind.")
+            return written
+
+    def _write(self, batch: list) -> tuple[int, list]:
+        """
+        Insert batch, bisecting on row errors. Returns (rows written, [(rec, error), ...]
+        rejected). On a RETRYABLE error the unwritten rows go back to the queue front.
+        """
+        from core.models import Recommendation
+
+        written, rejected = 0, []
+        pieces = [batch]
+        while pieces:
+            rows = pieces.pop()
+            try:
+                with transaction.atomic():
+                    Recommendation.objects.bulk_create(rows, batch_size=500)
+            except RETRYABLE:
+                retry = rows + [r for piece in reversed(pieces) for r in piece]
+                for rec in retry:
+                    rec.pk = None  # a rolled-back bulk_create may have assigned ids
+                with self._cond:
+                    self._pending[:0] = retry
+                inc("cleartrade_write_behind_failures_total", help_text="Failed write-behind flushes (rows are retried).")
+                break
+            except Exception as exc:
+                for rec in rows:
+                    rec.pk = None
+                if len(rows) == 1:
+                    rejected.append((rows[0], repr(exc)))
+                else:
+                    mid = len(rows) // 2
+                    pieces += [rows[mid:], rows[:mid]]
+            else:
+                written += len(rows)
+        return written, rejected
+
+    def _ensure_thread(self) -> None:
+        # Threads do not survive fork; start one per process on first use.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="cleartrade-write-behind", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                due = self._oldest + self.max_delay
+                while self._pending and len(self._pending) < self.batch_size and time.monotonic() < due:
+                    self._cond.wait(max(0.0, due - time.monotonic()))
+            if not self.flush() and len(self):
+                # Flush failed (e.g. database locked): back off before retrying
+                time.sleep(self.max_delay or 1.0)
+            close_old_connections()
+
+
+buffer = RecommendationBuffer()
+atexit.register(buffer.flush)
+
+
+def flush_pending(ticker: str) -> None:
+    """Make queued rows for `ticker` visible before reading them back."""
+    if ENABLED and buffer.has_pending(ticker):
+        buffer.flush()
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'analysis_app.metrics.ServerTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -110,6 +111,30 @@ else:
         }
     }
 
+# SQLite high-concurrency profile (SQLITE_PROFILE=concurrent) for single-host,
+# multi-worker deployments:
+# - WAL: readers never block the writer and vice versa.
+# - BEGIN IMMEDIATE: write transactions take the write lock up front, so waiting
+#   is handled by the busy timeout instead of failing with "database is locked".
+# - synchronous=NORMAL is durable across application crashes in WAL mode (only
+#   an OS crash can lose the last commits), and much faster than FULL.
+# - 64 MB page cache, in-memory temp tables and a 256 MB mmap per connection.
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "20"))
+SQLITE_CONCURRENT_OPTIONS = {
+    "timeout": SQLITE_BUSY_TIMEOUT,
+    "transaction_mode": "IMMEDIATE",
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA cache_size=-64000;"
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA mmap_size=268435456;"
+    ),
+}
+
+if DB_ENGINE != "mysql" and os.getenv("SQLITE_PROFILE", "default").lower() == "concurrent":
+    DATABASES["default"]["OPTIONS"] = dict(SQLITE_CONCURRENT_OPTIONS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -148,3 +173,14 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# On-demand profiling reports (staff-only ?profile=sample|cprofile, profile_analyze command)
+CLEARTRADE_PROFILE_DIR = os.getenv("CLEARTRADE_PROFILE_DIR", str(BASE_DIR / "profiles"))
+
+# Intraday bar store (analysis_app.bar_store, import_bars command)
+CLEARTRADE_BAR_DIR = os.getenv("CLEARTRADE_BAR_DIR", str(BASE_DIR / "bars"))
+
+# Recommendation retention (apply_retention command): full rows for this many days,
+# daily rollups after that; raw rows are archived as compressed files here
+CLEARTRADE_RETENTION_DAYS = int(os.getenv("CLEARTRADE_RETENTION_DAYS", "90"))
+CLEARTRADE_ARCHIVE_DIR = os.getenv("CLEARTRADE_ARCHIVE_DIR", str(BASE_DIR / "archive"))
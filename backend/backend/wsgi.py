@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Fork-based servers (e.g. gunicorn --preload): load memory-mapped model artifacts
+# once in the master so every worker shares the same page-cache copy.
+if os.getenv("CLEARTRADE_PRELOAD_MODELS", "false").lower() == "true":
+    from analysis_app.model_store import preload
+
+    preload()
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=64, unique=True)),
+                ('as_of', models.DateField()),
+                ('close', models.FloatField()),
+                ('ma_10', models.FloatField()),
+                ('ma_30', models.FloatField()),
+                ('rsi', models.FloatField()),
+                ('volatility', models.FloatField()),
+                ('sentiment', models.FloatField(blank=True, null=True)),
+                ('pe_ratio', models.FloatField(blank=True, null=True)),
+                ('earnings_growth', models.FloatField(blank=True, null=True)),
+                ('revenue_growth', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
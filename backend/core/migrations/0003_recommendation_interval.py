@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_latest_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendation',
+            name='interval',
+            field=models.CharField(default='1d', max_length=8),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_recommendation_interval'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['ticker', 'created_at', 'id'], name='rec_ticker_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['created_at', 'id'], name='rec_created_idx'),
+        ),
+    ]
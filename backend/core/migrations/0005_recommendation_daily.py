@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_recommendation_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=64)),
+                ('interval', models.CharField(default='1d', max_length=8)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField()),
+                ('buy_count', models.PositiveIntegerField()),
+                ('hold_count', models.PositiveIntegerField()),
+                ('sell_count', models.PositiveIntegerField()),
+                ('mean_confidence', models.FloatField()),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('last_signal', models.CharField(max_length=8)),
+                ('last_confidence', models.FloatField()),
+                ('last_explanation', models.TextField()),
+                ('last_rsi', models.FloatField(blank=True, null=True)),
+                ('last_sentiment', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker', 'day'], name='rec_daily_ticker_day_idx')],
+                'unique_together': {('ticker', 'interval', 'day')},
+            },
+        ),
+    ]
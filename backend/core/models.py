@@ -34,6 +34,7 @@ class NewsHeadline(models.Model):
 class Recommendation(models.Model):
     ticker = models.CharField(max_length=64, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    interval = models.CharField(max_length=8, default="1d")  # bar interval the signal was computed on
 
     signal = models.CharField(max_length=8)  # BUY/HOLD/SELL
     confidence = models.FloatField()
@@ -47,4 +48,60 @@ class Recommendation(models.Model):
 
     pe_ratio = models.FloatField(null=True, blank=True)
     earnings_growth = models.FloatField(null=True, blank=True)
-    revenue_growth = models.FloatField(null=True, blank=True)
\ No newline at end of file
+    revenue_growth = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        # Keyset pagination and exports walk (created_at, id), per ticker or across all
+        indexes = [
+            models.Index(fields=["ticker", "created_at", "id"], name="rec_ticker_created_idx"),
+            models.Index(fields=["created_at", "id"], name="rec_created_idx"),
+        ]
+
+class RecommendationDaily(models.Model):
+    """
+    One row per ticker, interval and UTC day for Recommendation rows past the
+    retention window (see `manage.py apply_retention`): signal counts, mean
+    confidence and the day's last recommendation.
+    """
+    ticker = models.CharField(max_length=64)
+    interval = models.CharField(max_length=8, default="1d")
+    day = models.DateField()
+
+    count = models.PositiveIntegerField()
+    buy_count = models.PositiveIntegerField()
+    hold_count = models.PositiveIntegerField()
+    sell_count = models.PositiveIntegerField()
+    mean_confidence = models.FloatField()
+
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    last_signal = models.CharField(max_length=8)
+    last_confidence = models.FloatField()
+    last_explanation = models.TextField()
+    last_rsi = models.FloatField(null=True, blank=True)
+    last_sentiment = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("ticker", "interval", "day")
+        indexes = [models.Index(fields=["ticker", "day"], name="rec_daily_ticker_day_idx")]
+
+class LatestFeatures(models.Model):
+    """
+    Precomputed latest indicators, fundamentals and sentiment per ticker, refreshed
+    by `manage.py refresh_screener`; the screener scores the whole table at once.
+    """
+    ticker = models.CharField(max_length=64, unique=True)
+    as_of = models.DateField()
+    close = models.FloatField()
+
+    ma_10 = models.FloatField()
+    ma_30 = models.FloatField()
+    rsi = models.FloatField()
+    volatility = models.FloatField()
+    sentiment = models.FloatField(null=True, blank=True)
+
+    pe_ratio = models.FloatField(null=True, blank=True)
+    earnings_growth = models.FloatField(null=True, blank=True)
+    revenue_growth = models.FloatField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
@@ -8,6 +8,7 @@ Run from backend directory (with venv activated):
   python evaluate_model.py
 
 Optional: --ticker MSFT  --test-ratio 0.25  --model-type logreg  --save
+          --features ma_10,ma_30,rsi,volatility,macd_hist,bb_width,atr
 """
 import argparse
 import os
@@ -23,26 +24,30 @@ import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
-import joblib
 
 from core.models import StockPrice
-from analysis_app.indicators import compute_indicators
+from analysis_app.agent import save_model_features
+from analysis_app.indicators import compute_features, price_columns
 from analysis_app.ml_train import FEATURES, add_labels
+from analysis_app.explainability import save_background
+from analysis_app.compiled_model import export_compiled
+from analysis_app.model_store import dump_joblib
 
 MODEL_PATH = "analysis_model.joblib"
 LABELS = {0: "SELL", 1: "HOLD", 2: "BUY"}
 LABEL_NAMES = [LABELS[i] for i in range(3)]
 
 
-def load_and_prepare(ticker: str):
-    qs = StockPrice.objects.filter(ticker=ticker).order_by("date")
-    df = pd.DataFrame([{"date": p.date, "close": p.close} for p in qs])
+def load_and_prepare(ticker: str, features=FEATURES):
+    columns = ["date", *price_columns(features)]
+    qs = StockPrice.objects.filter(ticker=ticker).order_by("date").values_list(*columns)
+    df = pd.DataFrame(list(qs), columns=columns)
     if df.empty:
         raise SystemExit(f"No price data for ticker {ticker}.")
     df["date"] = pd.to_datetime(df["date"])
-    df = compute_indicators(df)
+    df = compute_features(df, features)
     df = add_labels(df)
-    df = df.dropna(subset=FEATURES + ["y"])
+    df = df.dropna(subset=features + ["y"])
     return df
 
 
@@ -63,15 +68,21 @@ def main():
     parser.add_argument("--test-ratio", type=float, default=0.25, help="Fraction of data for test (default: 0.25)")
     parser.add_argument("--model-type", default="logreg", choices=["logreg", "forest"], help="Model type")
     parser.add_argument("--save", action="store_true", help="Save trained model to analysis_model.joblib for the app")
+    parser.add_argument(
+        "--features",
+        default=",".join(FEATURES),
+        help="Comma-separated features (see indicators.ALL_FEATURES; default: CLEARTRADE_FEATURES or the base four)",
+    )
     args = parser.parse_args()
+    features = [f.strip() for f in args.features.split(",") if f.strip()]
 
     print("Loading and preparing data...")
-    df = load_and_prepare(args.ticker)
+    df = load_and_prepare(args.ticker, features)
     train_df, test_df = time_split(df, args.test_ratio)
 
-    X_train = train_df[FEATURES].values
+    X_train = train_df[features].values
     y_train = train_df["y"].values
-    X_test = test_df[FEATURES].values
+    X_test = test_df[features].values
     y_test = test_df["y"].values
 
     print(f"Train samples: {len(y_train)}, Test samples: {len(y_test)}")
@@ -102,7 +113,7 @@ def main():
     print("=" * 60)
     print(f"Ticker:        {args.ticker}")
     print(f"Model:         {'Logistic Regression' if model_type == 'logreg' else 'Random Forest'}")
-    print(f"Features:      {FEATURES}")
+    print(f"Features:      {features}")
     print(f"Train size:    {len(y_train)}  |  Test size: {len(y_test)}")
     print()
 
@@ -130,7 +141,10 @@ def main():
     print()
 
     if args.save:
-        joblib.dump(model, MODEL_PATH)
+        dump_joblib(model, MODEL_PATH)
+        save_model_features(MODEL_PATH, features)
+        save_background(MODEL_PATH, X_train)
+        export_compiled(model, MODEL_PATH)
         print(f"Model saved to {MODEL_PATH} (trained on train set only).")
     else:
         print("Run with --save to write this model to analysis_model.joblib for the app.")
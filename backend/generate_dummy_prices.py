@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import argparse
 import csv
+import os
 from datetime import date, timedelta
 import random
-from typing import Iterable, List, Dict
+import time
+from typing import Iterable, Iterator, List, Dict
+
+import numpy as np
+import pandas as pd
 
 
 def generate_dummy_prices(
@@ -54,6 +60,231 @@ def generate_dummy_prices(
     return rows
 
 
+PRICE_COLUMNS = ["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"]
+
+# Kept in sync with the keyword lists in analysis_app.sentiment_model so the
+# keyword scorer recovers the sentiment we inject.
+POS_WORDS = ["gain", "gains", "rise", "surge", "strong", "record", "profit", "growth", "bullish", "upgrade"]
+NEG_WORDS = ["drop", "fall", "plunge", "weak", "loss", "decline", "bearish", "downgrade", "lawsuit"]
+FILLER_WORDS = ["shares", "company", "quarter", "investors", "market", "report", "outlook", "analysts", "sector"]
+
+
+def synthetic_tickers(n: int) -> List[str]:
+    return [f"SYN{i:05d}" for i in range(n)]
+
+
+def iter_market_chunks(
+    n_tickers: int,
+    n_days: int,
+    start: date = date(2015, 1, 1),
+    seed: int = 42,
+    correlation: float = 0.3,
+    drift: float = 0.0003,
+    vol: float = 0.015,
+    chunk_tickers: int = 250,
+) -> Iterator[pd.DataFrame]:
+    """
+    Vectorized correlated GBM OHLCV for n_tickers x n_days business days.
+
+    One-factor model: each ticker's daily log return is
+    drift + vol_i * (sqrt(rho) * market_t + sqrt(1 - rho) * idio_it),
+    with per-ticker vol_i scattered around `vol`. Tickers are produced in chunks of
+    `chunk_tickers` (long-format DataFrames with PRICE_COLUMNS) so memory stays
+    bounded; the output is identical for a given seed regardless of chunk size.
+    """
+    dates = pd.bdate_range(start, periods=n_days)
+    date_str = dates.strftime("%Y-%m-%d").to_numpy()
+    root = np.random.SeedSequence(seed)
+    market_ss, *ticker_ss = root.spawn(n_tickers + 1)
+    market = np.random.default_rng(market_ss).standard_normal(n_days)
+    tickers = synthetic_tickers(n_tickers)
+    rho = float(np.clip(correlation, 0.0, 1.0))
+
+    for lo in range(0, n_tickers, max(1, chunk_tickers)):
+        hi = min(n_tickers, lo + max(1, chunk_tickers))
+        rngs = [np.random.default_rng(ss) for ss in ticker_ss[lo:hi]]
+        # Per-ticker streams: draws depend only on the ticker's own seed.
+        params = np.array([r.random(2) for r in rngs])
+        # Rows: idiosyncratic shock, open gap, high wick, low wick, volume
+        noise = np.stack([r.standard_normal((5, n_days)) for r in rngs])
+        base = 20.0 + 480.0 * params[:, 0]
+        sigma = vol * (0.5 + params[:, 1])
+
+        shocks = np.sqrt(rho) * market + np.sqrt(1.0 - rho) * noise[:, 0, :]
+        log_ret = drift - 0.5 * sigma[:, None] ** 2 + sigma[:, None] * shocks
+        close = base[:, None] * np.exp(np.cumsum(log_ret, axis=1))
+        prev_close = np.concatenate([base[:, None], close[:, :-1]], axis=1)
+        open_ = prev_close * (1.0 + 0.25 * sigma[:, None] * noise[:, 1, :])
+        high = np.maximum(open_, close) * (1.0 + 0.5 * sigma[:, None] * np.abs(noise[:, 2, :]))
+        low = np.minimum(open_, close) * (1.0 - 0.5 * sigma[:, None] * np.abs(noise[:, 3, :]))
+        # Volume rises on big moves
+        volume = (2_000_000 * np.exp(0.3 * noise[:, 4, :]) * (1.0 + 20.0 * np.abs(log_ret))).astype(np.int64)
+
+        n = hi - lo
+        yield pd.DataFrame({
+            "Date": np.tile(date_str, n),
+            "Ticker": np.repeat(tickers[lo:hi], n_days),
+            "Open": np.round(open_, 2).ravel(),
+            "High": np.round(high, 2).ravel(),
+            "Low": np.round(low, 2).ravel(),
+            "Close": np.round(close, 2).ravel(),
+            "Volume": volume.ravel(),
+        })
+
+
+def generate_fundamentals(n_tickers: int, seed: int = 42) -> pd.DataFrame:
+    """One fundamentals row per ticker in import_fundamentals CSV columns."""
+    rng = np.random.default_rng([seed, 1])
+    return pd.DataFrame({
+        "symbol": synthetic_tickers(n_tickers),
+        "trailingPE": np.round(np.exp(rng.normal(np.log(20.0), 0.5, n_tickers)), 2),
+        "earningsGrowth": np.round(rng.normal(0.08, 0.15, n_tickers), 4),
+        "revenueGrowth": np.round(rng.normal(0.05, 0.10, n_tickers), 4),
+    })
+
+
+def generate_headlines(
+    n_tickers: int,
+    per_ticker: int = 10,
+    seed: int = 42,
+    snapshot: date | None = None,
+    sentiment: float | None = None,
+) -> pd.DataFrame:
+    """
+    Headlines in import_news_events CSV columns with controlled sentiment.
+
+    Each ticker gets a target sentiment in [-1, 1] (`sentiment` for all, or uniform
+    random per ticker); every headline carries 1-3 keywords that are positive with
+    probability (1 + target) / 2, so the keyword scorer averages close to the target.
+    """
+    rng = np.random.default_rng([seed, 2])
+    snapshot = snapshot or date.today()
+    n = n_tickers * per_ticker
+    target = np.full(n_tickers, sentiment, dtype=float) if sentiment is not None else rng.uniform(-1, 1, n_tickers)
+    p_pos = np.repeat((1.0 + np.clip(target, -1, 1)) / 2.0, per_ticker)
+    n_kw = rng.integers(1, 4, n)
+    filler = rng.choice(FILLER_WORDS, size=(n, 4))
+    pos = rng.choice(POS_WORDS, size=(n, 3))
+    neg = rng.choice(NEG_WORDS, size=(n, 3))
+    is_pos = rng.random((n, 3)) < p_pos[:, None]
+    keywords = np.where(is_pos, pos, neg)
+    headlines = [
+        " ".join(list(filler[i, :2]) + list(keywords[i, : n_kw[i]]) + list(filler[i, 2:]))
+        for i in range(n)
+    ]
+    return pd.DataFrame({
+        "Date": snapshot.isoformat(),
+        "Headline": headlines,
+        "Related_Company": np.repeat(synthetic_tickers(n_tickers), per_ticker),
+    })
+
+
+def _write_csv_chunks(path: str, chunks: Iterable[pd.DataFrame]) -> int:
+    total = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        total += len(chunk)
+    return total
+
+
+def _write_parquet_chunks(path: str, chunks: Iterable[pd.DataFrame]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+    writer = None
+    total = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            total += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def _setup_django() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    import django
+    django.setup()
+
+
+def _write_db_chunks(
+    chunks: Iterable[pd.DataFrame], fundamentals: pd.DataFrame, headlines: pd.DataFrame
+) -> int:
+    from core.models import StockPrice, FundamentalMetric, NewsHeadline
+
+    total = 0
+    for chunk in chunks:
+        dates = pd.to_datetime(chunk["Date"]).dt.date.to_numpy()
+        objs = [
+            StockPrice(ticker=t, date=d, open=o, high=h, low=l, close=c, volume=int(v))
+            for t, d, o, h, l, c, v in zip(
+                chunk["Ticker"].to_numpy(), dates, chunk["Open"].to_numpy(), chunk["High"].to_numpy(),
+                chunk["Low"].to_numpy(), chunk["Close"].to_numpy(), chunk["Volume"].to_numpy(),
+            )
+        ]
+        StockPrice.objects.bulk_create(objs, batch_size=5000, ignore_conflicts=True)
+        total += len(objs)
+    snapshot = date.today()
+    FundamentalMetric.objects.bulk_create([
+        FundamentalMetric(
+            ticker=r.symbol, period_end=snapshot, pe_ratio=float(r.trailingPE),
+            earnings_growth=float(r.earningsGrowth), revenue_growth=float(r.revenueGrowth),
+        )
+        for r in fundamentals.itertuples(index=False)
+    ], batch_size=5000)
+    NewsHeadline.objects.bulk_create([
+        NewsHeadline(ticker=r.Related_Company, date=date.fromisoformat(r.Date), headline=r.Headline)
+        for r in headlines.itertuples(index=False)
+    ], batch_size=5000)
+    return total
+
+
+def generate_market_dataset(
+    n_tickers: int,
+    n_days: int,
+    output: str = "csv",
+    path: str = "synthetic_prices.csv",
+    seed: int = 42,
+    correlation: float = 0.3,
+    chunk_tickers: int = 250,
+    headlines_per_ticker: int = 10,
+    sentiment: float | None = None,
+) -> Dict[str, object]:
+    """
+    Generate prices, fundamentals and headlines and write them to CSV, Parquet or the DB.
+    For file outputs, fundamentals and headlines go next to `path` as
+    <stem>_fundamentals.csv / <stem>_news.csv in the import_* command formats.
+    """
+    start = time.perf_counter()
+    chunks = iter_market_chunks(
+        n_tickers, n_days, seed=seed, correlation=correlation, chunk_tickers=chunk_tickers
+    )
+    fundamentals = generate_fundamentals(n_tickers, seed)
+    headlines = generate_headlines(n_tickers, headlines_per_ticker, seed, sentiment=sentiment)
+
+    if output == "db":
+        _setup_django()
+        rows = _write_db_chunks(chunks, fundamentals, headlines)
+        written = ["database"]
+    else:
+        writer = _write_parquet_chunks if output == "parquet" else _write_csv_chunks
+        rows = writer(path, chunks)
+        stem = os.path.splitext(path)[0]
+        fundamentals.to_csv(f"{stem}_fundamentals.csv", index=False)
+        headlines.to_csv(f"{stem}_news.csv", index=False)
+        written = [path, f"{stem}_fundamentals.csv", f"{stem}_news.csv"]
+
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / elapsed if elapsed else 0.0, "written": written}
+
+
 def write_prices_csv(path: str, rows: Iterable[Dict[str, object]]) -> None:
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
@@ -64,7 +295,7 @@ def write_prices_csv(path: str, rows: Iterable[Dict[str, object]]) -> None:
         writer.writerows(rows)
 
 
-def main() -> None:
+def demo() -> None:
     """
     Generate dummy OHLCV data for a small basket of tickers that you
     are likely to test during the demo. This does NOT try to cover the
@@ -90,5 +321,41 @@ def main() -> None:
     print(f"Wrote {len(all_rows)} dummy price rows for {', '.join(tickers)} to {path}")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic market data. Without --tickers, writes the small 5-ticker demo CSV."
+    )
+    parser.add_argument("--tickers", type=int, help="Number of synthetic tickers (vectorized generator)")
+    parser.add_argument("--days", type=int, default=2520, help="Business days per ticker (default: 2520 ≈ 10 years)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--correlation", type=float, default=0.3, help="Pairwise return correlation via a market factor")
+    parser.add_argument("--format", choices=["csv", "parquet", "db"], default="csv", help="Output target")
+    parser.add_argument("--out", default="synthetic_prices.csv", help="Price file path for csv/parquet")
+    parser.add_argument("--chunk-tickers", type=int, default=250, help="Tickers generated and written per chunk")
+    parser.add_argument("--headlines-per-ticker", type=int, default=10)
+    parser.add_argument("--sentiment", type=float, help="Fixed headline sentiment in [-1, 1] (default: random per ticker)")
+    args = parser.parse_args()
+
+    if args.tickers is None:
+        demo()
+        return
+
+    stats = generate_market_dataset(
+        args.tickers,
+        args.days,
+        output=args.format,
+        path=args.out,
+        seed=args.seed,
+        correlation=args.correlation,
+        chunk_tickers=args.chunk_tickers,
+        headlines_per_ticker=args.headlines_per_ticker,
+        sentiment=args.sentiment,
+    )
+    print(
+        f"Wrote {stats['rows']} price rows for {args.tickers} tickers in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_sec']:.0f} rows/sec) to {', '.join(stats['written'])}"
+    )
+
+
 if __name__ == "__main__":
     main()
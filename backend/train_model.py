@@ -1,13 +1,15 @@
 import os
+import sys
 import django
+import numpy as np
 import pandas as pd
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 django.setup()
 
 from core.models import StockPrice
-from analysis_app.indicators import compute_indicators
-from analysis_app.ml_train import add_labels, train_save
+from analysis_app.indicators import compute_indicators_long, price_columns
+from analysis_app.ml_train import FEATURES, add_labels, train_save
 
 MODEL_PATH = "analysis_model.joblib"
 
@@ -15,20 +17,27 @@ MODEL_PATH = "analysis_model.joblib"
 def main():
     """
     Train the technical-analysis classifier on historical prices
-    for a single ticker and persist it to disk.
+    and persist it to disk.
+
+    Tickers come from the command line (default: AAPL), e.g.
+    `python train_model.py AAPL MSFT NVDA`; indicators for all of them are
+    computed in one panel pass. The feature set is agent.FEATURES
+    (CLEARTRADE_FEATURES).
 
     For the capstone, Logistic Regression provides an interpretable
     baseline, while an optional Random Forest model can be enabled
     by changing model_type below.
     """
-    ticker = "AAPL"
+    tickers = [t.upper() for t in sys.argv[1:]] or ["AAPL"]
 
-    qs = StockPrice.objects.filter(ticker=ticker).order_by("date")
-    df = pd.DataFrame([{"date": p.date, "close": p.close} for p in qs])
+    columns = ["ticker", "date", *price_columns(FEATURES)]
+    qs = StockPrice.objects.filter(ticker__in=tickers).values_list(*columns)
+    df = pd.DataFrame(list(qs), columns=columns)
 
     df["date"] = pd.to_datetime(df["date"])
-    df = compute_indicators(df)
-    df = add_labels(df)
+    # float64, like compute_features at serving time: fit on the inputs the model will score
+    df = compute_indicators_long(df, features=FEATURES, dtype=np.float64)
+    df = add_labels(df, by="ticker")
 
     # Choose between \"logreg\" (baseline) and \"forest\" (non-linear)
     train_save(df, MODEL_PATH, model_type="logreg")
@@ -1,21 +1,108 @@
+import json
 import os
-from typing import Any, Dict
+import sys
+from typing import Any, Dict, List
 
 import httpx
 from mcp.server.fastmcp import FastMCP
 
 
 BACKEND_API_BASE = os.getenv("CLEARTRADE_BACKEND_API", "http://127.0.0.1:8000/api")
+# "http" (default) talks to a running Django backend; "inprocess" imports the
+# backend and calls the analysis pipeline directly, with no HTTP hop.
+MCP_MODE = os.getenv("CLEARTRADE_MCP_MODE", "http").lower()
+MAX_CONNECTIONS = int(os.getenv("CLEARTRADE_MCP_MAX_CONNECTIONS", "20"))
 
 mcp = FastMCP("ClearTrade MCP Server", json_response=True)
 
+_client: httpx.AsyncClient | None = None
+_django_ready = False
 
-def _make_client() -> httpx.Client:
-    return httpx.Client(base_url=BACKEND_API_BASE, timeout=30.0)
+
+def _get_client() -> httpx.AsyncClient:
+    """One long-lived async client per server: keep-alive connections are reused across tool calls."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_API_BASE,
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+                keepalive_expiry=60.0,
+            ),
+        )
+    return _client
+
+
+async def _request(method: str, path: str, **kwargs) -> Dict[str, Any]:
+    try:
+        resp = await _get_client().request(method, path, **kwargs)
+        if resp.is_error:
+            # Keep the backend's own error (e.g. "need 60 rows") and its status, as in-process mode does
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict):
+                return {**body, "status": resp.status_code}
+        resp.raise_for_status()
+        return resp.json()
+    except httpx.HTTPError as exc:
+        return {"error": f"backend request failed: {exc}"}
+
+
+def _setup_django() -> None:
+    """Import the Django backend into this process (in-process mode)."""
+    global _django_ready
+    if _django_ready:
+        return
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    # The MCP server runs an event loop; Django's ORM is only called via async_db.db_to_async.
+    import django
+
+    django.setup()
+    _django_ready = True
+
+
+def _jsonable(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Same JSON shapes as the HTTP API (DRF's encoder: ISO dates, numpy scalars as numbers)."""
+    from rest_framework.utils.encoders import JSONEncoder
+
+    return json.loads(json.dumps(payload, cls=JSONEncoder))
+
+
+async def _inprocess_analyze(ticker: str) -> Dict[str, Any]:
+    _setup_django()
+    from analysis_app.async_pipeline import run_analysis_async
+    from analysis_app.singleflight import coalesced_async
+
+    payload, status = await coalesced_async(ticker, run_analysis_async, ticker)
+    # Same shape as HTTP mode: a failed analysis carries its status code
+    return _jsonable(payload if status == 200 else {**payload, "status": status})
+
+
+async def _inprocess_batch(tickers: List[str]) -> Dict[str, Any]:
+    _setup_django()
+    from analysis_app.async_pipeline import BATCH_MAX_TICKERS, run_batch_async
+
+    # Same check and message as /api/analyze/batch
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return {"error": f"at most {BATCH_MAX_TICKERS} tickers per batch", "status": 400}
+    return _jsonable({"results": await run_batch_async(tickers)})
+
+
+async def _inprocess_call(fn_name: str, *args) -> Dict[str, Any]:
+    _setup_django()
+    from analysis_app import views
+    from analysis_app.async_db import db_to_async
+
+    return _jsonable(await db_to_async(getattr(views, fn_name))(*args))
 
 
 @mcp.tool()
-def analyze_ticker(ticker: str) -> Dict[str, Any]:
+async def analyze_ticker(ticker: str) -> Dict[str, Any]:
     """
     Run ClearTrade's full pipeline (technical, fundamental, sentiment) for a stock ticker.
     """
@@ -23,17 +110,29 @@ def analyze_ticker(ticker: str) -> Dict[str, Any]:
     if not ticker:
         return {"error": "ticker is required"}
 
-    try:
-        with _make_client() as client:
-            resp = client.get("/analyze", params={"ticker": ticker})
-            resp.raise_for_status()
-            return resp.json()
-    except httpx.HTTPError as exc:
-        return {"error": f"backend request failed: {exc}"}
+    if MCP_MODE == "inprocess":
+        return await _inprocess_analyze(ticker)
+    return await _request("GET", "/analyze", params={"ticker": ticker})
+
+
+@mcp.tool()
+async def analyze_tickers(tickers: List[str]) -> Dict[str, Any]:
+    """
+    Run the full pipeline for several tickers in one call (up to the backend's
+    batch limit, 50 by default).
+    Returns {"results": {ticker: recommendation payload with a "status" code}}.
+    """
+    cleaned = list(dict.fromkeys((t or "").upper().strip() for t in tickers or [] if (t or "").strip()))
+    if not cleaned:
+        return {"error": "tickers is required"}
+
+    if MCP_MODE == "inprocess":
+        return await _inprocess_batch(cleaned)
+    return await _request("POST", "/analyze/batch", json={"tickers": cleaned})
 
 
 @mcp.tool()
-def chat_about_ticker(ticker: str, question: str) -> Dict[str, Any]:
+async def chat_about_ticker(ticker: str, question: str) -> Dict[str, Any]:
     """
     Ask follow-up questions about the latest recommendation for a ticker
     (e.g., 'Why?', 'Confidence?', 'RSI?', 'Sentiment?').
@@ -43,17 +142,13 @@ def chat_about_ticker(ticker: str, question: str) -> Dict[str, Any]:
     if not ticker or not question:
         return {"error": "ticker and question are required"}
 
-    try:
-        with _make_client() as client:
-            resp = client.post("/chat", json={"ticker": ticker, "question": question})
-            resp.raise_for_status()
-            return resp.json()
-    except httpx.HTTPError as exc:
-        return {"error": f"backend request failed: {exc}"}
+    if MCP_MODE == "inprocess":
+        return await _inprocess_call("chat_answer", ticker, question.lower())
+    return await _request("POST", "/chat", json={"ticker": ticker, "question": question})
 
 
 @mcp.tool()
-def get_ticker_history(ticker: str) -> Dict[str, Any]:
+async def get_ticker_history(ticker: str) -> Dict[str, Any]:
     """
     Get recent ClearTrade recommendation history for a stock ticker.
     """
@@ -61,18 +156,14 @@ def get_ticker_history(ticker: str) -> Dict[str, Any]:
     if not ticker:
         return {"error": "ticker is required"}
 
-    try:
-        with _make_client() as client:
-            resp = client.get("/history", params={"ticker": ticker})
-            resp.raise_for_status()
-            return resp.json()
-    except httpx.HTTPError as exc:
-        return {"error": f"backend request failed: {exc}"}
+    if MCP_MODE == "inprocess":
+        return await _inprocess_call("history_payload", ticker)
+    return await _request("GET", "/history", params={"ticker": ticker})
 
 
 if __name__ == "__main__":
     # Default to Streamable HTTP on the standard MCP Inspector endpoint:
     # MCP endpoint: http://127.0.0.1:8000/mcp
     # Run the Django backend on a different port (e.g. 8002) to avoid conflicts.
+    # With CLEARTRADE_MCP_MODE=inprocess no backend server is needed.
     mcp.run(transport="streamable-http")
-